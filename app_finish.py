@@ -1,10 +1,17 @@
 import streamlit as st
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
 import pandas as pd
-import json
 import datetime
-from duckduckgo_search import DDGS 
+import time
+import uuid
+from json_extract import IncrementalJSONArrayParser, salvage_json_from_text
+from compliance import scan_cep_items
+from history_store import history_store
+from metrics import metrics
+from resilience import configure_services, services
+from report_export import CSV_MIME, XLSX_MIME, export_entry, build_combined_export
+from variant_pool import variant_pool, produce_variant
+from web_search import search_cache, search_flight
+from strategy import CEP_COUNT, CEP_FIELD_LABELS, PLATFORM_OPTIONS, TONE_OPTIONS, DEFAULT_TONE, stream_strategy, generate_all_platforms, regenerate_missing_items, generation_flight
 
 # -----------------------------------------------------------------------------
 # [보안] 비밀번호 & API 키 설정
@@ -12,6 +19,10 @@ from duckduckgo_search import DDGS
 try:
     MY_API_KEY = st.secrets["GOOGLE_API_KEY"]
     TEAM_PASSWORD = st.secrets["TEAM_PASSWORD"]
+    # (선택) 사용할 모델을 고정하면 모델 목록 조회를 건너뜁니다. 예: "models/gemini-1.5-flash"
+    PINNED_MODEL = st.secrets.get("GEMINI_MODEL")
+    # (선택) 서비스별 호출 제한/재시도 설정. 예: [SERVICE_LIMITS.gemini] rate = 2.0
+    configure_services(st.secrets.get("SERVICE_LIMITS"))
 except FileNotFoundError:
     st.error("🚨 서버 설정 오류: Secrets에 API 키와 비밀번호가 설정되지 않았습니다.")
     st.stop()
@@ -75,13 +86,14 @@ def show_cep_guide():
     if st.button("전략 짜러가기! 🚀", type="primary"):
         st.rerun()
 
+# 미리 만들어 두는 변형 결과의 사용자별 예산을 세션 단위로 셉니다.
+if 'pool_user_id' not in st.session_state:
+    st.session_state.pool_user_id = uuid.uuid4().hex
+
 if 'cep_popup_shown' not in st.session_state:
     show_cep_guide()
     st.session_state.cep_popup_shown = True
 
-if 'history' not in st.session_state:
-    st.session_state.history = []
-
 with st.sidebar:
     st.header("🎛️ 마케팅 옵션 설정")
     st.success("✅ Real-time Search 활성화")
@@ -89,10 +101,12 @@ with st.sidebar:
     st.markdown("---")
     
     st.subheader("1. 광고 매체 (Platform)")
+    all_platforms = st.toggle("🧩 4개 매체 한 번에 생성", help="웹 검색은 한 번만 하고 매체별 전략을 동시에 만들어 나란히 보여줍니다.")
     platform = st.radio(
         "어디에 노출할 소재인가요?",
-        ["SNS 숏폼 (릴스/틱톡)", "SNS 피드 (인스타/페북)", "GFA/배너 (네이버/카카오)", "검색광고 (TDA)"],
-        index=2
+        PLATFORM_OPTIONS,
+        index=2,
+        disabled=all_platforms
     )
     
     st.markdown("<br>", unsafe_allow_html=True)
@@ -100,8 +114,16 @@ with st.sidebar:
     st.subheader("2. 톤앤매너 (Tone)")
     tone = st.select_slider(
         "카피의 강도를 선택하세요",
-        options=["순한맛 (공감/위로)", "논리적 (기능/정보)", "매운맛 (공포/팩폭)"],
-        value="매운맛 (공포/팩폭)"
+        options=TONE_OPTIONS,
+        value=DEFAULT_TONE
+    )
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    st.subheader("3. 검색 깊이 (Search)")
+    enrich_pages = st.toggle(
+        "📄 검색 결과 본문까지 읽기",
+        help="상위 검색 결과 몇 개는 페이지 본문을 직접 읽어 근거로 씁니다. 생성 시간이 최대 몇 초 늘어날 수 있습니다."
     )
 
     st.markdown("---")
@@ -129,7 +151,7 @@ st.markdown(
 
 st.divider()
 
-tab1, tab2 = st.tabs(["⚡ 전략 생성", "🗂️ 저장된 기록"])
+tab1, tab2, tab3 = st.tabs(["⚡ 전략 생성", "🗂️ 저장된 기록", "📈 성능 지표"])
 
 with tab1:
     col1, col2 = st.columns([1, 1])
@@ -154,298 +176,377 @@ with tab1:
         st.subheader("📊 전략 도출 결과")
         result_container = st.container()
 
+    # '4개 매체 한 번에 생성' 결과는 화면 전체 폭에 매체별로 나란히 그립니다.
+    all_platforms_container = st.container()
+
 # -----------------------------------------------------------------------------
-# Backend Logic
+# 결과 카드 렌더링
 # -----------------------------------------------------------------------------
-def get_best_available_model(api_key):
-    """
-    [핵심 수정] 사용 가능한 모델 목록을 조회해서
-    가장 좋은 모델의 '정확한 이름'을 가져옵니다. (404 에러 방지)
-    """
-    genai.configure(api_key=api_key)
-    try:
-        # 1. 사용 가능한 모델 리스트 조회
-        all_models = list(genai.list_models())
-        
-        # 2. 'generateContent' 기능을 지원하는 모델만 필터링
-        text_models = [m.name for m in all_models if 'generateContent' in m.supported_generation_methods]
-        
-        # 3. 우선순위에 따라 모델 선택 (Flash -> Pro -> 1.0)
-        # 리스트에 있는 '정확한 이름(models/gemini-xxx)'을 반환함
-        for m in text_models:
-            if 'gemini-1.5-flash' in m: return m
-        for m in text_models:
-            if 'gemini-1.5-pro' in m: return m
-        for m in text_models:
-            if 'gemini-pro' in m: return m
-            
-        # 아무것도 없으면 첫 번째 거라도 반환
-        if text_models:
-            return text_models[0]
-        else:
-            return None
-    except Exception as e:
-        return None
-
-def perform_web_search(query, max_results=3):
-    try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, region='kr-kr', safesearch='off', max_results=max_results))
-            search_summary = ""
-            for idx, res in enumerate(results):
-                search_summary += f"[{idx+1}] 제목: {res['title']}\n내용: {res['body']}\n링크: {res['href']}\n\n"
-            return search_summary if search_summary else "검색 결과 없음"
-    except Exception as e:
-        return f"검색 중 오류 발생: {str(e)}"
-
-def check_compliance_risks(text):
-    risky_words = ["최고", "100%", "완치", "무조건", "보장", "부작용 없", "즉시", "유일", "최초"]
-    found = [word for word in risky_words if word in text]
-    return found
-
-def extract_json_from_text(text):
-    try:
-        start_idx = text.find('[')
-        end_idx = text.rfind(']')
-        if start_idx != -1 and end_idx != -1:
-            json_str = text[start_idx : end_idx + 1]
-            return json.loads(json_str)
-        else:
-            clean_text = text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
-    except Exception as e:
-        raise Exception(f"JSON 파싱 실패: {str(e)}")
-
-def generate_strategy(api_key, name, target, details, platform, tone):
-    
-    # 1. [검색 단계]
-    search_query_1 = f"{name} 후기 장단점"
-    search_query_2 = f"{name} 상세페이지 특징"
-    
-    search_result_1 = perform_web_search(search_query_1)
-    search_result_2 = perform_web_search(search_query_2)
-    
-    collected_data = f"""
-    **[웹 검색 결과 1: 실제 고객 후기]**
-    {search_result_1}
-    
-    **[웹 검색 결과 2: 제품 특징]**
-    {search_result_2}
-    """
-
-    # 2. [프롬프트 작성]
-    platform_instructions = ""
-    if "GFA/배너" in platform:
-        platform_instructions = """
-        **[🚨 중요: GFA/카카오 배너 매체 규격 준수]**
-        1. **글자 수 제한**: 메인 카피는 띄어쓰기 포함 **25자 이내**로 작성하세요. 길어지면 잘립니다.
-        2. **금지어**: '좋아요', '댓글', '공유' 언급 절대 금지.
-        3. **스타일**: '뉴스 기사 헤드라인' 또는 '커뮤니티 썰' 느낌의 텍스트형 배너 카피.
-        """
-    elif "숏폼" in platform:
-        platform_instructions = """
-        **[🚨 중요: 숏폼(릴스/틱톡) 매체 규격 준수]**
-        1. **형식**: 글자가 아닌 '영상 연출(Action)' 위주.
-        2. **Visual Guide**: 정지 이미지가 아니라, 초반 3초에 시선을 뺏는 구체적인 행동 지시문 작성.
-        3. **카피**: 자막으로 들어갈 짧은 구어체.
-        """
-    elif "피드" in platform:
-        platform_instructions = """
-        **[🚨 중요: 인스타/페북 피드 매체 규격 준수]**
-        1. **형식**: 카드뉴스 표지(썸네일).
-        2. **글자 수 제한**: 가독성을 위해 2줄 이내로 끊어지는 짧고 굵은 헤드라인.
-        """
-    else:
-        platform_instructions = """
-        **[🚨 중요: 검색광고(TDA) 매체 규격 준수]**
-        1. **글자 수 제한**: 제목 15자 이내.
-        2. **스타일**: 검색 키워드를 반드시 포함한 신뢰도 높은 문구.
-        """
-
-    compliance_instructions = """
-    **[⚠️ 심의/반려 주의 (Compliance Check)]**
-    - 표시광고법 및 의료법 위반 소지가 있는 단어('최고', '100%', '완치', '무조건', '보장', '부작용 없음')는 절대 사용하지 마세요.
-    """
-
-    tone_instructions = ""
-    if "매운맛" in tone:
-        tone_instructions = "**[🔥 톤앤매너: 극도로 매운맛]** 점잖은 경고 금지. '당신 지금 돈 버리고 있다', '망가지는 중이다' 처럼 손실 회피를 강하게 자극하세요."
-    elif "순한맛" in tone:
-        tone_instructions = "**[💧 톤앤매너: 순한맛]** 고객의 아픔에 공감하고 따뜻한 해결책을 제시하세요."
+# 카드에 필요한 값(링크 URL, 심의 경고 등)은 결과가 나올 때 한 번만 계산해 session_state에 두고,
+# 이후 rerun에서는 그 값으로 다시 그리기만 합니다.
+def format_context_report(report):
+    text = f"🔎 검색 자료 {report['kept']}건 사용 · 컨텍스트 {report['context_tokens']} 토큰 (원본 대비 {report['saved_tokens']} 토큰 절약)"
+    if "pages_used" in report:
+        text += f" · 원문 {report['pages_used']}건 ({report['page_tokens']} 토큰)"
+    return text
+
+def prepare_cep_card(idx, item, product_name, platform):
+    visual_label = "🖼️ 상위 이미지"
+    if "숏폼" in platform:
+        visual_label = "🎬 숏폼 영상 기획(오프닝/연출)"
+
+    # 후킹 카피뿐 아니라 CEP의 모든 필드를 검사합니다.
+    risks = scan_cep_items([item]).get(0, {})
+    risk_text = " / ".join(f"{CEP_FIELD_LABELS.get(field, field)}: {', '.join(terms)}" for field, terms in risks.items())
+
+    search_kwd = item.get('ref_keyword', item.get('concept_keyword', product_name))
+    search_kwd_encoded = search_kwd.replace(" ", "+")
+
+    kwd_for_voc = item.get('concept_keyword', '')
+    voc_query = f"{product_name} {kwd_for_voc}"
+    voc_encoded = voc_query.replace(" ", "+")
+
+    return {
+        "expander_title": f"📌 {item.get('cep_title', f'CEP {idx+1}')}",
+        "item": item,
+        "thought": item.get('thought', '').replace('"', ''),
+        "visual_label": visual_label,
+        "risk_text": risk_text,
+        "ref_links": [
+            ("📌 핀터레스트", f"https://www.pinterest.co.kr/search/pins/?q={search_kwd_encoded}"),
+            ("📘 Meta 광고", f"https://www.facebook.com/ads/library/?ad_type=all&q={search_kwd_encoded}"),
+            ("💚 네이버(Ref)", f"https://search.naver.com/search.naver?where=image&query={search_kwd_encoded}"),
+            ("🟥 유튜브", f"https://www.youtube.com/results?search_query={search_kwd_encoded}"),
+            ("🎵 틱톡", f"https://www.tiktok.com/search?q={search_kwd_encoded}"),
+        ],
+        "voc_links": [
+            ("🟢 네이버 블로그 후기", f"https://search.naver.com/search.naver?where=blog&query={voc_encoded}"),
+            ("☕ 네이버 카페 반응", f"https://search.naver.com/search.naver?where=article&query={voc_encoded}"),
+            ("📰 관련 뉴스/기사", f"https://www.google.com/search?q={voc_encoded}&tbm=nws"),
+        ],
+    }
+
+def render_cep_card(card):
+    item = card["item"]
+    with st.expander(card["expander_title"], expanded=True):
+
+        st.markdown(f"### {item.get('cep_title', '')}")
+
+        st.markdown(f"**[상황]**")
+        st.write(item.get('situation_summary', '내용 없음'))
+
+        st.markdown(f"**[생각/동기]**")
+        st.write(f'"{card["thought"]}"')
+
+        st.markdown(f"**[카테고리 진입 계기(행동)]**")
+        st.write(item.get('trigger_behavior', '내용 없음'))
+
+        st.markdown("---")
+
+        st.markdown("##### 🚀 퍼포먼스 활용 포인트")
+        st.info(f"**🏷️ 컨셉 키워드:** {item.get('concept_keyword', '키워드 없음')}")
+
+        st.error(f"**⚡ 후킹 카피:** {item.get('hooking_copy', '')}")
+        if card["risk_text"]:
+            st.warning(f"⚠️ **[주의]** 심의 반려 위험 단어 감지: {card['risk_text']}")
+
+        st.write(f"**{card['visual_label']}:** {item.get('visual_guide', '')}")
+        st.write(f"**📄 랜딩 섹션:** {item.get('landing_section', '')}")
+
+        st.markdown("---")
+
+        st.markdown("**📚 디자인 레퍼런스 검색**")
+        for col, (label, url) in zip(st.columns(len(card["ref_links"])), card["ref_links"]):
+            col.link_button(label, url)
+
+        st.markdown("**🗣️ 실제 고객 반응(VOC) & 기사 확인**")
+        for col, (label, url) in zip(st.columns(len(card["voc_links"])), card["voc_links"]):
+            col.link_button(label, url)
+
+def render_entry_downloads(entry, key_prefix):
+    # 리포트 파일은 다운로드 버튼을 눌렀을 때만 만들어집니다.
+    d1, d2 = st.columns(2)
+    with d1:
+        st.download_button("📥 전략 리포트 엑셀 다운로드", lambda: export_entry(entry, "xlsx"), f"CEP_Logic_Strategy_{entry['product']}.xlsx", XLSX_MIME, type="primary", key=f"{key_prefix}_xlsx", on_click="ignore")
+    with d2:
+        st.download_button("📄 CSV 다운로드", lambda: export_entry(entry, "csv"), f"CEP_Logic_Strategy_{entry['product']}.csv", CSV_MIME, key=f"{key_prefix}_csv", on_click="ignore")
+
+def make_entry(platform, data):
+    return {
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "product": product_name,
+        "target": target_audience,
+        "platform": platform,
+        "tone": tone,
+        "data": data
+    }
+
+@st.fragment
+def render_latest_result():
+    """마지막 생성 결과를 session_state에서 꺼내 그립니다. (다시 계산하지 않음)"""
+    latest = st.session_state.get("latest_result")
+    if not latest:
+        return
+    if latest["context"]:
+        st.caption(latest["context"])
+    if latest["mode"] == "all":
+        for (p_name, p_result), p_col in zip(latest["platforms"].items(), st.columns(len(latest["platforms"]))):
+            with p_col:
+                st.markdown(f"#### {p_name}")
+                if p_result["error"]:
+                    st.error(p_result["error"])
+                    continue
+                for card in p_result["cards"]:
+                    render_cep_card(card)
+                render_entry_downloads(p_result["entry"], f"latest_download_{p_name}")
     else:
-        tone_instructions = "**[💡 톤앤매너: 논리적]** 객관적 사실과 기능적 우위를 강조하세요."
-
-    prompt = f"""
-    당신은 대한민국 최고의 퍼포먼스 마케터이자 카피라이터입니다.
-    
-    **[참고 자료: 실시간 웹 검색 데이터]**
-    {collected_data}
-    
-    ---
-
-    **[미션]**
-    위 검색 데이터와 아래 입력 정보를 결합하여 **최적의 CEP(Category Entry Point) 7가지**를 도출하세요.
-
-    [입력 정보]
-    - 제품명: {name}
-    - 타겟: {target}
-    - 상세 특징(참고): {details}
-    - **선택된 매체**: {platform}
-    - **선택된 톤**: {tone}
-
-    {platform_instructions}
-    {compliance_instructions}
-    {tone_instructions}
-
-    [최종 출력 포맷 (JSON)]
-    위 사고 과정을 통해 도출된 내용을 **오직 JSON 형식으로만** 출력하세요. 서론이나 부연 설명은 금지합니다.
-    
-    **[중요: 검색 키워드 추출]**
-    `ref_keyword` 필드에는 제품명(예: 리압스텝퍼)이 아닌, **광고 라이브러리에서 검색했을 때 레퍼런스가 많이 나올 법한 '대표 카테고리 키워드'(예: 다이어트, 붓기, 홈트레이닝)** 를 1개만 단답형으로 적으세요.
-
-    ```json
-    [
-      {{
-        "cep_title": "CEP N. [상황]과 [동기]를 결합한 직관적인 타이틀",
-        "situation_summary": "웹 검색 데이터와 7W 분석을 토대로 작성된 구체적인 상황 묘사 (1~2문장)",
-        "thought": "고객의 속마음/동기 (따옴표 포함한 독백)",
-        "trigger_behavior": "검색 키워드 및 행동 패턴 (화살표 활용)",
-        "concept_keyword": "컨셉 키워드 (해시태그)",
-        "ref_keyword": "레퍼런스 검색용 대표 키워드 (예: 다이어트)",
-        "hooking_copy": "타겟 저격 후킹 카피 (매체 규격 준수)",
-        "visual_guide": "매체 맞춤형 시각적 가이드",
-        "landing_section": "랜딩 페이지 구성 아이디어"
-      }},
-      ...
-    ]
-    ```
-    """
-    
-    # [🔥 핵심 수정] 모델 자동 감지 후 실행
-    try:
-        # 1. 사용할 모델 이름 가져오기
-        active_model = get_best_available_model(api_key)
-        
-        if not active_model:
-            return "Error: 사용 가능한 AI 모델을 찾을 수 없습니다. (API Key 권한을 확인해주세요)"
-            
-        # 2. 찾은 모델로 생성 시도
-        model = genai.GenerativeModel(active_model)
-        config = GenerationConfig(temperature=1.0) 
-        response = model.generate_content(prompt, generation_config=config)
-        return response.text
-        
-    except Exception as e:
-        return f"Error: AI 처리 중 오류 발생. ({str(e)})"
+        for card in latest["cards"]:
+            render_cep_card(card)
+        render_entry_downloads(latest["entry"], "latest_download")
 
 if generate_btn:
     if not product_name or not target_audience or not product_details:
         st.warning("⚠️ 모든 정보를 입력해주세요.")
+    elif all_platforms:
+        # 새로 생성하면 이전 결과는 지웁니다. 끝까지 성공한 결과만 latest_result로 남깁니다.
+        st.session_state.latest_result = None
+        ui_started = time.perf_counter()
+        with all_platforms_container:
+            with st.spinner(f"🌐 '{product_name}' 웹 검색 후 {len(PLATFORM_OPTIONS)}개 매체 전략을 동시에 생성 중..."):
+                context_slot = st.empty()
+                result = {"mode": "all", "context": None, "platforms": {}}
+                platform_columns = dict(zip(PLATFORM_OPTIONS, st.columns(len(PLATFORM_OPTIONS))))
+                result["platforms"] = {p_name: {"error": "결과 없음", "cards": [], "entry": None} for p_name in PLATFORM_OPTIONS}
+                for p_name, p_col in platform_columns.items():
+                    p_col.markdown(f"#### {p_name}")
+
+                def show_context_report(report):
+                    result["context"] = format_context_report(report)
+                    context_slot.caption(result["context"])
+
+                # 먼저 끝난 매체부터 해당 칸에 그립니다.
+                for p_name, p_text, p_data in generate_all_platforms(MY_API_KEY, product_name, target_audience, product_details, tone, PINNED_MODEL,
+                                                             on_context=show_context_report, enrich_pages=enrich_pages):
+                    with platform_columns[p_name]:
+                        if p_text.startswith("Error"):
+                            result["platforms"][p_name]["error"] = p_text
+                            st.error(p_text)
+                            continue
+                        if not p_data:
+                            result["platforms"][p_name]["error"] = "데이터 처리 중 오류가 발생했습니다. (JSON 파싱 실패: 읽을 수 있는 항목이 없습니다.)"
+                            st.error(result["platforms"][p_name]["error"])
+                            continue
+                        with metrics.timed("render_cards", platform=p_name, cards=len(p_data)):
+                            p_cards = [prepare_cep_card(idx, item, product_name, p_name) for idx, item in enumerate(p_data)]
+                            for card in p_cards:
+                                render_cep_card(card)
+
+                        p_entry = make_entry(p_name, p_data)
+                        history_store.add(p_entry)
+                        render_entry_downloads(p_entry, f"latest_download_{p_name}")
+                        result["platforms"][p_name] = {"error": None, "cards": p_cards, "entry": p_entry}
+
+                st.session_state.latest_result = result
+                ok = any(p_result["error"] is None for p_result in result["platforms"].values())
+                metrics.observe("ui_generate", time.perf_counter() - ui_started, "ok" if ok else "error", mode="all")
     else:
-        with col2:
+        st.session_state.latest_result = None
+        with result_container:
             with st.spinner(f"🌐 '{product_name}' 웹 검색 및 경쟁사 분석 중..."):
-                raw_text = generate_strategy(MY_API_KEY, product_name, target_audience, product_details, platform, tone)
+                raw_parts = []
+                data = []
+                cards = {}   # id(item) -> 카드 값
+                result = {"mode": "single", "context": None}
+                ui_started = time.perf_counter()
+                pooled = None
                 
                 try:
+                    # JSON 객체 하나가 닫힐 때마다 카드를 바로 그립니다. (첫 카드까지의 대기 시간 단축)
+                    parser = IncrementalJSONArrayParser()
+                    def show_context_report(report):
+                        result["context"] = format_context_report(report)
+                        st.caption(result["context"])
+
+                    def show_new_card(idx, item):
+                        if not cards:
+                            metrics.observe("ui_first_card", time.perf_counter() - ui_started, pooled=bool(pooled))
+                        with metrics.timed("render_card"):
+                            cards[id(item)] = prepare_cep_card(idx, item, product_name, platform)
+                            render_cep_card(cards[id(item)])
+
+                    # 같은 입력으로 미리 만들어 둔 결과가 있으면 기다리지 않고 바로 보여줍니다.
+                    pool_key = variant_pool.make_key(product_name, target_audience, product_details, platform, tone, enrich_pages)
+                    pooled = variant_pool.take(pool_key)
+                    if pooled:
+                        pooled_text, pooled_report = pooled
+                        st.caption("⚡ 미리 준비해 둔 새 전략입니다.")
+                        if pooled_report:
+                            show_context_report(pooled_report)
+                        chunks = [pooled_text]
+                    else:
+                        chunks = stream_strategy(MY_API_KEY, product_name, target_audience, product_details, platform, tone, PINNED_MODEL, on_context=show_context_report,
+                                                 enrich_pages=enrich_pages)
+
+                    for chunk in chunks:
+                        raw_parts.append(chunk)
+                        if chunk.startswith("Error") and len(raw_parts) == 1:
+                            break
+                        for item in parser.feed(chunk):
+                            show_new_card(len(data), item)
+                            data.append(item)
+                    raw_text = "".join(raw_parts)
+                    
                     if raw_text.startswith("Error"):
                         st.error("🚨 AI 처리 중 오류가 발생했습니다.")
                         st.error(raw_text)
                     else:
-                        data = extract_json_from_text(raw_text)
+                        # 깨진 항목만 짧은 후속 요청으로 다시 받아 채웁니다. (전체 재생성 방지)
+                        lost = parser.finish(CEP_COUNT)
+                        if lost:
+                            st.warning(f"⚠️ {len(lost)}개 항목이 손상되어 해당 항목만 다시 생성합니다. (순번: {', '.join(str(i + 1) for i in lost)})")
+                            data = regenerate_missing_items(MY_API_KEY, product_name, target_audience, product_details, platform, tone, data, lost, PINNED_MODEL)
+                            for idx, item in enumerate(data):
+                                if id(item) not in cards:
+                                    show_new_card(idx, item)
+                        if not data:
+                            raise Exception("JSON 파싱 실패: 읽을 수 있는 항목이 없습니다.")
                         
-                        save_data = {
-                            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "product": product_name,
-                            "target": target_audience,
-                            "platform": platform,
-                            "data": data
-                        }
-                        st.session_state.history.insert(0, save_data)
-                        
-                        visual_label = "🖼️ 상위 이미지"
-                        if "숏폼" in platform:
-                            visual_label = "🎬 숏폼 영상 기획(오프닝/연출)"
-
-                        for idx, item in enumerate(data):
-                            cep_title_text = f"📌 {item.get('cep_title', f'CEP {idx+1}')}"
-                            with st.expander(cep_title_text, expanded=True):
-                                
-                                st.markdown(f"### {item.get('cep_title', '')}")
-                                
-                                st.markdown(f"**[상황]**")
-                                st.write(item.get('situation_summary', '내용 없음'))
-                                
-                                st.markdown(f"**[생각/동기]**")
-                                thought_content = item.get('thought', '').replace('"', '')
-                                st.write(f'"{thought_content}"')
-                                
-                                st.markdown(f"**[카테고리 진입 계기(행동)]**")
-                                st.write(item.get('trigger_behavior', '내용 없음'))
-                                
-                                st.markdown("---")
-                                
-                                st.markdown("##### 🚀 퍼포먼스 활용 포인트")
-                                st.info(f"**🏷️ 컨셉 키워드:** {item.get('concept_keyword', '키워드 없음')}")
-                                
-                                copy_text = item.get('hooking_copy', '')
-                                risks = check_compliance_risks(copy_text)
-                                
-                                if risks:
-                                    st.error(f"**⚡ 후킹 카피:** {copy_text}")
-                                    st.warning(f"⚠️ **[주의]** 심의 반려 위험 단어 감지: {', '.join(risks)}")
-                                else:
-                                    st.error(f"**⚡ 후킹 카피:** {copy_text}")
-                                
-                                st.write(f"**{visual_label}:** {item.get('visual_guide', '')}")
-                                st.write(f"**📄 랜딩 섹션:** {item.get('landing_section', '')}")
-                                
-                                st.markdown("---")
-                                
-                                st.markdown("**📚 디자인 레퍼런스 검색**")
-                                search_kwd = item.get('ref_keyword', item.get('concept_keyword', product_name))
-                                search_kwd_encoded = search_kwd.replace(" ", "+")
-                                
-                                col_ref1, col_ref2, col_ref3, col_ref4, col_ref5 = st.columns(5)
-                                with col_ref1:
-                                    st.link_button("📌 핀터레스트", f"https://www.pinterest.co.kr/search/pins/?q={search_kwd_encoded}")
-                                with col_ref2:
-                                    st.link_button("📘 Meta 광고", f"https://www.facebook.com/ads/library/?ad_type=all&q={search_kwd_encoded}")
-                                with col_ref3:
-                                    st.link_button("💚 네이버(Ref)", f"https://search.naver.com/search.naver?where=image&query={search_kwd_encoded}")
-                                with col_ref4:
-                                    st.link_button("🟥 유튜브", f"https://www.youtube.com/results?search_query={search_kwd_encoded}")
-                                with col_ref5:
-                                    st.link_button("🎵 틱톡", f"https://www.tiktok.com/search?q={search_kwd_encoded}")
-                                
-                                st.markdown("**🗣️ 실제 고객 반응(VOC) & 기사 확인**")
-                                kwd_for_voc = item.get('concept_keyword', '')
-                                voc_query = f"{product_name} {kwd_for_voc}"
-                                voc_encoded = voc_query.replace(" ", "+")
-                                
-                                c1, c2, c3 = st.columns(3)
-                                with c1:
-                                    st.link_button("🟢 네이버 블로그 후기", f"https://search.naver.com/search.naver?where=blog&query={voc_encoded}")
-                                with c2:
-                                    st.link_button("☕ 네이버 카페 반응", f"https://search.naver.com/search.naver?where=article&query={voc_encoded}")
-                                with c3:
-                                    st.link_button("📰 관련 뉴스/기사", f"https://www.google.com/search?q={voc_encoded}&tbm=nws")
-
-                        df = pd.DataFrame(data)
-                        csv = df.to_csv(index=False).encode('utf-8-sig')
-                        st.download_button("📥 전략 리포트 엑셀 다운로드", csv, f"CEP_Logic_Strategy_{product_name}.csv", "text/csv", type="primary")
+                        save_data = make_entry(platform, data)
+                        history_store.add(save_data)
+
+                        # 다음 '다시' 클릭에 대비해 같은 입력의 변형을 백그라운드에서 채워 둡니다.
+                        variant_pool.refill(pool_key, st.session_state.pool_user_id, lambda: produce_variant(
+                            MY_API_KEY, product_name, target_audience, product_details, platform, tone, PINNED_MODEL, enrich_pages))
+
+                        render_entry_downloads(save_data, "latest_download")
+                        result["cards"] = [cards[id(item)] for item in data]
+                        result["entry"] = save_data
+                        st.session_state.latest_result = result
 
                 except Exception as e:
                     st.error(f"데이터 처리 중 오류가 발생했습니다. ({str(e)})")
                     st.text("▼ AI가 반환한 원본 데이터 (디버깅용) ▼")
-                    st.text(raw_text)
+                    st.text("".join(raw_parts))
+                finally:
+                    metrics.observe("ui_generate", time.perf_counter() - ui_started,
+                                    "ok" if st.session_state.latest_result else "error", mode="single", pooled=bool(pooled))
+elif st.session_state.get("latest_result"):
+    # 사이드바/기록 탭 등 다른 위젯으로 rerun된 경우: 저장해 둔 결과를 그대로 다시 그립니다.
+    with all_platforms_container if st.session_state.latest_result["mode"] == "all" else result_container:
+        render_latest_result()
 
-with tab2:
-    if not st.session_state.history:
+# -----------------------------------------------------------------------------
+# 저장된 기록 (fragment: 필터/페이지 이동/내용 불러오기는 이 영역만 다시 그림)
+# -----------------------------------------------------------------------------
+@st.fragment
+def render_history():
+    # 기록은 팀 공용 DB에 있고, 화면에는 현재 페이지만 불러옵니다.
+    f1, f2 = st.columns([2, 1])
+    with f1:
+        h_product_filter = st.text_input("제품명 검색", key="history_product_filter", placeholder="제품명 앞부분으로 검색").strip()
+    with f2:
+        h_platform_filter = st.selectbox("매체", ["전체"] + PLATFORM_OPTIONS, key="history_platform_filter")
+
+    # 필터가 바뀌면 첫 페이지로 돌아갑니다. (페이지마다 '이 id보다 오래된 것' 커서를 쌓아둠)
+    h_filters = (h_product_filter, h_platform_filter)
+    if st.session_state.get("history_filters") != h_filters:
+        st.session_state.history_filters = h_filters
+        st.session_state.history_cursors = [None]
+    h_cursors = st.session_state.history_cursors
+
+    h_entries, h_has_next = history_store.list_page(
+        h_cursors[-1],
+        product=h_product_filter or None,
+        platform=None if h_platform_filter == "전체" else h_platform_filter,
+    )
+
+    if not h_entries:
         st.info("아직 기록이 없습니다.")
+        return
+
+    # 불러온 기록 본문/심의 결과/표는 기록마다 한 번만 만들고, 현재 페이지 것만 남깁니다.
+    h_views = st.session_state.setdefault("history_views", {})
+    for stale_id in set(h_views) - {h['id'] for h in h_entries}:
+        del h_views[stale_id]
+
+    # 필터에 맞는 모든 기록을 합친 파일. 클릭 시 DB에서 조금씩 읽어 파일에 이어 씁니다.
+    st.download_button(
+        "📦 검색된 기록 전체 엑셀 다운로드",
+        lambda: build_combined_export(history_store.iter_entries(
+            product=h_product_filter or None,
+            platform=None if h_platform_filter == "전체" else h_platform_filter,
+        ), "xlsx"),
+        "CEP_History_Combined.xlsx", XLSX_MIME, key="history_combined_download", on_click="ignore",
+    )
+    for h in h_entries:
+        h_platform = h.get('platform') or '일반'
+        with st.expander(f"🕒 {h['timestamp']} - {h['product']} ({h_platform})"):
+            # 본문(data)은 '내용 불러오기'를 켠 기록만 DB에서 읽어 그립니다.
+            if st.toggle("📂 내용 불러오기", key=f"history_open_{h['id']}"):
+                if h['id'] not in h_views:
+                    h_full = history_store.get(h['id'])
+                    h_views[h['id']] = {
+                        "entry": h_full,
+                        "risks": scan_cep_items(h_full['data']),
+                        "table": pd.DataFrame(h_full['data'])[['cep_title', 'hooking_copy', 'visual_guide']],
+                    }
+                h_view = h_views[h['id']]
+                h_full = h_view["entry"]
+                if h_view["risks"]:
+                    st.warning(f"⚠️ 심의 반려 위험 단어가 포함된 CEP: {', '.join(str(i + 1) for i in h_view['risks'])}번")
+                hd1, hd2 = st.columns(2)
+                with hd1:
+                    st.download_button("📥 엑셀 다운로드", lambda e=h_full: export_entry(e, "xlsx"), f"History_{h['timestamp']}.xlsx", XLSX_MIME, key=f"history_download_{h['id']}", on_click="ignore")
+                with hd2:
+                    st.download_button("📄 CSV 다운로드", lambda e=h_full: export_entry(e, "csv"), f"History_{h['timestamp']}.csv", CSV_MIME, key=f"history_download_csv_{h['id']}", on_click="ignore")
+                st.dataframe(h_view["table"])
+
+    # 커서는 콜백에서 옮겨 두므로, 버튼을 누르면 이 fragment만 새 페이지로 다시 그려집니다.
+    nav1, nav2, nav3 = st.columns([1, 2, 1])
+    with nav1:
+        st.button("◀ 이전", key="history_prev", disabled=len(h_cursors) == 1, on_click=h_cursors.pop)
+    with nav2:
+        st.caption(f"{len(h_cursors)} 페이지")
+    with nav3:
+        st.button("다음 ▶", key="history_next", disabled=not h_has_next, on_click=h_cursors.append, args=(h_entries[-1]['id'],))
+
+with tab2:
+    render_history()
+
+# -----------------------------------------------------------------------------
+# 성능 지표 (관리자용)
+# -----------------------------------------------------------------------------
+@st.fragment
+def render_metrics():
+    st.caption("이 서버 프로세스가 시작된 뒤의 지표입니다. (단계별 최근 측정값 기준 분위수)")
+    st.button("🔄 새로고침", key="metrics_refresh")
+
+    st.markdown("##### ⏱️ 단계별 소요 시간 (ms)")
+    m_summary = pd.DataFrame(metrics.summary())
+    if m_summary.empty:
+        st.info("아직 측정된 지표가 없습니다.")
     else:
-        for h in st.session_state.history:
-            h_platform = h.get('platform', '일반')
-            with st.expander(f"🕒 {h['timestamp']} - {h['product']} ({h_platform})"):
-                h_df = pd.DataFrame(h['data'])
-                st.download_button("📥 엑셀 다운로드", h_df.to_csv(index=False).encode('utf-8-sig'), f"History_{h['timestamp']}.csv")
-                st.dataframe(h_df[['cep_title', 'hooking_copy', 'visual_guide']])
+        m_columns = ["mean", "p50", "p95", "p99", "max"]
+        m_summary[m_columns] = (m_summary[m_columns] * 1000).round(1)
+        st.dataframe(m_summary, hide_index=True)
+
+    mc1, mc2 = st.columns(2)
+    with mc1:
+        st.markdown("##### 🔢 누적 카운터")
+        st.dataframe(pd.DataFrame(list(metrics.counters().items()), columns=["name", "value"]), hide_index=True)
+    with mc2:
+        st.markdown("##### 🧰 공유 자원 상태")
+        m_resources = {f"service:{name}": guard.stats() for name, guard in services.items()}
+        m_resources["singleflight:search"] = search_flight.stats()
+        m_resources["singleflight:generation"] = generation_flight.stats()
+        m_resources["variant_pool"] = variant_pool.stats()
+        m_resources["search_cache"] = search_cache.stats()
+        st.json(m_resources, expanded=False)
+
+    m_text = metrics.prometheus_text()
+    st.download_button("📤 Prometheus 텍스트 다운로드", m_text, "cep_metrics.prom", "text/plain", key="metrics_download")
+    with st.expander("Prometheus 텍스트 보기"):
+        st.code(m_text, language="text")
+
+with tab3:
+    render_metrics()
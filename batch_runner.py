@@ -0,0 +1,238 @@
+"""
+CSV/JSONL 제품 목록으로 CEP 전략을 한꺼번에 생성합니다. (Streamlit 없이 실행)
+
+    python batch_runner.py products.csv -o results.jsonl --workers 4
+    python batch_runner.py products.jsonl -o results.jsonl --offline
+
+입력 컬럼: product, target, details, platform, tone (platform/tone은 생략 시 앱 기본값)
+결과는 한 줄씩 완료되는 대로 JSONL에 기록되며, 다시 실행하면 이미 성공한 행은 건너뜁니다.
+일부 검색이 실패한 채로 생성된 행은 status "degraded"로 남고, 다시 실행하면 재생성합니다.
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from compliance import scan_cep_items
+from json_extract import salvage_json_from_text
+from resilience import ddgs_service, gemini_service
+from strategy import CEP_COUNT, DEFAULT_PLATFORM, DEFAULT_TONE, generate_strategy, regenerate_missing_items
+from web_search import SEARCH_DEADLINE_SEC, SEARCH_QUERY_TIMEOUT_SEC
+
+# -----------------------------------------------------------------------------
+# 배치 기본 설정
+# -----------------------------------------------------------------------------
+BATCH_WORKERS = 4
+SEARCH_RATE_PER_SEC = 1.0       # DDGS 전역 호출 제한 (모든 워커 합산)
+GENERATION_RATE_PER_SEC = 0.5   # Gemini 전역 호출 제한 (모든 워커 합산)
+SEARCHES_PER_ROW = 2            # 행 하나가 동시에 실행하는 검색 쿼리 수 (strategy.collect_search_data)
+
+# 입력 파일에서 허용하는 컬럼 이름 (앱 화면의 한글 라벨도 허용)
+COLUMN_ALIASES = {
+    "product": ["product", "product_name", "제품명"],
+    "target": ["target", "target_audience", "타겟"],
+    "details": ["details", "product_details", "상세 특징"],
+    "platform": ["platform", "매체"],
+    "tone": ["tone", "톤"],
+}
+
+
+def _normalize_row(raw):
+    row = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        value = next((raw[a] for a in aliases if raw.get(a) not in (None, "")), "")
+        row[field] = str(value).strip()
+    row["platform"] = row["platform"] or DEFAULT_PLATFORM
+    row["tone"] = row["tone"] or DEFAULT_TONE
+    # id 컬럼이 없으면 입력 내용으로 만든 해시를 쓰므로, 같은 행은 재실행 시에도 같은 id를 가집니다.
+    row["row_id"] = str(raw.get("id") or raw.get("row_id") or "") or hashlib.sha1(
+        json.dumps([row[f] for f in COLUMN_ALIASES], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:16]
+    return row
+
+
+def read_rows(path):
+    """CSV 또는 JSONL 파일을 읽어 정규화된 행 리스트를 반환합니다."""
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            raws = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            raws = list(csv.DictReader(f))
+    return [_normalize_row(raw) for raw in raws]
+
+
+def load_completed_ids(output_path):
+    """이전 실행에서 성공(status == "ok")한 행의 id 집합. ("degraded" 행은 다시 생성 대상)"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 이전 실행이 쓰는 도중 중단되어 잘린 줄
+                continue
+            if record.get("status") == "ok":
+                completed.add(record.get("row_id"))
+    return completed
+
+
+def search_timeouts(workers, search_rate):
+    """
+    배치에서 쓸 검색 제한 시간. 속도 제한 때문에 토큰을 기다리는 시간은 실패가 아니라 정상적인 대기이므로,
+    모든 워커의 검색이 앞에 줄 서 있을 때의 최대 대기 시간만큼 앱 기본 제한 시간을 늘립니다.
+    """
+    token_wait = SEARCHES_PER_ROW * workers / search_rate if search_rate else 0.0
+    return {"per_query_timeout": SEARCH_QUERY_TIMEOUT_SEC + token_wait, "deadline": SEARCH_DEADLINE_SEC + token_wait}
+
+
+def process_row(api_key, row, pinned_model=None, enrich_pages=False, search_timeouts=None):
+    """한 행에 대해 검색 -> 생성 -> 파싱(+유실 항목 재생성)을 수행하고 결과 레코드를 반환합니다."""
+    started = time.monotonic()
+    record = dict(row)
+    record["timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        raw_text = generate_strategy(api_key, row["product"], row["target"], row["details"],
+                                     row["platform"], row["tone"], pinned_model,
+                                     on_context=lambda report: record.update(context=report),
+                                     enrich_pages=enrich_pages, search_timeouts=search_timeouts)
+        if raw_text.startswith("Error"):
+            raise Exception(raw_text)
+        data, lost = salvage_json_from_text(raw_text, CEP_COUNT)
+        if lost:
+            data = regenerate_missing_items(api_key, row["product"], row["target"], row["details"],
+                                            row["platform"], row["tone"], data, lost, pinned_model)
+        if not data:
+            raise Exception("JSON 파싱 실패: 읽을 수 있는 항목이 없습니다.")
+        # 검색 일부가 실패/시간 초과한 채 만든 결과
+        degraded = bool(record.get("context", {}).get("failed_searches"))
+        record.update(status="degraded" if degraded else "ok", data=data, lost=lost,
+                      compliance=scan_cep_items(data))
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    record["elapsed_sec"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def run_batch(rows, output_path, api_key=None, workers=BATCH_WORKERS,
+              search_rate=SEARCH_RATE_PER_SEC, generation_rate=GENERATION_RATE_PER_SEC,
+              pinned_model=None, resume=True, on_result=None, enrich_pages=False):
+    """
+    rows를 워커 풀에서 처리하고, 끝나는 순서대로 output_path(JSONL)에 한 줄씩 추가합니다.
+    resume=True면 output_path에 이미 성공으로 기록된 행은 건너뜁니다.
+    enrich_pages=True면 행마다 상위 검색 결과의 페이지 본문도 받아 프롬프트에 넣습니다.
+    처리 건수 요약 dict를 반환합니다.
+    속도 제한은 프로세스 공용 서비스에 적용되므로, 끝나면 (오류가 나도) 원래 설정으로 되돌립니다.
+    검색 제한 시간은 search_rate와 workers로 계산해(search_timeouts) 토큰 대기만으로 행이 실패하지 않게 합니다.
+    """
+    saved = [(service, service.settings()) for service in (ddgs_service, gemini_service)]
+    ddgs_service.configure(search_rate, burst=max(int(search_rate or 1), 1))
+    gemini_service.configure(generation_rate, burst=1)
+    try:
+        return _run_batch(rows, output_path, api_key, workers, pinned_model, resume, on_result, enrich_pages,
+                          search_timeouts(workers, search_rate))
+    finally:
+        for service, settings in saved:
+            service.configure(**settings)
+
+
+def _run_batch(rows, output_path, api_key, workers, pinned_model, resume, on_result, enrich_pages, timeouts):
+    completed = load_completed_ids(output_path) if resume else set()
+    todo, seen = [], set(completed)
+    for row in rows:
+        if row["row_id"] not in seen:
+            seen.add(row["row_id"])
+            todo.append(row)
+    summary = {"total": len(rows), "skipped": len(rows) - len(todo), "ok": 0, "degraded": 0, "error": 0}
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    write_lock = threading.Lock()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_row, api_key, row, pinned_model, enrich_pages, timeouts) for row in todo]
+        for fut in as_completed(futures):
+            record = fut.result()
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                summary[record["status"]] += 1
+            if on_result:
+                on_result(record)
+    return summary
+
+
+def export_parquet(jsonl_path, parquet_path):
+    """성공한 행을 CEP 1개당 1줄로 펼쳐 Parquet으로 저장합니다. (pyarrow 필요)"""
+    import pandas as pd
+
+    flat = []
+    for record in _latest_ok_records(jsonl_path).values():
+        base = {k: record.get(k) for k in ("row_id", "product", "target", "platform", "tone", "timestamp")}
+        for idx, item in enumerate(record["data"]):
+            flat.append({**base, "cep_index": idx + 1, **item})
+    pd.DataFrame(flat).to_parquet(parquet_path, index=False)
+    return len(flat)
+
+
+def _latest_ok_records(jsonl_path):
+    records = {}
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") in ("ok", "degraded"):
+                records[record["row_id"]] = record
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CEP 전략 일괄 생성")
+    parser.add_argument("input", help="입력 CSV 또는 JSONL 파일")
+    parser.add_argument("-o", "--output", required=True, help="결과 JSONL 파일 (이어쓰기)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--search-rate", type=float, default=SEARCH_RATE_PER_SEC, help="DDGS 초당 호출 수")
+    parser.add_argument("--generation-rate", type=float, default=GENERATION_RATE_PER_SEC, help="Gemini 초당 호출 수")
+    parser.add_argument("--model", help="사용할 Gemini 모델 고정 (예: models/gemini-1.5-flash)")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"))
+    parser.add_argument("--no-resume", action="store_true", help="이미 성공한 행도 다시 생성")
+    parser.add_argument("--parquet", help="완료 후 CEP 단위로 펼친 Parquet 파일도 저장")
+    parser.add_argument("--offline", action="store_true", help="가짜 검색/생성 클라이언트로 실행 (네트워크 없음)")
+    parser.add_argument("--enrich-pages", action="store_true", help="상위 검색 결과의 페이지 본문까지 읽어 근거로 사용")
+    args = parser.parse_args(argv)
+
+    pinned_model = args.model
+    if args.offline:
+        import stub_clients
+        pinned_model = stub_clients.install()
+    elif not args.api_key:
+        parser.error("GOOGLE_API_KEY 환경변수 또는 --api-key가 필요합니다.")
+
+    rows = read_rows(args.input)
+
+    def report(record):
+        mark = {"ok": "✅", "degraded": "⚠️"}.get(record["status"], "🚨")
+        print(f"{mark} {record['product']} ({record['platform']}) {record['elapsed_sec']}s", file=sys.stderr)
+
+    summary = run_batch(rows, args.output, api_key=args.api_key, workers=args.workers,
+                        search_rate=args.search_rate, generation_rate=args.generation_rate,
+                        pinned_model=pinned_model, resume=not args.no_resume, on_result=report,
+                        enrich_pages=args.enrich_pages)
+    print(json.dumps(summary, ensure_ascii=False))
+
+    if args.parquet:
+        export_parquet(args.output, args.parquet)
+    return 0 if summary["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+검색 -> 생성 -> 파싱 -> 심의 검사 -> 내보내기 파이프라인을 네트워크 없이 측정합니다.
+DDGS/Gemini는 stub_clients의 가짜 클라이언트(지연/오류/깨진 JSON 주입 가능)로 바꿔 실행합니다.
+
+    python benchmark.py                      # 전체 실행 후 benchmark_baseline.json과 비교
+    python benchmark.py --tier realistic     # 일반 크기만
+    python benchmark.py --only parse,export  # 이름에 해당 문자열이 들어간 시나리오만
+    python benchmark.py --save-baseline      # 현재 결과를 기준값으로 저장
+
+기준값보다 p95 지연이 늘거나 처리량이 줄어 허용 범위(--tolerance)를 벗어나면 종료 코드 1을 반환합니다.
+기준값은 측정 환경에 따라 다르므로 CI 등 실행 환경이 바뀌면 --save-baseline으로 다시 기록하세요.
+"""
+import argparse
+import json
+import logging
+import os
+import platform as platform_info
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import page_fetch
+import stub_clients
+import web_search
+from compliance import check_compliance_risks, scan_cep_items
+from history_store import HistoryStore
+from json_extract import extract_json_from_text, salvage_json_from_text
+from metrics import metrics, quantile
+from report_export import build_combined_export, entry_to_csv_bytes, entry_to_xlsx_bytes
+from resilience import services
+from strategy import CEP_COUNT, DEFAULT_PLATFORM, DEFAULT_TONE, generate_strategy, regenerate_missing_items
+
+# -----------------------------------------------------------------------------
+# 벤치마크 기본 설정
+# -----------------------------------------------------------------------------
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+DEFAULT_TOLERANCE = 0.5      # 기준값 대비 허용 변화율 (0.5 = p95 1.5배까지, 처리량 1/1.5까지)
+MIN_DELTA_MS = 2.0           # 아주 짧은 작업의 측정 잡음을 흡수하기 위한 p95 절대 여유(ms)
+
+# 가짜 서비스 지연 (실제 서비스보다 짧게 잡아 파이프라인 자체의 오버헤드가 드러나도록 함)
+REALISTIC_STUB = {"search_latency": 0.02, "generate_latency": 0.05, "chunk_latency": 0.001}
+FAULTY_STUB = dict(REALISTIC_STUB, error_rate=0.1, malformed_rate=0.3, seed=7)
+PAGES_STUB = dict(REALISTIC_STUB, page_latency=0.03)
+HEAVY_PAGES_STUB = dict(REALISTIC_STUB, page_latency=0.3, page_size=2_000_000)   # 느리고 큰 페이지 (크기 제한 확인)
+
+API_KEY = "offline"
+TARGET = "4050 갱년기 여성, 운동 싫어하는 주부"
+DETAILS = "하루 10분 홈트, 층간소음 없는 저소음 설계, 100% 환불 보장 이벤트"
+
+
+def _entry(items, product="벤치마크 제품"):
+    return {"timestamp": "2024-01-01 00:00:00", "product": product, "target": TARGET,
+            "platform": DEFAULT_PLATFORM, "tone": DEFAULT_TONE, "data": items}
+
+
+def _items(count, field_size=0):
+    return stub_clients.build_stub_output(f"CEP {count}가지", field_size)
+
+
+def run_pipeline(product, platform=DEFAULT_PLATFORM, enrich_pages=False):
+    """앱의 '전략 도출하기' 한 번과 같은 흐름 (화면 그리기 제외). 성공하면 True."""
+    text = generate_strategy(API_KEY, product, TARGET, DETAILS, platform, DEFAULT_TONE, stub_clients.STUB_MODEL_NAME,
+                             enrich_pages=enrich_pages)
+    if text.startswith("Error"):
+        return False
+    items, lost = salvage_json_from_text(text, CEP_COUNT)
+    if lost:
+        items = regenerate_missing_items(API_KEY, product, TARGET, DETAILS, platform, DEFAULT_TONE, items, lost,
+                                         stub_clients.STUB_MODEL_NAME)
+    scan_cep_items(items)
+    return bool(items)
+
+
+# -----------------------------------------------------------------------------
+# 측정
+# -----------------------------------------------------------------------------
+def measure(name, tier, op, ops, workers=1, warmup=1, stub_options=None, rounds=3):
+    """
+    op(i)를 ops번 실행해 지연 분위수와 처리량을 잽니다. workers>1이면 동시에 실행합니다.
+    op가 False를 반환하거나 예외를 던지면 오류로 셉니다.
+    측정 잡음을 줄이려고 rounds번 반복해 처리량이 가장 좋은 회차를 씁니다. (timeit과 같은 방식)
+    """
+    stub_clients.configure(**(stub_options or {}))
+    for i in range(warmup):
+        op(-1 - i)
+    best = None
+    for _ in range(rounds):
+        stub_clients.configure(**(stub_options or {}))
+        result = _measure_round(name, tier, op, ops, workers)
+        if best is None or result["throughput_ops"] > best["throughput_ops"]:
+            best = result
+    best["rounds"] = rounds
+    return best
+
+
+def _measure_round(name, tier, op, ops, workers):
+    web_search.search_cache.clear()
+    page_fetch.page_fetcher.cache.clear()
+    metrics.reset()
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            ok = op(i) is not False
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            samples = list(pool.map(timed, range(ops)))
+    else:
+        samples = [timed(i) for i in range(ops)]
+    wall = time.perf_counter() - started
+
+    latencies = sorted(s for s, _ in samples)
+    result = {
+        "name": name,
+        "tier": tier,
+        "ops": ops,
+        "workers": workers,
+        "errors": sum(1 for _, ok in samples if not ok),
+        "wall_sec": round(wall, 4),
+        "throughput_ops": round(ops / wall, 2) if wall else 0.0,
+        "p50_ms": round(quantile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(quantile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(quantile(latencies, 0.99) * 1000, 3),
+    }
+    # 파이프라인 시나리오는 어느 단계가 느린지도 함께 남깁니다. (비교 대상은 아님)
+    stages = {row["stage"]: round(row["p95"] * 1000, 3) for row in metrics.summary()}
+    if stages:
+        result["stage_p95_ms"] = stages
+    return result
+
+
+def _history_fixture(entry_count, items_per_entry=CEP_COUNT):
+    # 임시 DB에 기록 entry_count개를 채웁니다. (제품명 100종, 매체 4종을 돌려가며)
+    tmpdir = tempfile.mkdtemp(prefix="cep-bench-")
+    store = HistoryStore(os.path.join(tmpdir, "history.sqlite3"))
+    items = extract_json_from_text(_items(items_per_entry))
+    platforms = ["SNS 숏폼 (릴스/틱톡)", "SNS 피드 (인스타/페북)", "GFA/배너 (네이버/카카오)", "검색광고 (TDA)"]
+    for i in range(entry_count):
+        entry = _entry(items, product=f"제품{i % 100:03d}")
+        entry["platform"] = platforms[i % len(platforms)]
+        store.add(entry)
+    return store
+
+
+def scenarios(tier):
+    """(이름, 등급, 실행 함수) 목록. 실행 함수는 measure() 결과를 돌려줍니다."""
+    realistic_text = _items(CEP_COUNT)
+    realistic_items = extract_json_from_text(realistic_text)
+    realistic_copy = " ".join(v for item in realistic_items for v in item.values()) + " 최고의 효과, 100% 보장"
+
+    yield "pipeline_sequential", "realistic", lambda: measure(
+        "pipeline_sequential", "realistic", lambda i: run_pipeline(f"순차 제품 {i}"), 20,
+        stub_options=REALISTIC_STUB)
+    yield "pipeline_cached_search", "realistic", lambda: measure(
+        "pipeline_cached_search", "realistic", lambda i: run_pipeline(f"같은 제품 {i % 2}"), 20,
+        stub_options=REALISTIC_STUB)
+    yield "pipeline_enrich_pages", "realistic", lambda: measure(
+        "pipeline_enrich_pages", "realistic", lambda i: run_pipeline(f"원문 제품 {i}", enrich_pages=True), 20,
+        stub_options=PAGES_STUB)
+    yield "parse_realistic", "realistic", lambda: measure(
+        "parse_realistic", "realistic", lambda i: extract_json_from_text(realistic_text), 500)
+    yield "compliance_realistic", "realistic", lambda: measure(
+        "compliance_realistic", "realistic", lambda i: check_compliance_risks(realistic_copy), 2000)
+    yield "export_entry_xlsx", "realistic", lambda: measure(
+        "export_entry_xlsx", "realistic", lambda i: entry_to_xlsx_bytes(_entry(realistic_items)), 30)
+    yield "export_entry_csv", "realistic", lambda: measure(
+        "export_entry_csv", "realistic", lambda i: entry_to_csv_bytes(_entry(realistic_items)), 300)
+
+    if tier == "realistic":
+        return
+
+    large_text = _items(1000, field_size=400)
+    large_items = extract_json_from_text(large_text)
+    large_copy = realistic_copy * 400   # 약 200KB
+
+    yield "pipeline_concurrent_users", "stress", lambda: measure(
+        "pipeline_concurrent_users", "stress", lambda i: run_pipeline(f"동시 사용자 제품 {i}"), 64, workers=32,
+        stub_options=REALISTIC_STUB)
+    yield "pipeline_burst_same_product", "stress", lambda: measure(
+        "pipeline_burst_same_product", "stress", lambda i: run_pipeline("캠페인 제품"), 32, workers=32, warmup=0,
+        stub_options=REALISTIC_STUB)
+    yield "pipeline_faults", "stress", lambda: measure(
+        "pipeline_faults", "stress", lambda i: run_pipeline(f"장애 제품 {i}"), 40, workers=4,
+        stub_options=FAULTY_STUB)
+    yield "pipeline_enrich_heavy_pages", "stress", lambda: measure(
+        "pipeline_enrich_heavy_pages", "stress", lambda i: run_pipeline(f"큰 원문 제품 {i}", enrich_pages=True), 16,
+        workers=8, warmup=0, rounds=1, stub_options=HEAVY_PAGES_STUB)
+    yield "parse_large", "stress", lambda: measure(
+        "parse_large", "stress", lambda i: extract_json_from_text(large_text), 5)
+    yield "parse_large_malformed", "stress", lambda: measure(
+        "parse_large_malformed", "stress", lambda i: salvage_json_from_text(stub_clients.corrupt_output(large_text)), 5)
+    yield "compliance_large", "stress", lambda: measure(
+        "compliance_large", "stress", lambda i: check_compliance_risks(large_copy), 10)
+    yield "export_entry_large_xlsx", "stress", lambda: measure(
+        "export_entry_large_xlsx", "stress", lambda i: entry_to_xlsx_bytes(_entry(large_items)), 3, warmup=0, rounds=1)
+
+    fixture = {}
+
+    def history():
+        # 기록 3000개짜리 DB는 처음 쓰는 시나리오에서 한 번만 만듭니다.
+        if "store" not in fixture:
+            fixture["store"] = _history_fixture(3000)
+        return fixture["store"]
+
+    def combined(fmt):
+        return lambda i: build_combined_export(history().iter_entries(), fmt)
+
+    def history_page(i):
+        # 필터 없이/제품명 접두어/매체 필터로 앞쪽 몇 페이지를 넘겨 봅니다.
+        product = None if i % 3 == 0 else f"제품{i % 100:03d}"
+        platform = "검색광고 (TDA)" if i % 3 == 2 else None
+        cursor = None
+        for _ in range(3):
+            rows, has_next = history().list_page(cursor, product=product, platform=platform)
+            if not has_next:
+                break
+            cursor = rows[-1]["id"]
+
+    yield "export_combined_csv_3000", "stress", lambda: measure(
+        "export_combined_csv_3000", "stress", combined("csv"), 3, warmup=0, rounds=1)
+    yield "export_combined_xlsx_3000", "stress", lambda: measure(
+        "export_combined_xlsx_3000", "stress", combined("xlsx"), 2, warmup=0, rounds=1)
+    yield "history_pages_3000", "stress", lambda: measure(
+        "history_pages_3000", "stress", history_page, 300)
+
+
+# -----------------------------------------------------------------------------
+# 기준값 비교
+# -----------------------------------------------------------------------------
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=MIN_DELTA_MS):
+    """기준값 대비 느려진 시나리오 목록. 기준값에 없는 시나리오는 비교하지 않습니다."""
+    regressions = []
+    for result in results:
+        base = baseline.get(result["name"])
+        if not base:
+            continue
+        p95_limit = base["p95_ms"] * (1 + tolerance) + min_delta_ms
+        if result["p95_ms"] > p95_limit:
+            regressions.append(f"{result['name']}: p95 {result['p95_ms']}ms > 허용 {p95_limit:.3f}ms (기준 {base['p95_ms']}ms)")
+        throughput_limit = base["throughput_ops"] / (1 + tolerance)
+        if result["throughput_ops"] < throughput_limit:
+            regressions.append(f"{result['name']}: 처리량 {result['throughput_ops']}/s < 허용 {throughput_limit:.2f}/s "
+                               f"(기준 {base['throughput_ops']}/s)")
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("scenarios", {})
+
+
+def save_baseline(path, results):
+    # 일부 시나리오만 실행했으면 나머지 기준값은 그대로 둡니다.
+    keep = ("tier", "ops", "workers", "throughput_ops", "p50_ms", "p95_ms", "p99_ms")
+    scenarios = load_baseline(path)
+    scenarios.update({r["name"]: {k: r[k] for k in keep} for r in results})
+    payload = {
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": {"python": platform_info.python_version(), "machine": platform_info.machine(),
+                        "cpus": os.cpu_count()},
+        "scenarios": dict(sorted(scenarios.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CEP 파이프라인 오프라인 벤치마크")
+    parser.add_argument("--tier", choices=["realistic", "stress", "all"], default="all")
+    parser.add_argument("--only", help="쉼표로 구분한 문자열 중 하나라도 이름에 들어간 시나리오만 실행")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="기준값 JSON 파일")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="허용 변화율 (기본 0.5)")
+    parser.add_argument("--save-baseline", action="store_true", help="현재 결과를 기준값으로 저장 (비교하지 않음)")
+    parser.add_argument("-o", "--output", help="결과 JSON을 파일로도 저장")
+    args = parser.parse_args(argv)
+
+    stub_clients.install()
+    # 단계별 이벤트 로그(기본 stderr)는 결과 표를 가리고 측정에도 섞이므로 따로 지정하지 않았으면 끕니다.
+    if not os.environ.get("CEP_METRICS_LOG_PATH"):
+        logging.getLogger("cep.metrics").setLevel(logging.WARNING)
+    # 서비스 계층의 속도 제한은 끄고, 재시도 대기는 짧게 (측정 대상은 파이프라인 자체)
+    for guard in services.values():
+        guard.configure(rate=None, burst=1, max_attempts=3, base_delay=0.01, max_delay=0.05,
+                        failure_threshold=1000, reset_timeout=0.5)
+
+    only = [s.strip() for s in args.only.split(",")] if args.only else None
+    tier = "stress" if args.tier == "all" else args.tier
+    results = []
+    for name, scenario_tier, run in scenarios(tier):
+        if args.tier == "stress" and scenario_tier != "stress":
+            continue
+        if only and not any(s in name for s in only):
+            continue
+        result = run()
+        results.append(result)
+        print(f"{name:32s} p50 {result['p50_ms']:>10.3f}ms  p95 {result['p95_ms']:>10.3f}ms  "
+              f"p99 {result['p99_ms']:>10.3f}ms  {result['throughput_ops']:>9.2f}/s  errors {result['errors']}",
+              file=sys.stderr)
+
+    report = {"results": results}
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        report["baseline_saved"] = args.baseline
+        regressions = []
+    else:
+        regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+        report["regressions"] = regressions
+        for line in regressions:
+            print(f"🚨 {line}", file=sys.stderr)
+
+    print(json.dumps(report, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
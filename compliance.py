@@ -0,0 +1,192 @@
+import os
+import threading
+from collections import deque
+
+# -----------------------------------------------------------------------------
+# 심의 반려 위험 표현 검사 (Aho-Corasick)
+# -----------------------------------------------------------------------------
+# 사전 크기와 상관없이 텍스트 길이에 비례하는 시간으로 모든 표현을 한 번에 찾습니다.
+COMPLIANCE_TERMS_PATH = os.environ.get(
+    "CEP_COMPLIANCE_TERMS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "compliance_terms.txt"),
+)
+
+
+def _normalize(text):
+    """
+    공백을 지우고 소문자로 바꾼 문자열과, 각 글자의 원래 위치 리스트를 반환합니다.
+    띄어쓰기 변형('부작용 없' / '부작용없')을 같은 표현으로 보기 위함입니다.
+    (띄어쓰기가 없는 표현이 단어 경계를 넘어 잡히는 것은 ComplianceScanner.scan에서 걸러냅니다.)
+    """
+    chars, positions = [], []
+    for idx, c in enumerate(text):
+        if c.isspace():
+            continue
+        # 'İ'.lower()처럼 소문자가 두 글자 이상이 되는 문자도 있어, 글자마다 원래 위치를 붙입니다.
+        for lowered in c.lower():
+            chars.append(lowered)
+            positions.append(idx)
+    return "".join(chars), positions
+
+
+class AhoCorasick:
+    """여러 문자열 패턴을 한 번의 순회로 찾는 오토마톤. payload는 패턴마다 붙는 임의의 값입니다."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for key, payload in patterns:
+            if key:
+                self._add(key, payload)
+        self._build()
+
+    def _add(self, key, payload):
+        state = 0
+        for c in key:
+            nxt = self._goto[state].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(key), payload))
+
+    def _build(self):
+        # BFS로 실패 링크를 만들고, 실패 링크 쪽의 출력도 미리 합쳐 둡니다.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(c, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text):
+        """(시작 위치, 끝 위치, payload)를 끝 위치 순서대로 돌려줍니다."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for idx, c in enumerate(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for length, payload in out[state]:
+                yield idx + 1 - length, idx + 1, payload
+
+
+def load_terms(path=COMPLIANCE_TERMS_PATH):
+    """사전 파일을 읽어 (표현, 분류, 예외 표현 튜플) 리스트를 반환합니다."""
+    terms = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            term, _, rest = line.partition("\t")
+            category, _, exceptions = rest.partition("\t")
+            exceptions = tuple(e.strip() for e in exceptions.split(",") if e.strip())
+            terms.append((term.strip(), category.strip() or "기타", exceptions))
+    return terms
+
+
+class ComplianceScanner:
+    def __init__(self, terms):
+        """terms: (표현, 분류) 또는 (표현, 분류, 예외 표현들) 리스트."""
+        self.terms = terms
+        patterns = []
+        for term, category, *rest in terms:
+            # 예외 표현('기적'에 대한 '정기적')은 같은 오토마톤에서 함께 찾고, 그 안에 든 매치는 버립니다.
+            patterns.append((_normalize(term)[0], (term, category, False)))
+            for exception in (rest[0] if rest else ()):
+                patterns.append((_normalize(exception)[0], (term, category, True)))
+        self._automaton = AhoCorasick(patterns)
+
+    def scan(self, text):
+        """
+        text에서 찾은 표현을 [{"term", "category", "start", "end"}, ...]로 반환합니다.
+        start/end는 원문 기준 위치이며, 겹치는 표현('최고'와 '최고급')도 모두 포함합니다.
+        띄어쓰기가 없는 표현은 한 단어 안에서만 찾고('최 고객'은 '최고' 아님),
+        사전에 예외로 적힌 더 긴 표현 안에 든 경우('정기적'의 '기적')는 빼고 돌려줍니다.
+        """
+        if not text:
+            return []
+        text = str(text)
+        normalized, positions = _normalize(text)
+        found, exceptions = [], []
+        for start, end, (term, category, is_exception) in self._automaton.iter_matches(normalized):
+            start, end = positions[start], positions[end - 1] + 1
+            if is_exception:
+                exceptions.append((start, end, term))
+            elif " " in term or not any(c.isspace() for c in text[start:end]):
+                found.append({"term": term, "category": category, "start": start, "end": end})
+        if exceptions:
+            found = [
+                m for m in found
+                if not any(term == m["term"] and start <= m["start"] and m["end"] <= end
+                           for start, end, term in exceptions)
+            ]
+        return found
+
+    def scan_many(self, texts):
+        """여러 텍스트를 한 번에 검사합니다. 입력과 같은 순서의 결과 리스트를 반환합니다."""
+        return [self.scan(text) for text in texts]
+
+
+_scanner_lock = threading.Lock()
+_scanner_cache = {}   # (path, mtime) -> ComplianceScanner
+
+
+def get_compliance_scanner(path=COMPLIANCE_TERMS_PATH):
+    """
+    사전 파일로 만든 스캐너를 프로세스 전체에서 공유합니다.
+    파일이 수정되면(mtime 변경) 다음 호출에서 다시 빌드합니다.
+    """
+    key = (path, os.path.getmtime(path))
+    with _scanner_lock:
+        scanner = _scanner_cache.get(key)
+        if scanner is None:
+            _scanner_cache.clear()
+            scanner = _scanner_cache[key] = ComplianceScanner(load_terms(path))
+        return scanner
+
+
+def check_compliance_risks(text):
+    """찾은 표현을 중복 없이 등장 순서대로 반환합니다."""
+    found = []
+    for match in get_compliance_scanner().scan(text):
+        if match["term"] not in found:
+            found.append(match["term"])
+    return found
+
+
+def scan_texts(texts):
+    """여러 텍스트를 한 번에 검사하는 일괄 API. 각 텍스트의 매치 리스트를 반환합니다."""
+    return get_compliance_scanner().scan_many(texts)
+
+
+def scan_cep_items(items):
+    """
+    CEP 리스트의 모든 필드를 검사합니다.
+    위험 표현이 있는 항목만 {CEP 순번: {필드명: [표현, ...]}} 형태로 반환합니다.
+    """
+    scanner = get_compliance_scanner()
+    report = {}
+    for idx, item in enumerate(items):
+        fields = {}
+        for field, value in item.items():
+            if not isinstance(value, str):
+                continue
+            terms = []
+            for match in scanner.scan(value):
+                if match["term"] not in terms:
+                    terms.append(match["term"])
+            if terms:
+                fields[field] = terms
+        if fields:
+            report[idx] = fields
+    return report
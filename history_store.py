@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+
+# -----------------------------------------------------------------------------
+# 전략 생성 기록 저장소 (팀 공용)
+# -----------------------------------------------------------------------------
+# 세션 메모리 대신 SQLite 파일에 저장하므로 재접속/재시작 후에도 남고 모든 세션이 공유합니다.
+HISTORY_DB_PATH = os.environ.get("CEP_HISTORY_DB_PATH", os.path.join("data", "history.sqlite3"))
+HISTORY_PAGE_SIZE = 10
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " timestamp TEXT NOT NULL, product TEXT NOT NULL, target TEXT,"
+                " platform TEXT, tone TEXT, item_count INTEGER NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_product ON history(product)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_platform ON history(platform)")
+
+    def add(self, entry):
+        """entry(timestamp, product, target, platform, tone, data)를 저장하고 id를 반환합니다."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO history (timestamp, product, target, platform, tone, item_count, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry["timestamp"], entry["product"], entry.get("target"), entry.get("platform"),
+                    entry.get("tone"), len(entry["data"]), json.dumps(entry["data"], ensure_ascii=False),
+                ),
+            )
+            return cur.lastrowid
+
+    def list_page(self, before_id=None, limit=HISTORY_PAGE_SIZE, product=None, platform=None):
+        """
+        최신순으로 한 페이지의 요약(data 제외)을 반환합니다.
+        before_id를 주면 그보다 오래된 항목부터 읽습니다. (keyset 방식이라 기록이 많아도 비용이 일정)
+        반환값: (요약 리스트, 다음 페이지 존재 여부)
+        """
+        rows = self._select(
+            "id, timestamp, product, target, platform, tone, item_count", before_id, limit + 1, product, platform
+        )
+        return rows[:limit], len(rows) > limit
+
+    def iter_entries(self, product=None, platform=None, batch_size=100):
+        """
+        조건에 맞는 기록을 data까지 포함해 최신순으로 하나씩 돌려줍니다.
+        batch_size개씩 나눠 읽으므로 전체 기록을 한 번에 메모리에 올리지 않습니다.
+        """
+        before_id = None
+        while True:
+            rows = self._select("*", before_id, batch_size, product, platform)
+            for entry in rows:
+                entry["data"] = json.loads(entry["data"])
+                yield entry
+            if len(rows) < batch_size:
+                return
+            before_id = rows[-1]["id"]
+
+    def _select(self, columns, before_id, limit, product, platform):
+        where, params = [], []
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        if product:
+            # 접두어 검색. 범위 조건이라 product 인덱스를 그대로 탑니다.
+            where.append("product >= ? AND product < ?")
+            params += [product, product + "\U0010ffff"]
+        if platform:
+            where.append("platform = ?")
+            params.append(platform)
+        sql = f"SELECT {columns} FROM history"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params)]
+
+    def get(self, entry_id):
+        """data까지 포함한 기록 하나를 반환합니다. 없으면 None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM history WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["data"] = json.loads(entry["data"])
+        return entry
+
+
+history_store = HistoryStore()
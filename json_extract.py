@@ -0,0 +1,219 @@
+import json
+import re
+
+from metrics import metrics
+
+# 문자열 안에서 의미가 있는 글자(닫는 따옴표, 이스케이프). 그 사이는 한 번에 건너뜁니다.
+_STRING_STOP = re.compile(r'["\\]')
+
+
+class IncrementalJSONArrayParser:
+    """
+    AI 출력 텍스트에서 최상위 JSON 배열의 객체를 한 글자씩, 한 번만 훑으며 꺼냅니다.
+    - feed(): 스트리밍 조각을 넣을 때마다 새로 완성된 객체 리스트를 반환
+    - finish(): 입력이 끝난 뒤 잘린 객체까지 정리하고 유실된 순번(lost)을 확정
+    객체 안의 끝 쉼표(trailing comma)와 코드펜스(```) 같은 흔한 오류는 고쳐서 읽고,
+    그래도 깨진 객체는 건너뛰되 몇 번째 객체였는지 self.lost에 기록합니다.
+    순번은 객체가 시작된 위치로 매기고, 배열을 여는 '[' 앞의 서론은 세지 않습니다.
+    닫는 괄호나 따옴표가 빠진 객체는 다음 객체의 시작('{' 또는 '},{"')에서 끊고 다시 맞춥니다.
+    """
+
+    def __init__(self):
+        self.count = 0           # 지금까지 시작된 최상위 객체 수 (성공 + 실패)
+        self.lost = []           # 복구하지 못한 객체의 순번 (0부터)
+        self._chars = []         # 현재 읽고 있는 객체의 (정리된) 문자들
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._pending_comma = False
+        self._prev = ""          # 객체 안, 문자열 밖에서 마지막으로 본 공백 아닌 문자
+        self._string_start = 0   # 현재 문자열 내용이 self._chars에서 시작하는 위치
+        self._array = "before"   # 배열 상태: before -> candidate('[' 직후) -> open -> closed
+
+    def feed(self, chunk):
+        items = []
+        chars = self._chars
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._depth == 0:
+                self._feed_outside(chunk[i])
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    chars.append(chunk[i])
+                    self._escape = False
+                    i += 1
+                    continue
+                match = _STRING_STOP.search(chunk, i)
+                if match is None:
+                    chars.append(chunk[i:])
+                    break
+                j = match.start()
+                if j > i:
+                    chars.append(chunk[i:j])
+                chars.append(chunk[j])
+                i = j + 1
+                if chunk[j] == '\\':
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    if self._swallowed_next_object():
+                        # 따옴표가 빠져 문자열이 다음 객체까지 먹은 경우: 다음 객체부터 다시 읽습니다.
+                        self._restart_object(in_key=True)
+                continue
+
+            c = chunk[i]
+            i += 1
+            if c == '`':
+                continue
+            if c in ' \t\r\n':
+                chars.append(c)
+                continue
+            if c == ',':
+                self._pending_comma = True
+                self._prev = c
+                continue
+            if c == '{' and self._depth == 1 and self._prev != ':':
+                # 객체 바로 안에서 값이 아닌 자리에 '{'가 나오면 닫는 괄호가 빠진 것: 여기서 새 객체를 시작합니다.
+                self._restart_object()
+                continue
+            if self._pending_comma:
+                # '}' 또는 ']' 바로 앞의 쉼표는 버립니다.
+                if c not in '}]':
+                    chars.append(',')
+                self._pending_comma = False
+
+            chars.append(c)
+            self._prev = c
+            if c == '"':
+                self._in_string = True
+                self._string_start = len(chars)
+            elif c in '{[':
+                self._depth += 1
+            elif c in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    item = self._close_object()
+                    if item is not None:
+                        items.append(item)
+        return items
+
+    def finish(self, expected_count=None):
+        """
+        입력이 끝났음을 알립니다. 닫히지 않은 객체는 유실로 처리하고,
+        expected_count보다 적게 나왔으면 나머지 순번도 lost에 추가합니다.
+        """
+        if self._depth > 0:
+            self.lost.append(self.count - 1)
+            self._reset_object()
+        if expected_count is not None and self.count < expected_count:
+            self.lost.extend(range(self.count, expected_count))
+            self.count = expected_count
+        if self.lost:
+            metrics.incr("parse_lost_items", len(self.lost))
+        if self.count == len(self.lost):
+            metrics.incr("parse_failures")
+        return self.lost
+
+    def _feed_outside(self, c):
+        # 객체 바깥: 배열을 여는 '['를 찾은 뒤부터 '{'를 객체 시작으로 봅니다.
+        # '[' 다음 첫 글자가 '{'나 ']'가 아니면 ("[입력 정보]" 같은) 서론의 괄호로 봅니다.
+        if self._array == "before":
+            if c == '[':
+                self._array = "candidate"
+        elif self._array == "candidate":
+            if c == '{':
+                self._array = "open"
+                self._start_object()
+            elif c == ']':
+                self._array = "closed"
+            elif c not in ' \t\r\n':
+                self._array = "candidate" if c == '[' else "before"
+        elif self._array == "open":
+            if c == '{':
+                self._start_object()
+            elif c == ']':
+                self._array = "closed"
+
+    def _start_object(self):
+        self._reset_object()
+        self.count += 1
+        self._depth = 1
+        self._chars.append('{')
+        self._prev = '{'
+
+    def _restart_object(self, in_key=False):
+        self.lost.append(self.count - 1)
+        self._start_object()
+        if in_key:
+            self._chars.append('"')
+            self._prev = '"'
+            self._in_string = True
+            self._string_start = len(self._chars)
+
+    def _swallowed_next_object(self):
+        # 방금 닫힌 문자열이 (공백 무시) '},{'로 끝나면 다음 객체의 시작까지 문자열로 읽은 것입니다.
+        content = "".join(self._chars[self._string_start:-1])
+        return "".join(content[-64:].split()).endswith("},{")
+
+    def _close_object(self):
+        index = self.count - 1
+        text = "".join(self._chars)
+        self._reset_object()
+        try:
+            # strict=False: 문자열 안의 줄바꿈 같은 제어문자를 허용
+            item = json.loads(text, strict=False)
+        except ValueError:
+            self.lost.append(index)
+            return None
+        if not isinstance(item, dict):
+            self.lost.append(index)
+            return None
+        return item
+
+    def _reset_object(self):
+        self._chars.clear()
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._pending_comma = False
+        self._prev = ""
+        self._string_start = 0
+
+
+def salvage_json_from_text(text, expected_count=None):
+    """
+    깨진 부분이 있어도 온전한 객체는 모두 살려냅니다.
+    (살린 객체 리스트, 유실된 순번 리스트)를 반환합니다.
+    """
+    with metrics.timed("parse", chars=len(text)) as event:
+        parser = IncrementalJSONArrayParser()
+        items = parser.feed(text)
+        lost = parser.finish(expected_count)
+        event.update(items=len(items), lost=len(lost))
+    return items, lost
+
+
+def extract_json_from_text(text):
+    items, lost = salvage_json_from_text(text)
+    if not items:
+        raise Exception(f"JSON 파싱 실패: 읽을 수 있는 항목이 없습니다. (유실 {len(lost)}건)")
+    return items
+
+
+def merge_salvaged_items(items, lost, replacements):
+    """
+    살린 객체(items)와 다시 생성한 객체(replacements)를 원래 순번대로 합칩니다.
+    replacements가 모자라면 채우지 못한 순번은 빠집니다.
+    """
+    lost_set = set(lost)
+    total = len(items) + len(lost)
+    kept, extra = iter(items), iter(replacements)
+    merged = []
+    for idx in range(total):
+        item = next(extra, None) if idx in lost_set else next(kept, None)
+        if item is not None:
+            merged.append(item)
+    return merged
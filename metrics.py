@@ -0,0 +1,155 @@
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# -----------------------------------------------------------------------------
+# 단계별 소요 시간 / 토큰 / 캐시 지표
+# -----------------------------------------------------------------------------
+# 모든 세션이 같은 레지스트리에 기록합니다.
+# 이벤트 하나하나는 JSON 한 줄로 'cep.metrics' 로거에 남기고(기본은 stderr, CEP_METRICS_LOG_PATH로 파일 지정),
+# 집계는 관리자 탭의 p50/p95/p99 표와 Prometheus 텍스트로 봅니다.
+# 이벤트 로그를 끄려면 logging.getLogger("cep.metrics").setLevel(logging.WARNING).
+METRICS_SAMPLE_SIZE = 2048   # 단계별로 보관하는 최근 측정값 수 (분위수 계산용)
+METRICS_LOG_PATH = os.environ.get("CEP_METRICS_LOG_PATH")
+QUANTILES = (0.5, 0.95, 0.99)
+
+logger = logging.getLogger("cep.metrics")
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    if METRICS_LOG_PATH:
+        _handler = logging.FileHandler(METRICS_LOG_PATH, encoding="utf-8")
+    else:
+        _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    # 루트 로거 설정(Streamlit 등)에 따라 같은 이벤트가 두 번 찍히지 않게 합니다.
+    logger.propagate = False
+
+
+class _StageStats:
+    def __init__(self, sample_size):
+        self.samples = deque(maxlen=sample_size)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+
+class MetricsRegistry:
+    def __init__(self, sample_size=METRICS_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._stages = {}     # 단계 이름 -> _StageStats
+        self._counters = {}   # 카운터 이름 -> 누적값
+
+    @contextmanager
+    def timed(self, stage, **fields):
+        """
+        with 블록의 소요 시간을 stage로 기록합니다.
+        블록 안에서 넘겨받은 dict에 값을 넣으면 같은 이벤트의 필드로 로그에 남습니다.
+        """
+        fields = dict(fields)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield fields
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started, status, **fields)
+
+    def observe(self, stage, seconds, status="ok", **fields):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = _StageStats(self.sample_size)
+            stats.samples.append(seconds)
+            stats.count += 1
+            stats.total += seconds
+            if status != "ok":
+                stats.errors += 1
+        log_event(stage, duration_ms=round(seconds * 1000, 1), status=status, **fields)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def summary(self):
+        """단계별 호출 수, 오류 수, 평균/p50/p95/p99/최대(초) 리스트."""
+        with self._lock:
+            stages = {name: (sorted(s.samples), s.count, s.total, s.errors) for name, s in self._stages.items()}
+        rows = []
+        for name, (samples, count, total, errors) in sorted(stages.items()):
+            row = {"stage": name, "count": count, "errors": errors, "mean": total / count if count else 0.0}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}"] = quantile(samples, q)
+            row["max"] = samples[-1] if samples else 0.0
+            rows.append(row)
+        return rows
+
+    def counters(self):
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def prometheus_text(self):
+        """Prometheus 텍스트 포맷(summary + counter)으로 현재 지표를 돌려줍니다."""
+        lines = [
+            "# HELP cep_stage_duration_seconds Wall time per pipeline stage (recent samples).",
+            "# TYPE cep_stage_duration_seconds summary",
+        ]
+        summary = self.summary()
+        for row in summary:
+            label = _escape_label(row["stage"])
+            for q in QUANTILES:
+                lines.append(f'cep_stage_duration_seconds{{stage="{label}",quantile="{q}"}} {row[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'cep_stage_duration_seconds_sum{{stage="{label}"}} {row["mean"] * row["count"]:.6f}')
+            lines.append(f'cep_stage_duration_seconds_count{{stage="{label}"}} {row["count"]}')
+        lines += ["# HELP cep_stage_errors_total Stage executions that raised.", "# TYPE cep_stage_errors_total counter"]
+        for row in summary:
+            lines.append(f'cep_stage_errors_total{{stage="{_escape_label(row["stage"])}"}} {row["errors"]}')
+        for name, value in self.counters().items():
+            lines.append(f"# TYPE cep_{name}_total counter")
+            lines.append(f"cep_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+
+def quantile(sorted_samples, q):
+    # nearest-rank 방식
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[max(math.ceil(q * len(sorted_samples)) - 1, 0)]
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def log_event(event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, ensure_ascii=False, default=str))
+
+
+def record_usage(response):
+    """Gemini 응답(또는 스트림의 마지막 조각)의 usage_metadata로 토큰 수를 누적합니다."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    response_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    metrics.incr("gemini_prompt_tokens", prompt_tokens)
+    metrics.incr("gemini_response_tokens", response_tokens)
+    return {"prompt_tokens": prompt_tokens, "response_tokens": response_tokens}
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from metrics import metrics
+
+# -----------------------------------------------------------------------------
+# 모델 선택 설정
+# -----------------------------------------------------------------------------
+MODEL_CACHE_TTL_SEC = 6 * 60 * 60
+# 우선순위 (Flash -> Pro -> 1.0). 목록에 없으면 첫 번째 텍스트 모델을 씁니다.
+MODEL_PREFERENCE = ["gemini-1.5-flash", "gemini-1.5-pro", "gemini-pro"]
+
+
+class ModelResolver:
+    """
+    사용할 Gemini 모델 이름을 프로세스 전체에서 공유합니다.
+    list_models()는 TTL이 지났거나 invalidate()된 뒤에만 다시 호출합니다.
+    """
+
+    def __init__(self, ttl=MODEL_CACHE_TTL_SEC):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._configured_key = None
+        self._model = None
+        self._resolved_at = 0.0
+
+    def configure(self, api_key):
+        if api_key != self._configured_key:
+            genai.configure(api_key=api_key)
+            self._configured_key = api_key
+
+    def resolve(self, api_key, pinned_model=None):
+        """모델의 '정확한 이름(models/gemini-xxx)'을 반환합니다. 찾지 못하면 None."""
+        with self._lock:
+            self.configure(api_key)
+
+            # Secrets에 모델이 지정되어 있으면 조회 없이 그대로 사용
+            if pinned_model:
+                return pinned_model
+
+            if self._model and time.monotonic() - self._resolved_at < self.ttl:
+                return self._model
+
+            try:
+                model = _pick_model(genai.list_models())
+            except Exception:
+                return None
+            # 실패(None)는 캐시하지 않아 다음 요청에서 다시 시도합니다.
+            if model:
+                self._model = model
+                self._resolved_at = time.monotonic()
+            return model
+
+    def invalidate(self):
+        with self._lock:
+            self._model = None
+            self._resolved_at = 0.0
+
+
+def _pick_model(models):
+    # 'generateContent'를 지원하는 모델 중 우선순위가 가장 높은 것을 한 번의 순회로 고릅니다.
+    best, best_rank, first = None, len(MODEL_PREFERENCE), None
+    for m in models:
+        if 'generateContent' not in m.supported_generation_methods:
+            continue
+        if first is None:
+            first = m.name
+        for rank, pattern in enumerate(MODEL_PREFERENCE[:best_rank]):
+            if pattern in m.name:
+                best, best_rank = m.name, rank
+                break
+        if best_rank == 0:
+            break
+    return best or first
+
+
+def is_model_not_found_error(exc):
+    if isinstance(exc, google_exceptions.NotFound):
+        return True
+    message = str(exc).lower()
+    return "404" in message and "model" in message
+
+
+model_resolver = ModelResolver()
+
+
+def get_best_available_model(api_key, pinned_model=None):
+    """
+    [핵심 수정] 사용 가능한 모델 목록을 조회해서
+    가장 좋은 모델의 '정확한 이름'을 가져옵니다. (404 에러 방지)
+    결과는 공유 캐시에 저장되어 매 요청마다 list_models()를 부르지 않습니다.
+    """
+    with metrics.timed("model_resolve", pinned=bool(pinned_model)) as event:
+        event["model"] = model_resolver.resolve(api_key, pinned_model)
+    return event["model"]
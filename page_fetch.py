@@ -0,0 +1,298 @@
+import ipaddress
+import os
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+from search_cache import SearchCache
+
+# -----------------------------------------------------------------------------
+# 검색 결과 원문 페이지 수집 (선택 기능)
+# -----------------------------------------------------------------------------
+# DDGS 요약(body)은 한두 문장뿐이라, 상위 결과 몇 개는 실제 페이지를 받아 본문을 뽑아 씁니다.
+# 연결은 프로세스 공용 세션(keep-alive 풀)을 쓰고, 전체 대기 시간은 PAGE_FETCH_DEADLINE_SEC를 넘지 않습니다.
+PAGE_FETCH_TOP_K = 3                   # 본문을 받아올 상위 결과 수
+PAGE_FETCH_DEADLINE_SEC = 4.0          # 본문 수집 단계 전체 제한 시간 (넘으면 받은 것만 사용)
+PAGE_FETCH_TIMEOUT = (2.0, 3.0)        # (연결, 읽기) 제한 시간
+PAGE_FETCH_MAX_BYTES = 512 * 1024      # 페이지당 최대 다운로드 크기
+PAGE_FETCH_MAX_WORKERS = 8
+PAGE_FETCH_PER_HOST = 2                # 같은 호스트에 동시에 보내는 요청 수
+PAGE_FETCH_MAX_REDIRECTS = 3           # 따라갈 리다이렉트 수 (hop마다 주소를 다시 검사)
+PAGE_TEXT_MAX_CHARS = 2000             # 페이지당 보관할 본문 길이
+PAGE_CACHE_PATH = os.environ.get("CEP_PAGE_CACHE_PATH", os.path.join(".cache", "page_cache.sqlite3"))
+PAGE_CACHE_TTL_SEC = 24 * 60 * 60
+PAGE_USER_AGENT = "Mozilla/5.0 (compatible; CEP-Strategy-Bot/1.0)"
+
+
+# -----------------------------------------------------------------------------
+# 본문 추출 (표준 라이브러리 HTMLParser)
+# -----------------------------------------------------------------------------
+_SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe", "button"}
+_BLOCK_TAGS = {"p", "li", "h1", "h2", "h3", "h4", "blockquote", "td", "div", "section", "article", "main", "br"}
+_VOID_TAGS = {"br", "img", "hr", "meta", "link", "input", "source", "wbr"}
+MIN_BLOCK_CHARS = 25                   # 이보다 짧은 덩어리(메뉴, 버튼 글자 등)는 버림
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []            # (article/main 안인지, 텍스트)
+        self._buffer = []
+        self._skip_depth = 0
+        self._main_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            if tag == "br":
+                self._flush()
+            return
+        if self._skip_depth or tag in _SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag in ("article", "main"):
+            self._main_depth += 1
+        if tag in _BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS:
+            return
+        if self._skip_depth:
+            self._skip_depth -= 1
+            return
+        if tag in _BLOCK_TAGS:
+            self._flush()
+        if tag in ("article", "main") and self._main_depth:
+            self._main_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._buffer.append(data)
+
+    def _flush(self):
+        text = re.sub(r"\s+", " ", "".join(self._buffer)).strip()
+        self._buffer = []
+        if len(text) >= MIN_BLOCK_CHARS:
+            self.blocks.append((self._main_depth > 0, text))
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_main_text(html, max_chars=PAGE_TEXT_MAX_CHARS):
+    """
+    HTML에서 본문으로 보이는 문단만 이어 붙입니다.
+    <article>/<main>이 있으면 그 안의 문단만, 없으면 메뉴/광고 영역을 뺀 나머지 문단을 씁니다.
+    """
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # 깨진 HTML: 그때까지 모은 문단만 사용
+        pass
+    blocks = parser.blocks
+    if any(in_main for in_main, _ in blocks):
+        blocks = [b for b in blocks if b[0]]
+
+    parts, used, seen = [], 0, set()
+    for _, text in blocks:
+        if text in seen:
+            continue
+        seen.add(text)
+        if used + len(text) > max_chars:
+            parts.append(text[: max_chars - used])
+            break
+        parts.append(text)
+        used += len(text) + 1
+    return "\n".join(p for p in parts if p)
+
+
+# -----------------------------------------------------------------------------
+# 수집기
+# -----------------------------------------------------------------------------
+class BlockedURLError(ValueError):
+    """내부망 주소 등 받지 않는 URL. (검색 결과나 리다이렉트가 서버 내부를 가리키는 경우)"""
+
+
+class PageFetcher:
+    def __init__(self, cache=None, max_workers=PAGE_FETCH_MAX_WORKERS, per_host=PAGE_FETCH_PER_HOST,
+                 max_bytes=PAGE_FETCH_MAX_BYTES, timeout=PAGE_FETCH_TIMEOUT, allow_private_hosts=False,
+                 max_redirects=PAGE_FETCH_MAX_REDIRECTS):
+        self.cache = cache
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        # 내부망 주소(사설/루프백/링크로컬 IP로 풀리는 호스트)는 기본적으로 받지 않습니다. (로컬 테스트 서버용으로만 허용)
+        self.allow_private_hosts = allow_private_hosts
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page-fetch")
+        self._session = requests.Session()
+        self._session.headers.update({"User-Agent": PAGE_USER_AGENT, "Accept": "text/html,application/xhtml+xml"})
+        # 호스트별 keep-alive 연결 풀 (풀 크기 = 호스트당 동시 요청 수)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=per_host, max_retries=0)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._host_lock = threading.Lock()
+        self._host_slots = {}         # 호스트 -> [세마포어, 쓰는 중/기다리는 중인 요청 수] (아무도 안 쓰면 지움)
+
+    def fetch_text(self, url):
+        """
+        url의 본문 텍스트. 캐시에 있으면 바로 돌려줍니다.
+        HTML이 아니거나 본문이 없으면 ""(이 결과도 캐시), 네트워크 오류는 예외를 그대로 올립니다.
+        """
+        if self.cache is not None:
+            text = self.cache.get(url)
+            if text is not None:
+                metrics.incr("page_cache_hits")
+                return text
+            metrics.incr("page_cache_misses")
+
+        host = urlsplit(url).hostname or ""
+        with metrics.timed("page_fetch", host=host) as event:
+            html = self._download(url)
+            text = extract_main_text(html) if html else ""
+            event.update(bytes=len(html), chars=len(text))
+        if self.cache is not None:
+            self.cache.set(url, text)
+        return text
+
+    def fetch_many(self, urls, deadline=PAGE_FETCH_DEADLINE_SEC):
+        """
+        여러 url을 동시에 받아 {url: 본문}을 돌려줍니다. (본문이 있는 것만)
+        deadline이 지나면 기다리지 않고 그때까지 끝난 것만 씁니다.
+        늦게 끝난 요청도 자기 timeout 안에서 마무리되어 캐시에 남으므로 다음 요청에서 쓰입니다.
+        """
+        urls = [u for u in dict.fromkeys(urls) if urlsplit(u or "").scheme in ("http", "https")]
+        futures = {self._executor.submit(self.fetch_text, url): url for url in urls}
+        done, pending = wait(futures, timeout=deadline)
+        for fut in pending:
+            fut.cancel()
+        if pending:
+            metrics.incr("page_fetch_deadline_skipped", len(pending))
+
+        texts = {}
+        for fut in done:
+            try:
+                text = fut.result()
+            except BlockedURLError:
+                metrics.incr("page_fetch_blocked")
+                continue
+            except Exception:
+                metrics.incr("page_fetch_failures")
+                continue
+            if text:
+                texts[futures[fut]] = text
+        # 입력 순서(=검색 순위)를 유지합니다.
+        return {url: texts[url] for url in urls if url in texts}
+
+    def _download(self, url):
+        # 리다이렉트는 직접 따라가며, 매 hop마다 주소를 다시 검사합니다. (외부 주소 -> 내부 주소 우회 방지)
+        for _ in range(self.max_redirects + 1):
+            host = self._check_url(url)
+            with self._host_slot(host):
+                with self._session.get(url, timeout=self.timeout, stream=True, allow_redirects=False) as response:
+                    if response.is_redirect:
+                        url = urljoin(url, response.headers["Location"])
+                        continue
+                    return self._read_body(response)
+        raise requests.TooManyRedirects(f"리다이렉트가 {self.max_redirects}번을 넘었습니다: {url}")
+
+    def _read_body(self, response):
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "")
+        if "html" not in content_type and "text/plain" not in content_type:
+            return ""
+        body = bytearray()
+        started = time.monotonic()
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            body += chunk
+            # 크기 한도와 (느리게 흘려보내는 서버 대비) 전체 읽기 시간 한도
+            if len(body) >= self.max_bytes or time.monotonic() - started > sum(self.timeout):
+                break
+        encoding = response.encoding if "charset" in content_type.lower() else _sniff_charset(body)
+        # 크기 한도에서 잘린 마지막 글자(깨진 멀티바이트)는 버립니다.
+        return bytes(body[: self.max_bytes]).decode(encoding or "utf-8", errors="replace").rstrip("\ufffd")
+
+    @contextmanager
+    def _host_slot(self, host):
+        # 같은 호스트에 몰리는 요청은 읽기 제한 시간만큼만 자리를 기다립니다.
+        # 슬롯은 쓰는 요청이 없어지면 지워서, 호스트 수만큼 계속 쌓이지 않게 합니다.
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = [threading.BoundedSemaphore(self.per_host), 0]
+            slot[1] += 1
+        try:
+            if not slot[0].acquire(timeout=self.timeout[1]):
+                raise TimeoutError(f"{host}: 동시 요청 한도 대기 시간 초과")
+            try:
+                yield
+            finally:
+                slot[0].release()
+        finally:
+            with self._host_lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._host_slots[host]
+
+    def _check_url(self, url):
+        """받아도 되는 URL이면 호스트 이름을, 아니면 BlockedURLError를 돌려줍니다."""
+        parts = urlsplit(url or "")
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise BlockedURLError(f"http(s) URL이 아닙니다: {url}")
+        if not self.allow_private_hosts and not self._is_public_host(parts.hostname, parts.port):
+            raise BlockedURLError(f"내부망 주소는 받지 않습니다: {parts.hostname}")
+        return parts.hostname
+
+    def _is_public_host(self, host, port=None):
+        # 이름이 가리키는 모든 주소가 공인 IP여야 합니다. (하나라도 내부 주소면 거부)
+        # 연결할 때 이름을 다시 풀기 때문에 DNS 응답이 그 사이 바뀌는 경우까지 막지는 못합니다.
+        if host == "localhost" or host.endswith((".localhost", ".local")):
+            return False
+        infos = socket.getaddrinfo(host, port or 443, type=socket.SOCK_STREAM)
+        for info in infos:
+            address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+            if getattr(address, "ipv4_mapped", None):
+                address = address.ipv4_mapped
+            if not address.is_global:
+                return False
+        return bool(infos)
+
+
+def _sniff_charset(body):
+    match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', bytes(body[:4096]), re.I)
+    if match:
+        try:
+            return match.group(1).decode("ascii")
+        except UnicodeDecodeError:
+            pass
+    return "utf-8"
+
+
+page_fetcher = PageFetcher(cache=SearchCache(path=PAGE_CACHE_PATH, ttl=PAGE_CACHE_TTL_SEC, max_disk_entries=5000))
+
+
+def pick_top_urls(result_groups, k=PAGE_FETCH_TOP_K):
+    """검색 그룹들을 순위대로 번갈아 훑어 서로 다른 href를 최대 k개 고릅니다."""
+    urls = []
+    groups = [results or [] for results in result_groups]
+    for rank in range(max((len(g) for g in groups), default=0)):
+        for results in groups:
+            if rank < len(results):
+                href = results[rank].get("href")
+                if href and href not in urls:
+                    urls.append(href)
+                if len(urls) >= k:
+                    return urls
+    return urls
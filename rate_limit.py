@@ -0,0 +1,37 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    초당 rate개씩 토큰이 차는 버킷. 호출 전에 acquire()로 토큰을 하나 가져갑니다.
+    rate가 None이면 제한 없이 바로 통과합니다. 여러 스레드/세션이 같이 써도 안전합니다.
+    토큰은 먼저 온 순서대로 예약되므로(잔량이 음수가 될 수 있음) 대기 시간은 앞선 대기자 수로 정해집니다.
+    """
+
+    def __init__(self, rate=None, burst=1):
+        self._lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate=None, burst=1):
+        with self._lock:
+            self.rate = rate
+            self.burst = max(burst, 1)
+            self._tokens = float(self.burst)
+            self._updated_at = time.monotonic()
+
+    def acquire(self, timeout=None):
+        """토큰을 얻으면 True, timeout 안에 못 얻으면 (기다리지 않고 바로) False."""
+        with self._lock:
+            if self.rate is None:
+                return True
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            wait_sec = max(1 - self._tokens, 0) / self.rate
+            if timeout is not None and wait_sec > timeout:
+                return False
+            self._tokens -= 1
+        if wait_sec > 0:
+            time.sleep(wait_sec)
+        return True
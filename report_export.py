@@ -0,0 +1,171 @@
+import csv
+import hashlib
+import io
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from openpyxl import Workbook
+
+from compliance import get_compliance_scanner
+from strategy import CEP_FIELD_LABELS
+
+# -----------------------------------------------------------------------------
+# 리포트 내보내기 (CSV / XLSX)
+# -----------------------------------------------------------------------------
+# 다운로드 버튼을 그릴 때가 아니라 사용자가 눌렀을 때만 만들고,
+# 같은 내용은 해시로 기억해 두었다가 그대로 돌려줍니다.
+CSV_MIME = "text/csv"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+ENTRY_INFO_FIELDS = [("timestamp", "생성 시각"), ("product", "제품명"), ("target", "타겟"),
+                     ("platform", "매체"), ("tone", "톤")]
+
+
+class _BytesLRU:
+    """전체 크기(바이트) 한도가 있는 LRU."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self._size -= len(self._items.pop(key))
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._size -= len(old)
+
+
+_export_cache = _BytesLRU(EXPORT_CACHE_MAX_BYTES)
+
+
+def content_hash(entry):
+    payload = [entry.get(field) for field, _ in ENTRY_INFO_FIELDS] + [entry["data"]]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def entry_to_csv_bytes(entry):
+    return pd.DataFrame(entry["data"]).to_csv(index=False).encode('utf-8-sig')
+
+
+def entry_to_xlsx_bytes(entry):
+    """'CEP 전략', '심의 체크', '기본 정보' 세 시트로 된 엑셀 파일."""
+    data = entry["data"]
+    strategy_df = pd.DataFrame(data).rename(columns=CEP_FIELD_LABELS)
+    strategy_df.insert(0, "순번", range(1, len(data) + 1))
+
+    scanner = get_compliance_scanner()
+    risk_rows = []
+    for idx, item in enumerate(data):
+        for field, value in item.items():
+            if not isinstance(value, str):
+                continue
+            for match in scanner.scan(value):
+                risk_rows.append({
+                    "순번": idx + 1,
+                    "필드": CEP_FIELD_LABELS.get(field, field),
+                    "표현": match["term"],
+                    "분류": match["category"],
+                    "문맥": value[max(match["start"] - 10, 0): match["end"] + 10],
+                })
+    risk_df = pd.DataFrame(risk_rows, columns=["순번", "필드", "표현", "분류", "문맥"])
+
+    info_df = pd.DataFrame(
+        [(label, entry.get(field) or "") for field, label in ENTRY_INFO_FIELDS] + [("CEP 수", len(data))],
+        columns=["항목", "값"],
+    )
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        strategy_df.to_excel(writer, sheet_name="CEP 전략", index=False)
+        risk_df.to_excel(writer, sheet_name="심의 체크", index=False)
+        info_df.to_excel(writer, sheet_name="기본 정보", index=False)
+    return buffer.getvalue()
+
+
+_BUILDERS = {"csv": entry_to_csv_bytes, "xlsx": entry_to_xlsx_bytes}
+
+
+def export_entry(entry, fmt="xlsx"):
+    """기록 하나의 리포트 바이트. 같은 내용이면 다시 만들지 않고 캐시에서 돌려줍니다."""
+    key = (content_hash(entry), fmt)
+    data = _export_cache.get(key)
+    if data is None:
+        data = _BUILDERS[fmt](entry)
+        _export_cache.put(key, data)
+    return data
+
+
+# -----------------------------------------------------------------------------
+# 여러 기록 합본 (한 번에 한 기록씩 파일에 이어 씀)
+# -----------------------------------------------------------------------------
+COMBINED_COLUMNS = [label for _, label in ENTRY_INFO_FIELDS] + ["순번"] + list(CEP_FIELD_LABELS.values())
+
+
+def _combined_rows(entries):
+    for entry in entries:
+        info = [entry.get(field) or "" for field, _ in ENTRY_INFO_FIELDS]
+        for idx, item in enumerate(entry["data"]):
+            yield info + [idx + 1] + [item.get(field, "") for field in CEP_FIELD_LABELS]
+
+
+def iter_combined_csv(entries, rows_per_chunk=500):
+    """여러 기록을 합친 CSV를 bytes 조각으로 나눠 돌려줍니다. (BOM 포함, 엑셀 호환)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COMBINED_COLUMNS)
+    first = True
+    pending = 1
+    for row in _combined_rows(entries):
+        writer.writerow(row)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue().encode('utf-8-sig' if first else 'utf-8')
+            first = False
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending or first:
+        yield buffer.getvalue().encode('utf-8-sig' if first else 'utf-8')
+
+
+def write_combined_export(entries, fmt, fileobj):
+    """entries(이터레이터 가능)를 fileobj에 이어 씁니다. XLSX는 openpyxl write-only 모드로 행 단위 기록."""
+    if fmt == "csv":
+        for chunk in iter_combined_csv(entries):
+            fileobj.write(chunk)
+        return
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("CEP 전략 합본")
+    ws.append(COMBINED_COLUMNS)
+    for row in _combined_rows(entries):
+        ws.append(row)
+    wb.save(fileobj)
+
+
+def build_combined_export(entries, fmt="xlsx"):
+    """
+    합본을 임시 파일에 이어 쓴 뒤 bytes로 반환합니다. (만드는 동안 기록 전체를 메모리에 올리지 않음)
+    임시 파일은 반환 전에 닫히고 지워집니다.
+    (st.download_button에 callable로 넘기면 클릭했을 때만 만들어집니다)
+    """
+    with tempfile.TemporaryFile(suffix=f".{fmt}") as f:
+        write_combined_export(entries, fmt, f)
+        f.seek(0)
+        return f.read()
@@ -0,0 +1,260 @@
+import random
+import threading
+import time
+
+from duckduckgo_search.exceptions import RatelimitException, TimeoutException
+from google.api_core import exceptions as google_exceptions
+
+from rate_limit import TokenBucket
+
+# -----------------------------------------------------------------------------
+# 외부 서비스(DDGS, Gemini) 공용 호출 계층
+# -----------------------------------------------------------------------------
+# 모든 세션이 같은 인스턴스를 공유합니다.
+# 1) 토큰 버킷으로 호출 속도 제한 2) 일시적 오류는 지수 백오프 + 지터로 재시도
+# 3) 연속 실패가 쌓이면 서킷을 열어 일정 시간 동안 즉시 실패(fail fast)
+SERVICE_LIMITS = {
+    # rate: 초당 호출 수 (None = 무제한), burst: 순간 허용량
+    # failure_threshold: 서킷을 여는 연속 실패 요청 수 (재시도까지 모두 실패한 요청 1건 = 1회)
+    # reset_timeout: 서킷이 열려 있는 시간(초)
+    "ddgs": {"rate": 2.0, "burst": 4, "max_attempts": 2, "base_delay": 0.5, "max_delay": 4.0,
+             "failure_threshold": 5, "reset_timeout": 30.0},
+    "gemini": {"rate": 1.0, "burst": 5, "max_attempts": 4, "base_delay": 1.0, "max_delay": 20.0,
+               "failure_threshold": 5, "reset_timeout": 30.0},
+}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, service, retry_after):
+        super().__init__(f"{service} 서비스 일시 중단 (약 {retry_after:.0f}초 후 재시도)")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class RateLimitTimeoutError(TimeoutError):
+    """호출한 쪽 제한 시간(deadline) 안에 토큰을 얻지 못한 경우. 서비스 장애가 아니므로 재시도/실패 집계를 하지 않습니다."""
+
+    def __init__(self, service):
+        super().__init__(f"{service} 호출 대기열에서 제한 시간 초과")
+        self.service = service
+
+
+class CircuitBreaker:
+    """
+    closed: 정상 / open: reset_timeout 동안 모든 호출 즉시 실패 /
+    half-open: reset_timeout이 지나면 시험 호출 1건만 통과시켜 성공하면 closed로 복귀
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed < self.reset_timeout:
+                raise CircuitOpenError(self.name, self.reset_timeout - elapsed)
+            if self._trial_in_flight:
+                raise CircuitOpenError(self.name, 1.0)
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        # 서비스 장애와 무관한 오류(잘못된 요청 등)로 끝난 호출: 실패로 세지 않고 시험 슬롯만 반납
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class ServiceGuard:
+    def __init__(self, name, is_retryable, rate=None, burst=1, max_attempts=3, base_delay=1.0,
+                 max_delay=20.0, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.is_retryable = is_retryable
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0, "throttled": 0}
+
+    def configure(self, rate=None, burst=1, max_attempts=None, base_delay=None, max_delay=None,
+                  failure_threshold=None, reset_timeout=None):
+        self.limiter.configure(rate, burst)
+        if max_attempts is not None:
+            self.max_attempts = max_attempts
+        if base_delay is not None:
+            self.base_delay = base_delay
+        if max_delay is not None:
+            self.max_delay = max_delay
+        if failure_threshold is not None:
+            self.breaker.failure_threshold = failure_threshold
+        if reset_timeout is not None:
+            self.breaker.reset_timeout = reset_timeout
+
+    def settings(self):
+        """configure()에 그대로 다시 넘길 수 있는 현재 설정."""
+        return {
+            "rate": self.limiter.rate, "burst": self.limiter.burst, "max_attempts": self.max_attempts,
+            "base_delay": self.base_delay, "max_delay": self.max_delay,
+            "failure_threshold": self.breaker.failure_threshold, "reset_timeout": self.breaker.reset_timeout,
+        }
+
+    def call(self, fn, *args, deadline=None, **kwargs):
+        """
+        fn(*args, **kwargs)를 속도 제한/재시도/서킷 브레이커를 거쳐 호출합니다.
+        deadline(time.monotonic() 기준 시각)이 있으면 토큰 대기와 재시도 대기가 그 시각을 넘지 않으며,
+        토큰을 못 얻으면 RateLimitTimeoutError를 냅니다.
+        """
+        result = self._call_with_retries(fn, args, kwargs, deadline)
+        self.breaker.record_success()
+        return result
+
+    def call_stream(self, fn, *args, deadline=None, **kwargs):
+        """
+        스트리밍 응답을 돌려주는 fn용 call. 첫 응답까지는 call과 같고,
+        이후 조각을 읽다가 난 오류도 서킷 브레이커에 기록합니다. (성공은 스트림을 끝까지 읽은 시점)
+        """
+        response = self._call_with_retries(fn, args, kwargs, deadline)
+        return self._guard_stream(response)
+
+    def _call_with_retries(self, fn, args, kwargs, deadline=None):
+        # 서킷 브레이커는 재시도를 포함한 요청 1건당 한 번만 확인/기록합니다.
+        # (한 요청의 재시도만으로 서킷이 열려 다른 세션까지 막히지 않도록)
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if not self._acquire(deadline):
+                    raise RateLimitTimeoutError(self.name)
+                self._count("calls")
+                return fn(*args, **kwargs)
+            except RateLimitTimeoutError:
+                # 우리 쪽 대기열에서 시간이 다 된 것이라 재시도하지 않고, 앞선 시도가 실패했을 때만 실패로 셉니다.
+                self._count("throttled")
+                self._settle_failure(attempt > 1)
+                raise
+            except Exception as e:
+                retryable = self.is_retryable(e)
+                if retryable:
+                    self._count("failures")
+                # full jitter: 0 ~ min(max_delay, base_delay * 2^(attempt-1)) 사이에서 무작위 대기
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+                if not retryable or attempt == self.max_attempts or out_of_time:
+                    self._settle_failure(retryable)
+                    raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            self._count("retries")
+            time.sleep(delay)
+
+    def _acquire(self, deadline):
+        if deadline is None:
+            return self.limiter.acquire()
+        remaining = deadline - time.monotonic()
+        return remaining > 0 and self.limiter.acquire(timeout=remaining)
+
+    def _guard_stream(self, response):
+        try:
+            for chunk in response:
+                yield chunk
+        except Exception as e:
+            retryable = self.is_retryable(e)
+            if retryable:
+                self._count("failures")
+            self._settle_failure(retryable)
+            raise
+        except BaseException:
+            # 읽는 쪽이 중간에 그만둔 경우(GeneratorExit 등): 실패로 세지 않습니다.
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+
+    def _settle_failure(self, retryable):
+        # 서비스 장애로 볼 수 있는 오류만 실패로 세고, 나머지(잘못된 요청 등)는 시험 슬롯만 반납합니다.
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["circuit"] = self.breaker.state
+        return stats
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+
+def _is_retryable_ddgs(exc):
+    return isinstance(exc, (RatelimitException, TimeoutException, ConnectionError, TimeoutError))
+
+
+def _is_retryable_gemini(exc):
+    return isinstance(exc, (
+        google_exceptions.TooManyRequests,        # ResourceExhausted(429, 쿼터 초과) 포함
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+        ConnectionError,
+        TimeoutError,
+    ))
+
+
+ddgs_service = ServiceGuard("ddgs", _is_retryable_ddgs, **SERVICE_LIMITS["ddgs"])
+gemini_service = ServiceGuard("gemini", _is_retryable_gemini, **SERVICE_LIMITS["gemini"])
+services = {"ddgs": ddgs_service, "gemini": gemini_service}
+
+
+_applied_limits = None
+
+
+def configure_services(limits):
+    """
+    {"ddgs": {...}, "gemini": {...}} 형태로 서비스별 설정을 덮어씁니다. (예: Streamlit secrets)
+    Streamlit은 rerun마다 이 함수를 다시 부르므로, 설정이 바뀐 경우에만 적용합니다.
+    (다시 적용하면 토큰 버킷이 가득 찬 상태로 초기화되기 때문)
+    """
+    global _applied_limits
+    limits = {name: dict(overrides) for name, overrides in (limits or {}).items()}
+    if limits == _applied_limits:
+        return
+    for name, overrides in limits.items():
+        if name in services:
+            services[name].configure(**{**SERVICE_LIMITS[name], **overrides})
+    _applied_limits = limits
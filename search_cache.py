@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# -----------------------------------------------------------------------------
+# 검색 결과 캐시 설정
+# -----------------------------------------------------------------------------
+SEARCH_CACHE_PATH = os.environ.get("CEP_SEARCH_CACHE_PATH", os.path.join(".cache", "search_cache.sqlite3"))
+SEARCH_CACHE_TTL_SEC = 6 * 60 * 60     # 6시간 지나면 다시 검색
+SEARCH_CACHE_MEMORY_ENTRIES = 256      # 메모리(LRU) 계층 최대 항목 수
+SEARCH_CACHE_DISK_ENTRIES = 20000      # 디스크(SQLite) 계층 최대 항목 수
+
+
+class SearchCache:
+    """
+    DuckDuckGo 검색 결과 2단 캐시.
+    1단은 프로세스 메모리 LRU, 2단은 SQLite 파일이라 Streamlit 재시작 후에도 남고
+    같은 파일을 쓰는 모든 세션/프로세스가 공유합니다.
+    """
+
+    def __init__(self, path=SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL_SEC,
+                 max_memory_entries=SEARCH_CACHE_MEMORY_ENTRIES,
+                 max_disk_entries=SEARCH_CACHE_DISK_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> (stored_at, value)
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache(accessed_at)")
+
+    @staticmethod
+    def make_key(query, region, safesearch, max_results):
+        return json.dumps([query, region, safesearch, max_results], ensure_ascii=False)
+
+    def get(self, key):
+        """캐시에 있으면 값을, 없거나 TTL이 지났으면 None을 반환합니다."""
+        now = time.time()
+        with self._lock:
+            # 1. 메모리 계층
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            # 2. 디스크 계층
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] < self.ttl:
+                with self._conn:
+                    self._conn.execute("UPDATE search_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self._stats["disk_hits"] += 1
+                return value
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                # 만료된 항목을 지우고, 그래도 넘치면 가장 오래 안 쓴 항목부터 제거
+                cur = self._conn.execute("DELETE FROM search_cache WHERE stored_at < ?", (now - self.ttl,))
+                evicted = cur.rowcount
+                cur = self._conn.execute(
+                    "DELETE FROM search_cache WHERE key IN ("
+                    " SELECT key FROM search_cache ORDER BY accessed_at ASC"
+                    " LIMIT MAX(0, (SELECT COUNT(*) FROM search_cache) - ?))",
+                    (self.max_disk_entries,),
+                )
+                evicted += cur.rowcount
+            self._stats["stores"] += 1
+            self._stats["evictions"] += evicted
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM search_cache")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, stored_at, value):
+        # self._lock을 잡은 상태에서만 호출합니다.
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
@@ -0,0 +1,209 @@
+import math
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+from resilience import gemini_service
+
+# -----------------------------------------------------------------------------
+# 검색 결과 -> 프롬프트용 컨텍스트 (중복 제거, 관련도 정렬, 토큰 예산 맞추기)
+# -----------------------------------------------------------------------------
+CONTEXT_TOKEN_BUDGET = 1200          # 검색 컨텍스트에 쓸 최대 토큰 수
+PAGE_CONTEXT_TOKEN_BUDGET = 800      # 원문 발췌(상위 결과 본문)에 쓸 최대 토큰 수
+NEAR_DUPLICATE_THRESHOLD = 0.7       # 글자 3-gram 자카드 유사도가 이 이상이면 중복으로 봄
+DEFAULT_CHARS_PER_TOKEN = 1.8        # 모델 토큰 카운터를 못 쓸 때의 대략치 (한글 위주)
+TOKEN_COUNT_DEADLINE_SEC = 3.0       # count_tokens 측정 1회에 쓸 최대 시간 (토큰 대기/재시도 포함)
+
+
+def estimate_tokens(text, chars_per_token=DEFAULT_CHARS_PER_TOKEN):
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+
+_token_ratio_lock = threading.Lock()
+_token_ratios = {}   # 모델 이름 -> 글자/토큰 비율
+
+
+def make_model_token_counter(model_name, model_factory):
+    """
+    모델의 count_tokens로 글자/토큰 비율을 모델당 한 번만 측정하고, 이후에는 그 비율로 셉니다.
+    (매 요청마다 count_tokens API를 부르면 줄이려던 지연이 다시 늘어나기 때문)
+    측정은 gemini_service(속도 제한/재시도/서킷 브레이커)를 거칩니다. 실패하면 이 카운터에서는 기본 비율을 쓰고,
+    실패는 저장하지 않으므로 다음 카운터(다음 요청)에서 다시 측정합니다.
+    """
+    failed = False   # 한 요청 안에서 실패한 측정을 매번 다시 시도하지 않도록
+
+    def count(text):
+        nonlocal failed
+        if not text:
+            return 0
+        with _token_ratio_lock:
+            ratio = _token_ratios.get(model_name)
+        if ratio is None and not failed:
+            try:
+                tokens = gemini_service.call(
+                    lambda: model_factory(model_name).count_tokens(text),
+                    deadline=time.monotonic() + TOKEN_COUNT_DEADLINE_SEC,
+                ).total_tokens
+            except Exception:
+                tokens = 0
+            if tokens:
+                ratio = len(text) / tokens
+                with _token_ratio_lock:
+                    _token_ratios[model_name] = ratio
+            else:
+                failed = True
+        return estimate_tokens(text, ratio or DEFAULT_CHARS_PER_TOKEN)
+
+    return count
+
+
+def _normalize_url(url):
+    parts = urlsplit(url or "")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("m."):
+        host = host[2:]
+    return host + parts.path.rstrip("/") + ("?" + parts.query if parts.query else "")
+
+
+def _shingles(text, n=3):
+    text = re.sub(r"\s+", "", text.lower())
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _query_terms(*texts):
+    terms = set()
+    for text in texts:
+        for term in re.split(r"[\s,/·]+", text or ""):
+            if len(term) >= 2:
+                terms.add(term.lower())
+    return terms
+
+
+def format_snippet(number, result):
+    source = urlsplit(result.get("href") or "").netloc
+    return f"[{number}] 제목: {result.get('title', '')}\n내용: {result.get('body', '')}\n출처: {source}\n\n"
+
+
+def build_search_context(result_groups, name, target, token_budget=CONTEXT_TOKEN_BUDGET,
+                         token_counter=estimate_tokens):
+    """
+    result_groups: [(그룹 제목, DDGS 결과 리스트 또는 None(검색 실패)), ...]
+    1) URL/본문 유사도로 그룹 간 중복 제거 2) 제품명/타겟 관련도로 정렬
+    3) token_budget 안에 들어가는 만큼만 담아 그룹별로 묶은 텍스트를 만듭니다.
+    (컨텍스트 텍스트, 리포트 dict)를 반환합니다.
+    """
+    result_groups = [(label, results or []) for label, results in result_groups]
+    raw_text = "".join(
+        f"**[{label}]**\n" + "".join(
+            f"[{i + 1}] 제목: {r.get('title', '')}\n내용: {r.get('body', '')}\n링크: {r.get('href', '')}\n\n"
+            for i, r in enumerate(results)
+        )
+        for label, results in result_groups
+    )
+
+    # 1. 중복 제거 (같은 URL, 또는 거의 같은 제목+본문)
+    candidates, seen_urls, kept_shingles = [], set(), []
+    duplicates = 0
+    for group_idx, (label, results) in enumerate(result_groups):
+        for rank, result in enumerate(results):
+            url = _normalize_url(result.get("href"))
+            shingles = _shingles(f"{result.get('title', '')} {result.get('body', '')}")
+            if (url and url in seen_urls) or any(_jaccard(shingles, s) >= NEAR_DUPLICATE_THRESHOLD for s in kept_shingles):
+                duplicates += 1
+                continue
+            if url:
+                seen_urls.add(url)
+            kept_shingles.append(shingles)
+            candidates.append((group_idx, rank, result))
+
+    # 2. 관련도 점수: 제품명/타겟 단어가 제목(가중치 2)과 본문에 몇 번 나오는지 + 검색 순위 보정
+    terms = _query_terms(name, target)
+
+    def score(candidate):
+        _, rank, result = candidate
+        title = (result.get("title") or "").lower()
+        body = (result.get("body") or "").lower()
+        hits = sum(2 * title.count(t) + body.count(t) for t in terms)
+        return hits + 1.0 / (1 + rank)
+
+    ranked = sorted(candidates, key=score, reverse=True)
+
+    # 3. 토큰 예산 안에서 점수 순으로 담기 (안 들어가는 긴 항목은 건너뛰고 다음 항목 시도)
+    headers = {label: f"**[{label}]**\n" for label, _ in result_groups}
+    used, selected, over_budget = 0, [], 0
+    opened = set()
+    for candidate in ranked:
+        group_idx = candidate[0]
+        label = result_groups[group_idx][0]
+        cost = token_counter(format_snippet(0, candidate[2]))
+        if group_idx not in opened:
+            cost += token_counter(headers[label])
+        if used + cost > token_budget:
+            over_budget += 1
+            continue
+        used += cost
+        opened.add(group_idx)
+        selected.append(candidate)
+
+    parts = []
+    for group_idx, (label, _) in enumerate(result_groups):
+        group = [c for c in selected if c[0] == group_idx]
+        parts.append(headers[label])
+        if not group:
+            parts.append("검색 결과 없음\n\n")
+        for number, (_, _, result) in enumerate(group, start=1):
+            parts.append(format_snippet(number, result))
+    context = "".join(parts)
+
+    raw_tokens = token_counter(raw_text)
+    context_tokens = token_counter(context)
+    report = {
+        "raw_tokens": raw_tokens,
+        "context_tokens": context_tokens,
+        "saved_tokens": max(raw_tokens - context_tokens, 0),
+        "kept": len(selected),
+        "dropped_duplicates": duplicates,
+        "dropped_over_budget": over_budget,
+    }
+    return context, report
+
+
+def build_page_context(pages, token_budget=PAGE_CONTEXT_TOKEN_BUDGET, token_counter=estimate_tokens):
+    """
+    pages: {url: 본문 텍스트} (검색 순위 순서)
+    남은 예산을 남은 페이지 수로 나눠 페이지마다 공평하게 담고, 넘치는 본문은 뒤를 잘라냅니다.
+    (발췌 텍스트, 리포트 dict)를 반환합니다. 담을 페이지가 없으면 텍스트는 ""입니다.
+    """
+    header = "**[원문 발췌: 상위 검색 결과 본문]**\n"
+    remaining = token_budget - token_counter(header)
+    parts, used_pages = [], 0
+    items = list(pages.items())
+    for idx, (url, text) in enumerate(items):
+        allowance = remaining // (len(items) - idx)
+        prefix = f"[P{used_pages + 1}] 출처: {urlsplit(url).netloc}\n"
+        body = text
+        cost = token_counter(prefix + body + "\n\n")
+        while body and cost > allowance:
+            # 비율대로 줄이고, 그래도 넘치면 10%씩 더 줄입니다.
+            body = body[: min(int(len(body) * allowance / cost), int(len(body) * 0.9))].rstrip()
+            cost = token_counter(prefix + body + "\n\n")
+        if not body:
+            continue
+        parts.append(prefix + body + "\n\n")
+        remaining -= cost
+        used_pages += 1
+    if not parts:
+        return "", {"pages_used": 0, "page_tokens": 0}
+    context = header + "".join(parts)
+    return context, {"pages_used": used_pages, "page_tokens": token_counter(context)}
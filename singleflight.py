@@ -0,0 +1,161 @@
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+# -----------------------------------------------------------------------------
+# 동일 요청 합치기 (single-flight)
+# -----------------------------------------------------------------------------
+# 같은 키의 작업이 이미 진행 중이면 새로 호출하지 않고 그 결과를 함께 기다립니다.
+# 기다리던 쪽이 중간에 포기(timeout/cancel_event)해도 공유 작업은 계속 진행됩니다.
+# 일반 호출(do)과 스트림(do_stream)은 결과 모양이 달라 따로 관리하지만, 변환 함수(join_stream/join_call)를
+# 넘기면 같은 키로 진행 중인 다른 쪽 작업에도 합류합니다.
+_WAIT_SLICE_SEC = 0.2
+
+
+class FlightCancelled(Exception):
+    """대기자가 스스로 기다리기를 그만뒀을 때. 공유 작업에는 영향이 없습니다."""
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}     # key -> Future
+        self._streams = {}   # key -> _StreamFlight
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key, fn, timeout=None, cancel_event=None, join_stream=None):
+        """
+        key에 해당하는 작업을 한 번만 실행하고 결과(또는 예외)를 모든 호출자에게 나눠줍니다.
+        처음 부른 호출자(leader)가 fn을 직접 실행합니다.
+        join_stream이 있으면 같은 key의 스트림이 진행 중일 때 그 조각 이터레이터를 join_stream에 넘겨 결과로 씁니다.
+        """
+        with self._lock:
+            flight = self._streams.get(key) if join_stream is not None else None
+            future = self._calls.get(key)
+            leader = flight is None and future is None
+            if leader:
+                future = self._calls[key] = Future()
+            self._stats["leaders" if leader else "followers"] += 1
+
+        if flight is not None:
+            return join_stream(flight.reader(timeout, cancel_event))
+
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+            return future.result()
+
+        return _wait_future(future, timeout, cancel_event)
+
+    def do_stream(self, key, start_fn, timeout=None, cancel_event=None, join_call=None):
+        """
+        스트리밍 버전. start_fn()이 돌려준 이터러블을 백그라운드 스레드가 버퍼로 끝까지 읽고,
+        각 호출자는 그 버퍼를 처음부터 따라 읽는 제너레이터를 받습니다.
+        (누군가 읽기를 멈춰도 다른 호출자와 공유 스트림은 계속 진행)
+        start_fn의 예외는 leader에게는 바로, follower에게는 읽기 시작할 때 전달됩니다.
+        join_call이 있으면 같은 key의 일반 호출이 진행 중일 때 그 결과를 join_call로 조각 이터러블로 바꿔 읽습니다.
+        """
+        with self._lock:
+            future = self._calls.get(key) if join_call is not None else None
+            flight = self._streams.get(key)
+            leader = future is None and flight is None
+            if leader:
+                flight = self._streams[key] = _StreamFlight()
+            self._stats["leaders" if leader else "followers"] += 1
+
+        if future is not None:
+            return _joined_call(future, timeout, cancel_event, join_call)
+
+        if leader:
+            def finished():
+                with self._lock:
+                    if self._streams.get(key) is flight:
+                        del self._streams[key]
+
+            try:
+                iterable = start_fn()
+            except BaseException as e:
+                flight.finish(e)
+                finished()
+                raise
+            threading.Thread(target=flight.pump, args=(iterable, finished),
+                             name=f"{self.name}-stream", daemon=True).start()
+
+        return flight.reader(timeout, cancel_event)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls) + len(self._streams)
+        return stats
+
+
+def _joined_call(future, timeout, cancel_event, join_call):
+    # do_stream의 follower와 같이, 결과(또는 예외)는 읽기 시작할 때 기다려 받습니다.
+    yield from join_call(_wait_future(future, timeout, cancel_event))
+
+
+def _wait_future(future, timeout, cancel_event):
+    waited = 0.0
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            raise FlightCancelled()
+        try:
+            return future.result(timeout=_WAIT_SLICE_SEC)
+        except FutureTimeoutError:
+            waited += _WAIT_SLICE_SEC
+            if timeout is not None and waited >= timeout:
+                raise TimeoutError("공유 작업 대기 시간 초과")
+
+
+class _StreamFlight:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._done = False
+        self._error = None
+
+    def pump(self, iterable, on_done):
+        try:
+            for item in iterable:
+                with self._cond:
+                    self._buffer.append(item)
+                    self._cond.notify_all()
+            self.finish()
+        except BaseException as e:
+            self.finish(e)
+        finally:
+            on_done()
+
+    def finish(self, error=None):
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def reader(self, timeout=None, cancel_event=None):
+        index = 0
+        waited = 0.0
+        while True:
+            with self._cond:
+                while index >= len(self._buffer) and not self._done:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise FlightCancelled()
+                    if timeout is not None and waited >= timeout:
+                        raise TimeoutError("공유 스트림 대기 시간 초과")
+                    self._cond.wait(_WAIT_SLICE_SEC)
+                    waited += _WAIT_SLICE_SEC
+                if index < len(self._buffer):
+                    item = self._buffer[index]
+                    index += 1
+                    waited = 0.0
+                elif self._error is not None:
+                    raise self._error
+                else:
+                    return
+            yield item
@@ -0,0 +1,433 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import google.generativeai as genai
+from google.generativeai.types import GenerationConfig
+
+from json_extract import salvage_json_from_text, merge_salvaged_items
+import page_fetch
+from search_context import build_page_context, build_search_context, estimate_tokens, make_model_token_counter
+from web_search import run_searches_concurrently
+from model_resolver import get_best_available_model, is_model_not_found_error, model_resolver
+from metrics import metrics, record_usage
+from resilience import gemini_service
+from singleflight import SingleFlight
+
+# -----------------------------------------------------------------------------
+# 전략 생성 파이프라인 (검색 -> 프롬프트 -> Gemini)
+# -----------------------------------------------------------------------------
+CEP_COUNT = 7
+SEARCH_RESULTS_PER_QUERY = 5    # 중복 제거/예산 맞추기 전에 쿼리당 가져올 결과 수
+# CEP JSON 필드와 화면/리포트에 쓰는 한글 이름
+CEP_FIELD_LABELS = {
+    "cep_title": "CEP 타이틀",
+    "situation_summary": "상황",
+    "thought": "생각/동기",
+    "trigger_behavior": "카테고리 진입 계기(행동)",
+    "concept_keyword": "컨셉 키워드",
+    "ref_keyword": "레퍼런스 키워드",
+    "hooking_copy": "후킹 카피",
+    "visual_guide": "비주얼 가이드",
+    "landing_section": "랜딩 섹션",
+}
+PLATFORM_OPTIONS = ["SNS 숏폼 (릴스/틱톡)", "SNS 피드 (인스타/페북)", "GFA/배너 (네이버/카카오)", "검색광고 (TDA)"]
+TONE_OPTIONS = ["순한맛 (공감/위로)", "논리적 (기능/정보)", "매운맛 (공포/팩폭)"]
+DEFAULT_PLATFORM = PLATFORM_OPTIONS[2]
+DEFAULT_TONE = TONE_OPTIONS[2]
+NO_MODEL_ERROR = "Error: 사용 가능한 AI 모델을 찾을 수 없습니다. (API Key 권한을 확인해주세요)"
+
+# 실제 Gemini 클라이언트. 배치/오프라인 실행 시 교체합니다.
+model_factory = genai.GenerativeModel
+
+# 같은 (모델, 프롬프트, 설정) 생성이 이미 진행 중이면 새로 호출하지 않고 그 결과를 함께 받습니다.
+generation_flight = SingleFlight("gemini")
+
+
+class SearchUnavailableError(Exception):
+    """모든 검색이 실패해 근거 데이터가 없을 때. 이 경우 Gemini를 호출하지 않습니다."""
+
+
+def collect_search_data(name, target, token_counter=estimate_tokens, enrich_pages=False, search_timeouts=None):
+    """
+    검색 결과를 중복 제거/관련도 정렬 후 토큰 예산에 맞춘 컨텍스트로 만듭니다.
+    enrich_pages면 상위 결과 페이지 본문을 받아 별도 예산 안에서 덧붙입니다. (최대 PAGE_FETCH_DEADLINE_SEC)
+    search_timeouts는 run_searches_concurrently의 제한 시간(per_query_timeout, deadline) 덮어쓰기입니다.
+    (컨텍스트 텍스트, 절약한 토큰 수 등이 담긴 리포트)를 반환합니다.
+    """
+    # 1. [검색 단계]
+    # 두 쿼리를 동시에 실행하고, 제한 시간이 지나면 끝난 결과만 사용합니다.
+    search_queries = [f"{name} 후기 장단점", f"{name} 상세페이지 특징"]
+    with metrics.timed("search", queries=len(search_queries)) as event:
+        search_result_1, search_result_2 = run_searches_concurrently(
+            search_queries, max_results=SEARCH_RESULTS_PER_QUERY, **(search_timeouts or {})
+        )
+        failed = event["failed"] = [search_result_1, search_result_2].count(None)
+    if search_result_1 is None and search_result_2 is None:
+        raise SearchUnavailableError("웹 검색에 모두 실패해 AI 호출을 건너뛰었습니다. 잠시 후 다시 시도해주세요.")
+
+    with metrics.timed("context_build") as event:
+        context, report = build_search_context(
+            [("웹 검색 결과 1: 실제 고객 후기", search_result_1), ("웹 검색 결과 2: 제품 특징", search_result_2)],
+            name, target, token_counter=token_counter,
+        )
+        event.update(report)
+    # 일부 검색이 실패/시간 초과한 채로 만든 컨텍스트인지 호출한 쪽(배치 등)이 알 수 있게 남깁니다.
+    report["failed_searches"] = failed
+
+    if enrich_pages:
+        # 2. [원문 보강 단계] 실패하거나 제한 시간 안에 못 받은 페이지는 빼고 진행합니다.
+        urls = page_fetch.pick_top_urls([search_result_1, search_result_2])
+        with metrics.timed("page_enrich", urls=len(urls)) as event:
+            pages = page_fetch.page_fetcher.fetch_many(urls)
+            page_context, page_report = build_page_context(pages, token_counter=token_counter)
+            event.update(page_report)
+        context += page_context
+        report = {**report, **page_report}
+    return context, report
+
+
+def _token_counter(api_key, pinned_model=None):
+    # 프롬프트를 보낼 모델의 토큰 카운터. 모델을 못 찾으면 대략치로 셉니다.
+    active_model = get_best_available_model(api_key, pinned_model)
+    if not active_model:
+        return estimate_tokens
+    return make_model_token_counter(active_model, model_factory)
+
+
+COMPLIANCE_INSTRUCTIONS = """
+    **[⚠️ 심의/반려 주의 (Compliance Check)]**
+    - 표시광고법 및 의료법 위반 소지가 있는 단어('최고', '100%', '완치', '무조건', '보장', '부작용 없음')는 절대 사용하지 마세요.
+    """
+
+OUTPUT_FORMAT_INSTRUCTIONS = """
+    [최종 출력 포맷 (JSON)]
+    위 사고 과정을 통해 도출된 내용을 **오직 JSON 형식으로만** 출력하세요. 서론이나 부연 설명은 금지합니다.
+    
+    **[중요: 검색 키워드 추출]**
+    `ref_keyword` 필드에는 제품명(예: 리압스텝퍼)이 아닌, **광고 라이브러리에서 검색했을 때 레퍼런스가 많이 나올 법한 '대표 카테고리 키워드'(예: 다이어트, 붓기, 홈트레이닝)** 를 1개만 단답형으로 적으세요.
+
+    ```json
+    [
+      {
+        "cep_title": "CEP N. [상황]과 [동기]를 결합한 직관적인 타이틀",
+        "situation_summary": "웹 검색 데이터와 7W 분석을 토대로 작성된 구체적인 상황 묘사 (1~2문장)",
+        "thought": "고객의 속마음/동기 (따옴표 포함한 독백)",
+        "trigger_behavior": "검색 키워드 및 행동 패턴 (화살표 활용)",
+        "concept_keyword": "컨셉 키워드 (해시태그)",
+        "ref_keyword": "레퍼런스 검색용 대표 키워드 (예: 다이어트)",
+        "hooking_copy": "타겟 저격 후킹 카피 (매체 규격 준수)",
+        "visual_guide": "매체 맞춤형 시각적 가이드",
+        "landing_section": "랜딩 페이지 구성 아이디어"
+      },
+      ...
+    ]
+    ```
+    """
+
+
+def get_platform_instructions(platform):
+    platform_instructions = ""
+    if "GFA/배너" in platform:
+        platform_instructions = """
+        **[🚨 중요: GFA/카카오 배너 매체 규격 준수]**
+        1. **글자 수 제한**: 메인 카피는 띄어쓰기 포함 **25자 이내**로 작성하세요. 길어지면 잘립니다.
+        2. **금지어**: '좋아요', '댓글', '공유' 언급 절대 금지.
+        3. **스타일**: '뉴스 기사 헤드라인' 또는 '커뮤니티 썰' 느낌의 텍스트형 배너 카피.
+        """
+    elif "숏폼" in platform:
+        platform_instructions = """
+        **[🚨 중요: 숏폼(릴스/틱톡) 매체 규격 준수]**
+        1. **형식**: 글자가 아닌 '영상 연출(Action)' 위주.
+        2. **Visual Guide**: 정지 이미지가 아니라, 초반 3초에 시선을 뺏는 구체적인 행동 지시문 작성.
+        3. **카피**: 자막으로 들어갈 짧은 구어체.
+        """
+    elif "피드" in platform:
+        platform_instructions = """
+        **[🚨 중요: 인스타/페북 피드 매체 규격 준수]**
+        1. **형식**: 카드뉴스 표지(썸네일).
+        2. **글자 수 제한**: 가독성을 위해 2줄 이내로 끊어지는 짧고 굵은 헤드라인.
+        """
+    else:
+        platform_instructions = """
+        **[🚨 중요: 검색광고(TDA) 매체 규격 준수]**
+        1. **글자 수 제한**: 제목 15자 이내.
+        2. **스타일**: 검색 키워드를 반드시 포함한 신뢰도 높은 문구.
+        """
+    return platform_instructions
+
+
+def get_tone_instructions(tone):
+    tone_instructions = ""
+    if "매운맛" in tone:
+        tone_instructions = "**[🔥 톤앤매너: 극도로 매운맛]** 점잖은 경고 금지. '당신 지금 돈 버리고 있다', '망가지는 중이다' 처럼 손실 회피를 강하게 자극하세요."
+    elif "순한맛" in tone:
+        tone_instructions = "**[💧 톤앤매너: 순한맛]** 고객의 아픔에 공감하고 따뜻한 해결책을 제시하세요."
+    else:
+        tone_instructions = "**[💡 톤앤매너: 논리적]** 객관적 사실과 기능적 우위를 강조하세요."
+    return tone_instructions
+
+
+def build_prompt(name, target, details, platform, tone, collected_data):
+    # 2. [프롬프트 작성]
+    platform_instructions = get_platform_instructions(platform)
+    tone_instructions = get_tone_instructions(tone)
+
+    prompt = f"""
+    당신은 대한민국 최고의 퍼포먼스 마케터이자 카피라이터입니다.
+    
+    **[참고 자료: 실시간 웹 검색 데이터]**
+    {collected_data}
+    
+    ---
+
+    **[미션]**
+    위 검색 데이터와 아래 입력 정보를 결합하여 **최적의 CEP(Category Entry Point) {CEP_COUNT}가지**를 도출하세요.
+
+    [입력 정보]
+    - 제품명: {name}
+    - 타겟: {target}
+    - 상세 특징(참고): {details}
+    - **선택된 매체**: {platform}
+    - **선택된 톤**: {tone}
+
+    {platform_instructions}
+    {COMPLIANCE_INSTRUCTIONS}
+    {tone_instructions}
+    {OUTPUT_FORMAT_INSTRUCTIONS}
+    """
+    return prompt
+
+
+def build_repair_prompt(name, target, details, platform, tone, items, missing_count):
+    """
+    파싱에 실패한 항목만 다시 받기 위한 짧은 후속 프롬프트.
+    검색 데이터는 다시 넣지 않고, 이미 나온 CEP 제목만 알려 겹치지 않게 합니다.
+    """
+    existing_titles = "\n".join(f"- {item.get('cep_title', '')}" for item in items) or "- (없음)"
+
+    prompt = f"""
+    당신은 대한민국 최고의 퍼포먼스 마케터이자 카피라이터입니다.
+
+    **[미션]**
+    아래 입력 정보로 이미 CEP를 도출했지만 일부가 유실되었습니다.
+    이미 도출된 CEP와 겹치지 않는 **새로운 CEP {missing_count}가지만** 도출하세요.
+
+    [입력 정보]
+    - 제품명: {name}
+    - 타겟: {target}
+    - 상세 특징(참고): {details}
+    - **선택된 매체**: {platform}
+    - **선택된 톤**: {tone}
+
+    [이미 도출된 CEP]
+    {existing_titles}
+
+    {get_platform_instructions(platform)}
+    {COMPLIANCE_INSTRUCTIONS}
+    {get_tone_instructions(tone)}
+    {OUTPUT_FORMAT_INSTRUCTIONS}
+    """
+    return prompt
+
+
+def _start_generation(api_key, prompt, pinned_model=None, stream=False):
+    """
+    [🔥 핵심 수정] 모델 자동 감지 후 실행
+    stream=True이면 첫 조각을 받은 시점에 응답 객체를 반환합니다. 모델이 없으면 None.
+    """
+    # 1. 사용할 모델 이름 가져오기 (프로세스 공유 캐시)
+    active_model = get_best_available_model(api_key, pinned_model)
+    if not active_model:
+        return None
+
+    # 2. 찾은 모델로 생성 시도
+    config = GenerationConfig(temperature=1.0)
+    try:
+        return _generate_content(active_model, prompt, config, stream)
+    except Exception as e:
+        # 캐시된 모델이 사라졌으면(404) 목록을 한 번만 다시 조회해 재시도
+        if pinned_model or not is_model_not_found_error(e):
+            raise
+        model_resolver.invalidate()
+        active_model = get_best_available_model(api_key)
+        if not active_model:
+            raise
+        return _generate_content(active_model, prompt, config, stream)
+
+
+def _generate_content(model_name, prompt, config, stream):
+    # 속도 제한/재시도/서킷 브레이커는 gemini_service가 처리합니다.
+    # 지표(시간/토큰)는 실제로 API를 부르는 쪽에서만 기록합니다. (합쳐진 대기자는 중복 집계하지 않음)
+    def call():
+        stage = "generate_first_chunk" if stream else "generate"
+        with metrics.timed(stage, model=model_name) as event:
+            # 스트림은 조각을 읽다가 난 오류도 서킷 브레이커에 기록되도록 call_stream으로 감쌉니다.
+            guarded_call = gemini_service.call_stream if stream else gemini_service.call
+            response = guarded_call(
+                lambda: model_factory(model_name).generate_content(prompt, generation_config=config, stream=stream)
+            )
+            if not stream:
+                event.update(record_usage(response) or {})
+        return _stream_with_usage(response, model_name) if stream else response
+
+    key = hashlib.sha1(f"{model_name}\0{config!r}\0{prompt}".encode("utf-8")).hexdigest()
+    # 같은 생성이 다른 방식(스트림/일반)으로 진행 중이어도 합류합니다. (예: 배치 generate_strategy와 앱 stream_strategy)
+    if stream:
+        # 스트림은 백그라운드에서 끝까지 받아 두므로, 한 세션이 화면을 떠나도 나머지 세션은 계속 받습니다.
+        # 일반 호출에 합류하면 완성된 응답 하나를 조각 하나로 받습니다.
+        return generation_flight.do_stream(key, call, join_call=lambda response: [response])
+    return generation_flight.do(key, call, join_stream=_CollectedResponse)
+
+
+class _CollectedResponse:
+    """스트림 조각을 끝까지 모아 일반 응답처럼(.text, .usage_metadata) 쓸 수 있게 합니다."""
+
+    def __init__(self, chunks):
+        texts, last_chunk = [], None
+        for chunk in chunks:
+            last_chunk = chunk
+            try:
+                texts.append(chunk.text)
+            except ValueError:
+                # 안전 필터 등으로 텍스트가 없는 조각은 건너뜁니다.
+                continue
+        self.text = "".join(texts)
+        self.usage_metadata = getattr(last_chunk, "usage_metadata", None)
+
+
+def _stream_with_usage(response, model_name):
+    # 스트림을 끝까지 읽은 뒤 전체 소요 시간과 마지막 조각의 usage_metadata(토큰 수)를 기록합니다.
+    started = time.perf_counter()
+    status, last_chunk = "ok", None
+    try:
+        for chunk in response:
+            last_chunk = chunk
+            yield chunk
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        usage = record_usage(last_chunk) if last_chunk is not None else None
+        metrics.observe("generate_stream", time.perf_counter() - started, status, model=model_name, **(usage or {}))
+
+
+def generate_strategy(api_key, name, target, details, platform, tone, pinned_model=None, on_context=None,
+                      enrich_pages=False, search_timeouts=None):
+    try:
+        collected_data, context_report = collect_search_data(
+            name, target, _token_counter(api_key, pinned_model), enrich_pages=enrich_pages,
+            search_timeouts=search_timeouts,
+        )
+    except SearchUnavailableError as e:
+        return f"Error: {e}"
+    if on_context:
+        on_context(context_report)
+    prompt = build_prompt(name, target, details, platform, tone, collected_data)
+
+    try:
+        response = _start_generation(api_key, prompt, pinned_model)
+        if response is None:
+            return NO_MODEL_ERROR
+        return response.text
+        
+    except Exception as e:
+        return f"Error: AI 처리 중 오류 발생. ({str(e)})"
+
+
+def stream_strategy(api_key, name, target, details, platform, tone, pinned_model=None, on_context=None,
+                    enrich_pages=False):
+    """
+    generate_strategy의 스트리밍 버전. 생성되는 텍스트 조각을 순서대로 yield 합니다.
+    생성 시작 전에 실패하면 generate_strategy와 같은 "Error: ..." 문자열 하나만 yield 합니다.
+    on_context가 있으면 검색 컨텍스트 리포트(토큰 수/절약량)를 넘겨 호출합니다.
+    """
+    try:
+        collected_data, context_report = collect_search_data(
+            name, target, _token_counter(api_key, pinned_model), enrich_pages=enrich_pages
+        )
+    except SearchUnavailableError as e:
+        yield f"Error: {e}"
+        return
+    if on_context:
+        on_context(context_report)
+    prompt = build_prompt(name, target, details, platform, tone, collected_data)
+
+    try:
+        response = _start_generation(api_key, prompt, pinned_model, stream=True)
+    except Exception as e:
+        yield f"Error: AI 처리 중 오류 발생. ({str(e)})"
+        return
+    if response is None:
+        yield NO_MODEL_ERROR
+        return
+
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # 안전 필터 등으로 텍스트가 없는 조각은 건너뜁니다.
+            continue
+        if text:
+            yield text
+
+
+def generate_all_platforms(api_key, name, target, details, tone, pinned_model=None, on_context=None,
+                            platforms=PLATFORM_OPTIONS, enrich_pages=False):
+    """
+    검색/컨텍스트 단계는 한 번만 실행하고, 매체별 프롬프트로 Gemini를 동시에 호출합니다.
+    끝나는 순서대로 (매체, 결과 텍스트 또는 "Error: ...", CEP 리스트)를 yield 합니다.
+    CEP 리스트는 파싱 후 유실 항목까지 다시 채운 것이며, 오류/파싱 실패면 빈 리스트입니다.
+    """
+    try:
+        collected_data, context_report = collect_search_data(
+            name, target, _token_counter(api_key, pinned_model), enrich_pages=enrich_pages
+        )
+    except SearchUnavailableError as e:
+        for platform in platforms:
+            yield platform, f"Error: {e}"
+        return
+    if on_context:
+        on_context(context_report)
+
+    def _run(platform):
+        prompt = build_prompt(name, target, details, platform, tone, collected_data)
+        try:
+            response = _start_generation(api_key, prompt, pinned_model)
+            if response is None:
+                return NO_MODEL_ERROR, []
+            text = response.text
+        except Exception as e:
+            return f"Error: AI 처리 중 오류 발생. ({str(e)})", []
+        # 유실 항목 재생성도 이 작업 안에서 하므로, 먼저 끝난 매체를 보여주는 것을 막지 않습니다.
+        items, lost = salvage_json_from_text(text, CEP_COUNT)
+        return text, regenerate_missing_items(api_key, name, target, details, platform, tone, items, lost, pinned_model)
+
+    # 풀은 호출마다 따로 만듭니다. (공유 풀이면 동시에 생성하는 사용자끼리 서로 기다림)
+    # Gemini 호출량은 gemini_service가 전역으로 제한합니다.
+    pool = ThreadPoolExecutor(max_workers=len(platforms), thread_name_prefix="gemini")
+    try:
+        futures = {pool.submit(_run, platform): platform for platform in platforms}
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+    finally:
+        # 보는 쪽이 중간에 떠나도(Streamlit rerun 등) 기다리지 않고, 남은 생성은 백그라운드에서 끝납니다.
+        pool.shutdown(wait=False)
+
+
+def regenerate_missing_items(api_key, name, target, details, platform, tone, items, lost, pinned_model=None):
+    """
+    유실된 순번(lost)만큼만 짧은 후속 요청으로 다시 생성해, 원래 순번 자리에 채운 전체 리스트를 반환합니다.
+    후속 요청이 실패하면 살린 항목(items)만 그대로 반환합니다.
+    """
+    if not lost:
+        return items
+    prompt = build_repair_prompt(name, target, details, platform, tone, items, len(lost))
+    try:
+        response = _start_generation(api_key, prompt, pinned_model)
+        if response is None:
+            return items
+        replacements, _ = salvage_json_from_text(response.text)
+    except Exception:
+        return items
+    return merge_salvaged_items(items, lost, replacements[:len(lost)])
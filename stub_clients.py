@@ -0,0 +1,277 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from duckduckgo_search.exceptions import RatelimitException
+from google.api_core import exceptions as google_exceptions
+
+import page_fetch
+import strategy
+import web_search
+from search_cache import SearchCache
+
+# -----------------------------------------------------------------------------
+# 오프라인 실행용 가짜 DDGS / Gemini 클라이언트
+# -----------------------------------------------------------------------------
+# 네트워크 없이 배치 실행이나 개발을 할 때 install()로 실제 클라이언트를 바꿔 끼웁니다.
+# 같은 입력에는 항상 같은 결과를 돌려줍니다. (configure()로 지연/오류/깨진 JSON을 켜지 않는 한)
+STUB_MODEL_NAME = "models/stub-gemini"
+
+# configure()로 바꾸는 동작 옵션 (벤치마크/장애 상황 재현용)
+STUB_OPTIONS = {
+    "search_latency": 0.0,     # DDGS 검색 1건당 지연(초)
+    "generate_latency": 0.0,   # Gemini 첫 조각까지의 지연(초)
+    "chunk_latency": 0.0,      # 스트림 조각 사이 지연(초)
+    "error_rate": 0.0,         # 일시적 오류(재시도 대상)를 낼 확률
+    "malformed_rate": 0.0,     # 응답 JSON 중 객체 하나를 깨뜨릴 확률
+    "field_size": 0,           # 긴 응답 흉내: 필드마다 덧붙일 글자 수
+    "page_latency": 0.0,       # 가짜 원문 페이지 응답 지연(초)
+    "page_size": 0,            # 가짜 원문 페이지에 덧붙일 바이트 수 (크기 제한 확인용)
+    "seed": 0,
+}
+_DEFAULT_STUB_OPTIONS = dict(STUB_OPTIONS)
+_rng_lock = threading.Lock()
+_rng = random.Random(0)
+
+
+def configure(**options):
+    """STUB_OPTIONS를 바꾸고 난수 시드를 다시 맞춥니다. 넘기지 않은 옵션은 기본값으로 돌아갑니다."""
+    global _rng
+    unknown = set(options) - set(STUB_OPTIONS)
+    if unknown:
+        raise ValueError(f"알 수 없는 스텁 옵션: {', '.join(sorted(unknown))}")
+    STUB_OPTIONS.update(_DEFAULT_STUB_OPTIONS, **options)
+    with _rng_lock:
+        _rng = random.Random(STUB_OPTIONS["seed"])
+
+
+def _chance(rate):
+    if rate <= 0:
+        return False
+    with _rng_lock:
+        return _rng.random() < rate
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+
+
+class StubDDGS:
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, region=None, safesearch=None, max_results=3):
+        if STUB_OPTIONS["search_latency"]:
+            time.sleep(STUB_OPTIONS["search_latency"])
+        if _chance(STUB_OPTIONS["error_rate"]):
+            raise RatelimitException("stub: rate limited")
+        digest = _digest(query)
+        base_url = page_server.base_url if page_server else "https://example.com"
+        return [
+            {
+                "title": f"{query} 관련 글 {idx + 1}",
+                "body": f"{query}에 대한 후기와 특징을 정리한 글입니다. ({digest}-{idx})",
+                "href": f"{base_url}/{digest}/{idx}",
+            }
+            for idx in range(max_results)
+        ]
+
+
+class _StubTokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class _StubUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class _StubChunk:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class StubResponse:
+    """generate_content 응답 흉내. .text로 전체를, 순회하면 조각을 돌려줍니다. (마지막 조각에 토큰 수)"""
+
+    def __init__(self, text, chunk_size=64, prompt=""):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.usage_metadata = _StubUsage(max(len(prompt) // 2, 1), max(len(text) // 2, 1))
+
+    def __iter__(self):
+        starts = range(0, len(self.text), self.chunk_size)
+        for i in starts:
+            if STUB_OPTIONS["chunk_latency"] and i:
+                time.sleep(STUB_OPTIONS["chunk_latency"])
+            usage = self.usage_metadata if i == starts[-1] else None
+            yield _StubChunk(self.text[i : i + self.chunk_size], usage)
+
+
+class StubGenerativeModel:
+    def __init__(self, model_name=STUB_MODEL_NAME, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        if STUB_OPTIONS["generate_latency"]:
+            time.sleep(STUB_OPTIONS["generate_latency"])
+        if _chance(STUB_OPTIONS["error_rate"]):
+            raise google_exceptions.ServiceUnavailable("stub: service unavailable")
+        text = build_stub_output(prompt, STUB_OPTIONS["field_size"])
+        if _chance(STUB_OPTIONS["malformed_rate"]):
+            text = corrupt_output(text)
+        return StubResponse(text, prompt=prompt)
+
+    def count_tokens(self, text):
+        return _StubTokenCount(max(len(text) // 2, 1))
+
+
+def build_stub_output(prompt, field_size=0):
+    # 프롬프트가 요구한 개수("CEP N가지")만큼 CEP를 만들어 코드펜스로 감싼 JSON으로 돌려줍니다.
+    # field_size를 주면 긴 응답을 흉내 내도록 설명 필드에 그만큼 글자를 덧붙입니다.
+    match = re.search(r"CEP[^\d]{0,40}?(\d+)가지", prompt)
+    count = int(match.group(1)) if match else strategy.CEP_COUNT
+    digest = _digest(prompt)
+    padding = (" 실제 후기와 상세페이지 특징을 바탕으로 정리했습니다." * (field_size // 28 + 1))[:field_size]
+    items = [
+        {
+            "cep_title": f"CEP {idx + 1}. 테스트 상황 {digest}",
+            "situation_summary": "오프라인 스텁이 만든 상황 묘사입니다." + padding,
+            "thought": "\"이거 정말 괜찮을까?\"",
+            "trigger_behavior": "검색 -> 후기 비교 -> 구매",
+            "concept_keyword": "#테스트",
+            "ref_keyword": "다이어트",
+            "hooking_copy": f"테스트 후킹 카피 {idx + 1}",
+            "visual_guide": "테스트 비주얼 가이드",
+            "landing_section": "테스트 랜딩 섹션" + padding,
+        }
+        for idx in range(count)
+    ]
+    return "```json\n" + json.dumps(items, ensure_ascii=False, indent=2) + "\n```"
+
+
+def corrupt_output(text):
+    """가운데 객체 하나의 따옴표를 지워 JSON을 깨뜨립니다. (나머지 객체는 그대로 읽혀야 정상)"""
+    marker = '"hooking_copy": "'
+    positions = [m.start() for m in re.finditer(re.escape(marker), text)]
+    if not positions:
+        return text
+    pos = positions[len(positions) // 2] + len(marker) - 1
+    return text[:pos] + text[pos + 1:]
+
+
+class _StubPageHandler(BaseHTTPRequestHandler):
+    # keep-alive 확인을 위해 HTTP/1.1 + Content-Length로 응답합니다.
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            self._respond()
+        finally:
+            with server.stats_lock:
+                server.active -= 1
+
+    def _respond(self):
+        if STUB_OPTIONS["page_latency"]:
+            time.sleep(STUB_OPTIONS["page_latency"])
+        if self.path.startswith("/missing"):
+            self.send_error(404)
+            return
+        if self.path.startswith("/redirect"):
+            # /redirect?to=<주소>: 리다이렉트 검사 확인용
+            self.send_response(302)
+            self.send_header("Location", parse_qs(urlsplit(self.path).query)["to"][0])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = build_stub_page(self.path, STUB_OPTIONS["page_size"]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubPageServer(ThreadingHTTPServer):
+    """검색 결과 href가 가리키는 로컬 가짜 페이지 서버. (원문 수집을 네트워크 없이 돌려보는 용도)"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _StubPageHandler)
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.active = 0          # 지금 처리 중인 요청 수
+        self.max_active = 0      # 동시에 처리한 최대 요청 수 (호스트별 제한 확인용)
+        self.base_url = f"http://{host}:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, name="stub-page-server", daemon=True).start()
+
+    def handle_error(self, request, client_address):
+        # 수집기가 크기/시간 한도에서 연결을 끊는 것은 정상 동작이므로 조용히 넘어갑니다.
+        pass
+
+
+def build_stub_page(path, padding=0):
+    # 메뉴/스크립트/푸터 사이에 <article> 본문이 있는 흔한 후기 글 구조를 흉내 냅니다.
+    digest = _digest(path)
+    filler = ("<p>" + "실사용 기간이 길어질수록 장단점이 분명해졌습니다. " * 4 + "</p>\n") * (padding // 300 + 1) if padding else ""
+    return (
+        "<!doctype html><html><head><meta charset=\"utf-8\"><title>후기</title>"
+        "<script>var tracking = 'ignore me';</script><style>body{margin:0}</style></head><body>"
+        "<nav><a href=\"/\">홈</a> <a href=\"/best\">베스트 상품 모아보기 메뉴</a></nav>"
+        "<article>"
+        f"<h1>한 달 써 본 솔직한 사용 후기 ({digest})</h1>"
+        "<p>퇴근하고 집에 오면 운동하러 나갈 힘이 없어서, 거실에서 할 수 있는 걸 찾다가 구매했습니다.</p>"
+        "<p>처음 일주일은 소음이 신경 쓰였지만, 매트를 깔고 나서는 아래층 민원 걱정 없이 쓰고 있어요.</p>"
+        "<p>아쉬운 점은 부피가 생각보다 커서 보관 공간을 따로 마련해야 한다는 점입니다.</p>"
+        f"{filler}"
+        "</article>"
+        "<aside>이 글과 비슷한 추천 상품 광고 영역입니다.</aside>"
+        "<footer>Copyright 2024 Stub Review Blog. All rights reserved.</footer>"
+        "</body></html>"
+    )
+
+
+page_server = None
+
+
+def install():
+    """검색/생성 클라이언트를 스텁으로 교체합니다. 고정 모델명을 반환합니다."""
+    global page_server
+    # 가짜 결과가 디스크 캐시에 섞이지 않도록 메모리 전용 캐시로 바꿉니다.
+    web_search.search_cache = SearchCache(path=":memory:")
+    web_search.search_client_factory = StubDDGS
+    strategy.model_factory = StubGenerativeModel
+    # 검색 결과 href는 로컬 가짜 페이지 서버를 가리키고, 원문 수집기는 그 주소(루프백)를 허용합니다.
+    if page_server is None:
+        page_server = StubPageServer()
+    page_fetch.page_fetcher = page_fetch.PageFetcher(cache=SearchCache(path=":memory:"), allow_private_hosts=True)
+    return STUB_MODEL_NAME
@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# 모듈을 import할 때 만들어지는 공용 캐시/기록 DB가 실제 파일을 건드리지 않도록 임시 폴더를 씁니다.
+_TMP_DIR = tempfile.mkdtemp(prefix="cep-tests-")
+os.environ.setdefault("CEP_SEARCH_CACHE_PATH", os.path.join(_TMP_DIR, "search_cache.sqlite3"))
+os.environ.setdefault("CEP_PAGE_CACHE_PATH", os.path.join(_TMP_DIR, "page_cache.sqlite3"))
+os.environ.setdefault("CEP_HISTORY_DB_PATH", os.path.join(_TMP_DIR, "history.sqlite3"))
+
+# 저장소 루트의 모듈(strategy, json_extract 등)을 그대로 import 합니다.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """stub_clients.install()과 같지만 테스트가 끝나면 원래 클라이언트로 되돌립니다. 고정 모델명을 반환합니다."""
+    import stub_clients
+    import strategy
+    import web_search
+    from search_cache import SearchCache
+
+    stub_clients.configure()
+    monkeypatch.setattr(web_search, "search_cache", SearchCache(path=":memory:"))
+    monkeypatch.setattr(web_search, "search_client_factory", stub_clients.StubDDGS)
+    monkeypatch.setattr(strategy, "model_factory", stub_clients.StubGenerativeModel)
+    yield stub_clients.STUB_MODEL_NAME
+    stub_clients.configure()
@@ -0,0 +1,61 @@
+import json
+
+import batch_runner
+import strategy
+from resilience import ddgs_service, gemini_service
+
+ROWS = [
+    {"row_id": "r1", "product": "저소음 스텝퍼", "target": "4050 주부", "details": "하루 10분",
+     "platform": strategy.DEFAULT_PLATFORM, "tone": strategy.DEFAULT_TONE},
+    {"row_id": "r2", "product": "폼롤러", "target": "직장인", "details": "휴대용",
+     "platform": strategy.DEFAULT_PLATFORM, "tone": strategy.DEFAULT_TONE},
+]
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_run_batch_writes_rows_and_resumes(offline, tmp_path):
+    output = tmp_path / "out.jsonl"
+    summary = batch_runner.run_batch(ROWS, str(output), api_key="offline", pinned_model=offline,
+                                     search_rate=None, generation_rate=None)
+    assert summary == {"total": 2, "skipped": 0, "ok": 2, "degraded": 0, "error": 0}
+    assert all(len(r["data"]) == strategy.CEP_COUNT for r in _records(output))
+
+    summary = batch_runner.run_batch(ROWS, str(output), api_key="offline", pinned_model=offline,
+                                     search_rate=None, generation_rate=None)
+    assert summary["skipped"] == 2
+
+
+def test_run_batch_restores_shared_service_limits(offline, tmp_path):
+    before = (ddgs_service.settings(), gemini_service.settings())
+    batch_runner.run_batch(ROWS[:1], str(tmp_path / "out.jsonl"), api_key="offline", pinned_model=offline,
+                           search_rate=5.0, generation_rate=0.5)
+    assert (ddgs_service.settings(), gemini_service.settings()) == before
+
+
+def test_low_search_rate_queues_rows_instead_of_failing_them(offline, tmp_path, monkeypatch):
+    # 앱 기본 제한 시간을 줄여, 늘려 주지 않으면 토큰 대기만으로 검색이 시간 초과되는 상황을 만듭니다.
+    monkeypatch.setattr(batch_runner, "SEARCH_QUERY_TIMEOUT_SEC", 0.2)
+    monkeypatch.setattr(batch_runner, "SEARCH_DEADLINE_SEC", 0.3)
+    rows = [dict(ROWS[0], row_id=f"r{i}", product=f"스텝퍼 {i}") for i in range(6)]
+    output = tmp_path / "out.jsonl"
+    summary = batch_runner.run_batch(rows, str(output), api_key="offline", pinned_model=offline, workers=2,
+                                     search_rate=4.0, generation_rate=None)
+    assert summary["ok"] == 6
+    assert all(r["status"] == "ok" for r in _records(output))
+
+
+def test_rows_built_from_failed_searches_are_marked_degraded(offline, tmp_path, monkeypatch):
+    real_search = strategy.run_searches_concurrently
+    monkeypatch.setattr(strategy, "run_searches_concurrently",
+                        lambda queries, **kwargs: [real_search(queries[:1], **kwargs)[0], None])
+    output = tmp_path / "out.jsonl"
+    summary = batch_runner.run_batch(ROWS[:1], str(output), api_key="offline", pinned_model=offline,
+                                     search_rate=None, generation_rate=None)
+    assert summary["degraded"] == 1
+    record = _records(output)[0]
+    assert record["status"] == "degraded" and record["context"]["failed_searches"] == 1
+    # 성공으로 치지 않으므로 다시 실행하면 재생성합니다.
+    assert batch_runner.load_completed_ids(str(output)) == set()
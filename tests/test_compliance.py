@@ -0,0 +1,64 @@
+import pytest
+
+from compliance import AhoCorasick, ComplianceScanner, check_compliance_risks, get_compliance_scanner, scan_cep_items
+
+TERMS = [("최고", "최상급 표현"), ("최고급", "최상급 표현"), ("부작용 없", "안전성 표현"), ("No.1", "최상급 표현")]
+
+
+def test_finds_overlapping_terms_with_original_positions():
+    scanner = ComplianceScanner(TERMS)
+    text = "이건 최고급 제품"
+    matches = scanner.scan(text)
+    assert {m["term"] for m in matches} == {"최고", "최고급"}
+    for m in matches:
+        assert text[m["start"]:m["end"]].replace(" ", "") == m["term"].replace(" ", "")
+
+
+def test_ignores_spacing_and_case():
+    scanner = ComplianceScanner(TERMS)
+    matches = scanner.scan("부 작용없는 업계 no.1")
+    assert [m["term"] for m in matches] == ["부작용 없", "No.1"]
+    assert matches[0]["start"] == 0
+
+
+@pytest.mark.parametrize("text", [
+    "정기적으로 배송됩니다",
+    "주기적으로 스트레칭",
+    "최 고객 만족",
+    "최상단 고정 배너",
+    "예방접종 안내",
+])
+def test_everyday_words_are_not_flagged(text):
+    assert check_compliance_risks(text) == []
+
+
+def test_exceptions_only_hide_matches_inside_them():
+    scanner = ComplianceScanner([("기적", "과장 효능 표현", ("정기적",))])
+    assert [m["start"] for m in scanner.scan("정기적 관리로 만드는 기적")] == [12]
+    assert check_compliance_risks("기적의 다이어트") == ["기적"]
+    assert check_compliance_risks("예방 효과") == ["예방"]
+
+
+def test_multi_char_lowercase_keeps_positions_aligned():
+    # 'İ'.lower()는 두 글자('i' + 결합 점)입니다.
+    scanner = ComplianceScanner(TERMS)
+    text = "İİ 최고"
+    matches = scanner.scan(text)
+    assert [(m["term"], m["start"], m["end"]) for m in matches] == [("최고", 3, 5)]
+    assert get_compliance_scanner().scan("İ 최고")
+    assert scan_cep_items([{"hooking_copy": "İİ 완치 보장"}])[0]["hooking_copy"]
+
+
+def test_aho_corasick_matches_every_occurrence():
+    automaton = AhoCorasick([("he", 1), ("she", 2), ("hers", 3)])
+    assert sorted(automaton.iter_matches("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 3)]
+
+
+def test_scan_cep_items_reports_only_risky_fields():
+    report = scan_cep_items([
+        {"hooking_copy": "가볍게 시작하는 홈트"},
+        {"hooking_copy": "최고의 선택", "landing_section": "부작용 없는 100% 환불", "count": 3},
+    ])
+    assert list(report) == [1]
+    assert report[1]["hooking_copy"] == ["최고"]
+    assert "100%" in report[1]["landing_section"]
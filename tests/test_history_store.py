@@ -0,0 +1,64 @@
+import pytest
+
+from history_store import HistoryStore
+
+PLATFORMS = ["숏폼", "피드", "배너"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    for i in range(25):
+        store.add({"timestamp": f"2024-01-01 00:00:{i:02d}", "product": f"제품{i % 5}", "target": "타겟",
+                   "platform": PLATFORMS[i % 3], "tone": "톤", "data": [{"cep_title": f"CEP {i}"}] * (i % 3 + 1)})
+    return store
+
+
+def _all_pages(store, **filters):
+    ids, before_id, pages = [], None, 0
+    while True:
+        rows, has_more = store.list_page(before_id=before_id, limit=10, **filters)
+        ids += [r["id"] for r in rows]
+        pages += 1
+        if not has_more:
+            return ids, pages
+        before_id = rows[-1]["id"]
+
+
+def test_keyset_pages_cover_everything_newest_first(store):
+    ids, pages = _all_pages(store)
+    assert ids == list(range(25, 0, -1))
+    assert pages == 3
+
+
+def test_page_summaries_leave_out_data(store):
+    rows, has_more = store.list_page(limit=10)
+    assert has_more and len(rows) == 10
+    assert "data" not in rows[0]
+    assert [r["item_count"] for r in rows[:3]] == [1, 3, 2]   # id 25 -> i=24 -> 24 % 3 + 1
+
+
+def test_filters_by_product_prefix_and_platform(store):
+    ids, _ = _all_pages(store, product="제품1")
+    assert ids == [22, 17, 12, 7, 2]
+    ids, _ = _all_pages(store, platform="피드")
+    assert ids == list(range(23, 0, -3))
+    ids, _ = _all_pages(store, product="제품", platform="배너")
+    assert ids == list(range(24, 0, -3))
+
+
+def test_exact_last_page_reports_no_more(store):
+    rows, has_more = store.list_page(before_id=11, limit=10)
+    assert [r["id"] for r in rows] == list(range(10, 0, -1))
+    assert has_more is False
+
+
+def test_iter_entries_streams_every_entry_with_data(store):
+    entries = list(store.iter_entries(batch_size=7))
+    assert [e["id"] for e in entries] == list(range(25, 0, -1))
+    assert entries[1]["data"] == [{"cep_title": "CEP 23"}] * 3
+
+
+def test_get_returns_full_entry_or_none(store):
+    assert store.get(1)["data"] == [{"cep_title": "CEP 0"}]
+    assert store.get(999) is None
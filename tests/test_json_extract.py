@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import stub_clients
+from json_extract import (
+    IncrementalJSONArrayParser,
+    extract_json_from_text,
+    merge_salvaged_items,
+    salvage_json_from_text,
+)
+
+
+def _stub_text(count=7):
+    return stub_clients.build_stub_output(f"CEP {count}가지")
+
+
+def test_clean_array_in_code_fence():
+    items, lost = salvage_json_from_text(_stub_text(), 7)
+    assert len(items) == 7
+    assert lost == []
+
+
+def test_trailing_commas_are_fixed():
+    items, lost = salvage_json_from_text('[\n {"a": 1,},\n {"a": [1, 2,], "b": {"c": 1}}\n]')
+    assert items == [{"a": 1}, {"a": [1, 2], "b": {"c": 1}}]
+    assert lost == []
+
+
+def test_corrupt_output_loses_only_the_middle_item():
+    items, lost = salvage_json_from_text(stub_clients.corrupt_output(_stub_text()), 7)
+    assert lost == [3]
+    assert [item["hooking_copy"] for item in items] == [f"테스트 후킹 카피 {n}" for n in (1, 2, 3, 5, 6, 7)]
+
+
+def test_missing_closing_brace_resyncs_on_next_object():
+    items, lost = salvage_json_from_text('[{"a":1},{"a":2,"b":3,{"a":3},{"a":4}]')
+    assert items == [{"a": 1}, {"a": 3}, {"a": 4}]
+    assert lost == [1]
+
+
+def test_unterminated_string_resyncs_on_next_object():
+    items, lost = salvage_json_from_text('[{"a":"x},{"a":2},{"a":3}]')
+    assert items == [{"a": 2}, {"a": 3}]
+    assert lost == [0]
+
+
+def test_prose_before_array_is_not_counted():
+    text = '예시는 {제품명} 형식입니다. [입력 정보] 참고\n```json\n[{"a":1},{"a":2}]\n```\n끝 {x}'
+    items, lost = salvage_json_from_text(text, 2)
+    assert items == [{"a": 1}, {"a": 2}]
+    assert lost == []
+
+
+def test_truncated_last_object_and_missing_count():
+    items, lost = salvage_json_from_text('[{"a":1},{"a":2', 4)
+    assert items == [{"a": 1}]
+    assert lost == [1, 2, 3]
+
+
+def test_streaming_char_by_char_matches_whole_text():
+    text = stub_clients.corrupt_output(_stub_text())
+    parser = IncrementalJSONArrayParser()
+    streamed = []
+    for c in text:
+        streamed += parser.feed(c)
+    assert parser.finish(7) == [3]
+    assert streamed == salvage_json_from_text(text, 7)[0]
+
+
+def test_merge_puts_replacements_into_lost_slots():
+    text = stub_clients.corrupt_output(_stub_text())
+    items, lost = salvage_json_from_text(text, 7)
+    merged = merge_salvaged_items(items, lost, [{"hooking_copy": "다시 만든 카피"}])
+    assert [item["hooking_copy"] for item in merged] == [
+        "테스트 후킹 카피 1", "테스트 후킹 카피 2", "테스트 후킹 카피 3", "다시 만든 카피",
+        "테스트 후킹 카피 5", "테스트 후킹 카피 6", "테스트 후킹 카피 7",
+    ]
+
+
+def test_extract_raises_when_nothing_is_readable():
+    with pytest.raises(Exception):
+        extract_json_from_text("JSON이 없는 응답")
+    assert extract_json_from_text(json.dumps([{"a": 1}])) == [{"a": 1}]
@@ -0,0 +1,47 @@
+import json
+import logging
+
+import pytest
+
+import metrics as metrics_module
+from metrics import MetricsRegistry, quantile
+
+
+def test_quantile_uses_nearest_rank():
+    samples = sorted(float(i) for i in range(1, 101))
+    assert quantile(samples, 0.5) == 50.0
+    assert quantile(samples, 0.95) == 95.0
+    assert quantile(samples, 0.99) == 99.0
+    assert quantile([], 0.5) == 0.0
+
+
+def test_timed_records_errors_and_fields():
+    registry = MetricsRegistry()
+    with registry.timed("parse") as event:
+        event["items"] = 3
+    with pytest.raises(ValueError):
+        with registry.timed("parse"):
+            raise ValueError()
+    (row,) = registry.summary()
+    assert (row["stage"], row["count"], row["errors"]) == ("parse", 2, 1)
+
+
+def test_prometheus_text_has_summary_and_counters():
+    registry = MetricsRegistry()
+    registry.observe("search", 0.25)
+    registry.incr("search_cache_hits", 2)
+    text = registry.prometheus_text()
+    assert 'cep_stage_duration_seconds{stage="search",quantile="0.5"} 0.250000' in text
+    assert "cep_search_cache_hits_total 2" in text
+
+
+def test_events_are_logged_by_default(caplog):
+    assert metrics_module.logger.isEnabledFor(logging.INFO)
+    metrics_module.logger.propagate = True
+    try:
+        with caplog.at_level(logging.INFO, logger="cep.metrics"):
+            MetricsRegistry().observe("generate", 0.1, model="m")
+    finally:
+        metrics_module.logger.propagate = False
+    event = json.loads(caplog.records[-1].getMessage())
+    assert event["event"] == "generate" and event["duration_ms"] == 100.0 and event["model"] == "m"
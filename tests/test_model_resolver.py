@@ -0,0 +1,117 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import model_resolver
+import strategy
+import stub_clients
+from model_resolver import MODEL_CACHE_TTL_SEC, ModelResolver, _pick_model
+
+GENERATE = ["generateContent"]
+
+
+def _model(name, methods=GENERATE):
+    return SimpleNamespace(name=name, supported_generation_methods=methods)
+
+
+class FakeCatalog:
+    """genai.list_models 대역. 호출될 때마다 listings에서 다음 목록을 꺼냅니다. (마지막 목록은 계속 유지)"""
+
+    def __init__(self, *listings):
+        self.listings = list(listings)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        listing = self.listings[0] if len(self.listings) == 1 else self.listings.pop(0)
+        if isinstance(listing, Exception):
+            raise listing
+        return iter(listing)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """list_models를 가짜로 바꾸고, 새 ModelResolver를 strategy에서도 쓰도록 끼워 넣습니다."""
+    fake = FakeCatalog([_model("models/gemini-1.5-flash")])
+    resolver = ModelResolver()
+    monkeypatch.setattr(model_resolver.genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(model_resolver.genai, "list_models", fake)
+    monkeypatch.setattr(model_resolver, "model_resolver", resolver)
+    monkeypatch.setattr(strategy, "model_resolver", resolver)
+    return fake
+
+
+def test_pick_model_preference_order():
+    models = [
+        _model("models/embedding-001", ["embedContent"]),
+        _model("models/gemini-pro"),
+        _model("models/gemini-1.5-pro"),
+        _model("models/gemini-1.5-flash"),
+    ]
+    assert _pick_model(models) == "models/gemini-1.5-flash"
+    assert _pick_model(models[:3]) == "models/gemini-1.5-pro"
+    assert _pick_model(models[:2]) == "models/gemini-pro"
+    # 선호 목록에 없으면 generateContent를 지원하는 첫 모델, 그것도 없으면 None
+    assert _pick_model([models[0], _model("models/other-a"), _model("models/other-b")]) == "models/other-a"
+    assert _pick_model(models[:1]) is None
+
+
+def test_resolution_is_cached_until_ttl(catalog):
+    assert ModelResolver().ttl == MODEL_CACHE_TTL_SEC == 6 * 60 * 60
+    resolver = ModelResolver(ttl=0.05)
+    catalog.listings = [[_model("models/gemini-1.5-pro")], [_model("models/gemini-1.5-flash")]]
+    assert resolver.resolve("key") == "models/gemini-1.5-pro"
+    assert resolver.resolve("key") == "models/gemini-1.5-pro"
+    assert catalog.calls == 1
+    time.sleep(0.06)
+    assert resolver.resolve("key") == "models/gemini-1.5-flash"
+    assert catalog.calls == 2
+
+
+def test_failed_lookup_is_not_cached(catalog):
+    catalog.listings = [ConnectionError("offline"), [_model("models/gemini-1.5-flash")]]
+    resolver = ModelResolver()
+    assert resolver.resolve("key") is None
+    assert resolver.resolve("key") == "models/gemini-1.5-flash"
+    assert catalog.calls == 2
+
+
+def test_pinned_model_skips_lookup(catalog):
+    assert ModelResolver().resolve("key", "models/pinned") == "models/pinned"
+    assert catalog.calls == 0
+
+
+class GoneModel(stub_clients.StubGenerativeModel):
+    """이름에 'retired'가 들어간 모델은 404를 냅니다."""
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        if "retired" in self.model_name:
+            raise google_exceptions.NotFound(f"model {self.model_name} not found")
+        return super().generate_content(prompt, generation_config, stream)
+
+
+def test_model_not_found_invalidates_cache_and_retries_once(catalog, monkeypatch):
+    monkeypatch.setattr(strategy, "model_factory", GoneModel)
+    catalog.listings = [[_model("models/gemini-1.5-flash-retired")], [_model("models/gemini-1.5-pro")]]
+    strategy.model_resolver.resolve("key")
+    response = strategy._start_generation("key", "CEP 1가지 retry-once")
+    assert response.text
+    assert catalog.calls == 2
+    assert strategy.model_resolver.resolve("key") == "models/gemini-1.5-pro"
+
+
+def test_model_not_found_retries_only_once(catalog, monkeypatch):
+    monkeypatch.setattr(strategy, "model_factory", GoneModel)
+    catalog.listings = [[_model("models/gemini-1.5-flash-retired")]]
+    with pytest.raises(google_exceptions.NotFound):
+        strategy._start_generation("key", "CEP 1가지 retry-twice")
+    assert catalog.calls == 2
+
+
+def test_pinned_model_is_not_retried(catalog, monkeypatch):
+    monkeypatch.setattr(strategy, "model_factory", GoneModel)
+    with pytest.raises(google_exceptions.NotFound):
+        strategy._start_generation("key", "CEP 1가지 pinned", pinned_model="models/gemini-retired")
+    assert catalog.calls == 0
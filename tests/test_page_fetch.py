@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+import page_fetch
+import stub_clients
+from page_fetch import PageFetcher, extract_main_text, pick_top_urls
+from search_cache import SearchCache
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = stub_clients.StubPageServer()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_stub_options():
+    stub_clients.configure()
+    yield
+    stub_clients.configure()
+
+
+class LoopbackIsPublic(PageFetcher):
+    """테스트용: 127.0.0.1은 공인 주소처럼, 나머지(localhost 등)는 기존 규칙대로 검사합니다."""
+
+    def _is_public_host(self, host, port=None):
+        return host == "127.0.0.1" or super()._is_public_host(host, port)
+
+
+def test_extracts_article_text_without_boilerplate():
+    text = extract_main_text(stub_clients.build_stub_page("/a/1"))
+    assert "한 달 써 본 솔직한 사용 후기" in text
+    assert "아래층 민원" in text
+    for noise in ("tracking", "베스트 상품", "광고 영역", "Copyright"):
+        assert noise not in text
+
+
+def test_falls_back_to_body_paragraphs_without_article():
+    html = "<html><body><nav>메뉴 메뉴 메뉴 메뉴 메뉴 메뉴 메뉴 메뉴</nav><div>본문 " + "내용 " * 10 + "</div></body></html>"
+    assert extract_main_text(html).startswith("본문 내용")
+
+
+def test_fetch_many_reuses_connections(server):
+    fetcher = PageFetcher(allow_private_hosts=True)
+    before_requests, before_connections = server.requests, server.connections
+    pages = fetcher.fetch_many([f"{server.base_url}/keepalive/{i}" for i in range(6)])
+    assert len(pages) == 6
+    assert server.requests - before_requests == 6
+    assert server.connections - before_connections <= page_fetch.PAGE_FETCH_PER_HOST
+
+
+def test_per_host_limit(server):
+    stub_clients.configure(page_latency=0.1)
+    server.max_active = 0
+    fetcher = PageFetcher(allow_private_hosts=True, per_host=1)
+    assert len(fetcher.fetch_many([f"{server.base_url}/limit/{i}" for i in range(3)])) == 3
+    assert server.max_active == 1
+    # 요청이 끝나면 호스트별 슬롯도 정리됩니다.
+    assert fetcher._host_slots == {}
+
+
+def test_byte_cap(server):
+    stub_clients.configure(page_size=2_000_000)
+    fetcher = PageFetcher(allow_private_hosts=True, max_bytes=32 * 1024)
+    html = fetcher._download(f"{server.base_url}/huge/1")
+    assert len(html.encode("utf-8")) <= 32 * 1024
+
+
+def test_deadline_returns_what_finished(server):
+    stub_clients.configure(page_latency=1.0)
+    fetcher = PageFetcher(allow_private_hosts=True)
+    started = time.monotonic()
+    assert fetcher.fetch_many([f"{server.base_url}/slow/{i}" for i in range(2)], deadline=0.2) == {}
+    assert time.monotonic() - started < 0.5
+
+
+def test_cache_hits_until_ttl_expires(server):
+    fetcher = PageFetcher(cache=SearchCache(path=":memory:", ttl=0.3), allow_private_hosts=True)
+    url = f"{server.base_url}/cached/1"
+    before = server.requests
+    first = fetcher.fetch_text(url)
+    assert fetcher.fetch_text(url) == first
+    assert server.requests - before == 1
+    time.sleep(0.4)
+    fetcher.fetch_text(url)
+    assert server.requests - before == 2
+
+
+def test_failures_are_skipped(server):
+    fetcher = PageFetcher(allow_private_hosts=True)
+    pages = fetcher.fetch_many([f"{server.base_url}/missing/1", f"{server.base_url}/ok/1", "ftp://example.com/x"])
+    assert list(pages) == [f"{server.base_url}/ok/1"]
+
+
+def test_private_hosts_are_blocked_by_default(server):
+    before = server.requests
+    assert PageFetcher().fetch_many([f"{server.base_url}/a", "http://localhost/", "http://10.0.0.1/"]) == {}
+    assert server.requests == before
+
+
+def test_hostname_resolving_to_private_address_is_blocked(server, monkeypatch):
+    monkeypatch.setattr(page_fetch.socket, "getaddrinfo",
+                        lambda host, port, **kwargs: [(2, 1, 6, "", ("169.254.169.254", port))])
+    with pytest.raises(page_fetch.BlockedURLError):
+        PageFetcher()._check_url("http://metadata.example.com/latest")
+
+
+def test_redirect_to_private_address_is_blocked(server):
+    before = server.requests
+    fetcher = LoopbackIsPublic()
+    target = f"http://localhost:{server.server_address[1]}/internal"
+    with pytest.raises(page_fetch.BlockedURLError):
+        fetcher._download(f"{server.base_url}/redirect?to={target}")
+    # 첫 요청(리다이렉트 응답)만 가고 내부 주소로는 요청하지 않습니다.
+    assert server.requests - before == 1
+
+
+def test_redirects_are_followed_and_bounded(server):
+    fetcher = PageFetcher(allow_private_hosts=True, max_redirects=1)
+    assert "사용 후기" in fetcher.fetch_text(f"{server.base_url}/redirect?to=/landing/1")
+    loop = f"{server.base_url}/redirect?to=/redirect%3Fto%3D/landing/2"
+    with pytest.raises(Exception):
+        fetcher.fetch_text(loop)
+
+
+def test_pick_top_urls_interleaves_groups():
+    groups = [[{"href": "a1"}, {"href": "a2"}], [{"href": "b1"}, {"href": "a1"}], None]
+    assert pick_top_urls(groups, k=3) == ["a1", "b1", "a2"]
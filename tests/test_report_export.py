@@ -0,0 +1,51 @@
+import csv
+import io
+import os
+
+from openpyxl import load_workbook
+
+from report_export import COMBINED_COLUMNS, build_combined_export, export_entry, iter_combined_csv
+
+
+def _entry(product, count=3):
+    return {"timestamp": "2024-01-01 00:00:00", "product": product, "target": "타겟", "platform": "매체",
+            "tone": "톤", "data": [{"cep_title": f"{product} CEP {i + 1}", "hooking_copy": "최고의 선택"}
+                                  for i in range(count)]}
+
+
+def _open_fds():
+    return len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else 0
+
+
+def test_combined_csv_has_one_row_per_cep():
+    data = build_combined_export((_entry(f"제품{i}") for i in range(4)), "csv")
+    assert isinstance(data, bytes)
+    rows = list(csv.reader(io.StringIO(data.decode("utf-8-sig"))))
+    assert rows[0] == COMBINED_COLUMNS
+    assert len(rows) == 1 + 4 * 3
+
+
+def test_combined_xlsx_is_readable():
+    data = build_combined_export([_entry("제품")], "xlsx")
+    sheet = load_workbook(io.BytesIO(data), read_only=True).active
+    assert sum(1 for _ in sheet.iter_rows()) == 1 + 3
+
+
+def test_combined_export_does_not_leak_file_handles():
+    before = _open_fds()
+    for _ in range(5):
+        build_combined_export([_entry("제품")], "csv")
+    assert _open_fds() <= before
+
+
+def test_csv_chunks_put_bom_only_in_first_chunk():
+    chunks = list(iter_combined_csv((_entry(f"제품{i}", 10) for i in range(10)), rows_per_chunk=7))
+    assert len(chunks) > 1
+    assert chunks[0].startswith(b"\xef\xbb\xbf")
+    assert not any(chunk.startswith(b"\xef\xbb\xbf") for chunk in chunks[1:])
+
+
+def test_export_entry_is_memoized_by_content():
+    first = export_entry(_entry("캐시 제품"), "xlsx")
+    assert export_entry(_entry("캐시 제품"), "xlsx") is first
+    assert export_entry(_entry("다른 제품"), "xlsx") is not first
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from rate_limit import TokenBucket
+from resilience import CircuitOpenError, RateLimitTimeoutError, ServiceGuard
+
+
+class Flaky(Exception):
+    pass
+
+
+def _guard(**overrides):
+    options = dict(max_attempts=3, base_delay=0, max_delay=0, failure_threshold=2, reset_timeout=0.05)
+    options.update(overrides)
+    return ServiceGuard("test", lambda e: isinstance(e, Flaky), **options)
+
+
+def _failing(calls):
+    def fn():
+        calls.append(1)
+        raise Flaky()
+    return fn
+
+
+def test_retries_until_success():
+    guard = _guard()
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Flaky()
+        return "ok"
+
+    assert guard.call(fn) == "ok"
+    assert guard.stats()["retries"] == 2
+    assert guard.breaker.state == "closed"
+
+
+def test_retries_of_one_request_count_as_one_breaker_failure():
+    guard = _guard(max_attempts=4)
+    calls = []
+    with pytest.raises(Flaky):
+        guard.call(_failing(calls))
+    assert len(calls) == 4
+    assert guard.breaker.state == "closed"
+
+    with pytest.raises(Flaky):
+        guard.call(_failing(calls))
+    assert guard.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        guard.call(lambda: "ok")
+    assert guard.stats()["rejected"] == 1
+
+
+def test_half_open_trial_closes_breaker_on_success():
+    guard = _guard(max_attempts=1, failure_threshold=1)
+    with pytest.raises(Flaky):
+        guard.call(_failing([]))
+    assert guard.breaker.state == "open"
+    time.sleep(0.06)
+    assert guard.breaker.state == "half-open"
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.breaker.state == "closed"
+
+
+def test_non_retryable_errors_do_not_trip_breaker():
+    guard = _guard(failure_threshold=1)
+
+    def bad_request():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        guard.call(bad_request)
+    assert guard.stats()["calls"] == 1
+    assert guard.breaker.state == "closed"
+
+
+def test_mid_stream_failure_is_recorded():
+    guard = _guard(failure_threshold=1)
+
+    def broken_stream():
+        yield "first"
+        raise Flaky()
+
+    chunks = []
+    with pytest.raises(Flaky):
+        for chunk in guard.call_stream(broken_stream):
+            chunks.append(chunk)
+    assert chunks == ["first"]
+    assert guard.breaker.state == "open"
+
+
+def test_completed_stream_records_success():
+    guard = _guard()
+    guard.breaker.record_failure()
+    assert list(guard.call_stream(lambda: iter(["a", "b"]))) == ["a", "b"]
+    assert guard.breaker._failures == 0
+
+
+def test_limiter_timeout_is_not_retried_or_counted_as_failure():
+    guard = _guard(rate=0.5, burst=1, failure_threshold=1)
+    assert guard.call(lambda: "ok") == "ok"
+    calls = []
+    started = time.monotonic()
+    for _ in range(3):
+        with pytest.raises(RateLimitTimeoutError):
+            guard.call(calls.append, 1, deadline=time.monotonic() + 0.1)
+    # 토큰을 1초 넘게 기다려야 하므로 기다리지 않고 바로 포기합니다.
+    assert time.monotonic() - started < 0.1
+    assert calls == []
+    assert guard.breaker.state == "closed"
+    assert guard.stats()["throttled"] == 3 and guard.stats()["retries"] == 0
+
+
+def test_token_bucket_serves_waiters_in_order():
+    bucket = TokenBucket(rate=20, burst=1)
+    assert bucket.acquire(timeout=0)
+    # 이미 예약된 토큰이 있으므로 다음 대기자는 한 칸씩 뒤로 밀립니다.
+    assert bucket.acquire(timeout=0.1)
+    assert not bucket.acquire(timeout=0.01)
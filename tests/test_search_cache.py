@@ -0,0 +1,59 @@
+import time
+
+from search_cache import SearchCache
+
+
+def test_memory_then_disk_hits(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SearchCache(path=path)
+    key = SearchCache.make_key("리압스텝퍼 후기", "kr-kr", "off", 5)
+    assert cache.get(key) is None
+    cache.set(key, [{"title": "후기"}])
+    assert cache.get(key) == [{"title": "후기"}]
+
+    # 새 프로세스(새 인스턴스)는 디스크 계층에서 읽습니다.
+    reopened = SearchCache(path=path)
+    assert reopened.get(key) == [{"title": "후기"}]
+    stats = reopened.stats()
+    assert stats["disk_hits"] == 1 and stats["memory_entries"] == 1
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = SearchCache(path=str(tmp_path / "cache.sqlite3"), ttl=0.2)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    time.sleep(0.25)
+    assert cache.get("k") is None
+    assert SearchCache(path=str(tmp_path / "cache.sqlite3"), ttl=0.2).get("k") is None
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = SearchCache(path=":memory:", max_memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert list(cache._memory) == ["b", "c"]
+    # 메모리에서 밀려난 항목도 디스크 계층에는 남아 있습니다.
+    assert cache.get("a") == "a"
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SearchCache(path=path, max_memory_entries=1, max_disk_entries=2)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")          # 디스크에서 읽으며 a의 사용 시각이 갱신됨
+    time.sleep(0.01)
+    cache.set("c", 3)       # 가장 오래 안 쓴 b가 빠짐
+    reopened = SearchCache(path=path)
+    assert reopened.get("b") is None
+    assert reopened.get("a") == 1 and reopened.get("c") == 3
+
+
+def test_hit_rate():
+    cache = SearchCache(path=":memory:")
+    cache.set("k", 1)
+    cache.get("k")
+    cache.get("missing")
+    assert cache.stats()["hit_rate"] == 0.5
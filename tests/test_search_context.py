@@ -0,0 +1,99 @@
+from resilience import gemini_service
+from search_context import build_page_context, build_search_context, estimate_tokens, make_model_token_counter
+
+
+def _result(title, body, href):
+    return {"title": title, "body": body, "href": href}
+
+
+def test_duplicate_urls_across_groups_are_dropped():
+    groups = [
+        ("후기", [_result("스텝퍼 후기", "층간소음 없이 쓰기 좋아요", "https://www.blog.com/post/1/")]),
+        ("특징", [_result("다른 제목", "전혀 다른 본문 내용입니다", "https://m.blog.com/post/1"),
+                  _result("상세 특징", "접이식이라 보관이 쉽습니다", "https://shop.com/item")]),
+    ]
+    context, report = build_search_context(groups, "스텝퍼", "주부")
+    assert report["kept"] == 2 and report["dropped_duplicates"] == 1
+    assert "다른 제목" not in context
+
+
+def test_near_duplicate_snippets_are_dropped():
+    body = "하루 10분 홈트로 붓기가 빠졌다는 후기가 많습니다"
+    groups = [("후기", [_result("후기 A", body, "https://a.com/1"), _result("후기 A", body + "!", "https://b.com/2")])]
+    _, report = build_search_context(groups, "스텝퍼", "주부")
+    assert report["kept"] == 1 and report["dropped_duplicates"] == 1
+
+
+def test_relevant_results_win_when_budget_is_tight():
+    groups = [("결과", [
+        _result("무관한 글", "오늘 날씨 이야기 " * 5, "https://a.com/1"),
+        _result("스텝퍼 주부 후기", "스텝퍼를 쓴 주부의 후기 " * 5, "https://b.com/2"),
+    ])]
+    context, report = build_search_context(groups, "스텝퍼", "주부", token_budget=80)
+    assert report["kept"] == 1 and report["dropped_over_budget"] == 1
+    assert "스텝퍼 주부 후기" in context
+    assert report["context_tokens"] <= 80
+
+
+def test_failed_group_is_marked_and_header_kept():
+    context, report = build_search_context([("후기", None), ("특징", [])], "스텝퍼", "주부")
+    assert context.count("검색 결과 없음") == 2
+    assert report["kept"] == 0
+
+
+def test_model_token_counter_measures_ratio_once():
+    calls = []
+
+    class Model:
+        def __init__(self, name):
+            pass
+
+        def count_tokens(self, text):
+            calls.append(text)
+            return type("Count", (), {"total_tokens": len(text) // 4})()
+
+    calls_before = gemini_service.stats()["calls"]
+    count = make_model_token_counter("models/test-ratio", Model)
+    assert count("가" * 40) == 10
+    assert count("가" * 80) == 20
+    assert len(calls) == 1
+    # 측정 호출도 gemini_service(속도 제한/재시도/서킷 브레이커)를 거칩니다.
+    assert gemini_service.stats()["calls"] == calls_before + 1
+    assert estimate_tokens("") == 0
+
+
+def test_failed_token_measurement_is_retried_by_the_next_counter():
+    outcomes = [ValueError("bad request"), 10]
+
+    class Model:
+        def __init__(self, name):
+            pass
+
+        def count_tokens(self, text):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return type("Count", (), {"total_tokens": outcome})()
+
+    count = make_model_token_counter("models/test-flaky", Model)
+    # 실패하면 기본 비율로 세고, 같은 요청 안에서는 다시 측정하지 않습니다.
+    assert count("가" * 18) == estimate_tokens("가" * 18) == 10
+    assert count("가" * 36) == 20
+    assert outcomes == [10]
+    count = make_model_token_counter("models/test-flaky", Model)
+    assert count("가" * 40) == 10
+    assert count("가" * 80) == 20
+    assert outcomes == []
+
+
+def test_page_context_splits_budget_across_pages():
+    pages = {"https://a.com/1": "짧은 본문입니다.", "https://b.com/2": "긴 본문 " * 400, "https://c.com/3": "중간 본문 " * 60}
+    context, report = build_page_context(pages, token_budget=300)
+    assert report["pages_used"] == 3
+    assert report["page_tokens"] <= 300
+    assert "짧은 본문입니다." in context
+    assert context.index("a.com") < context.index("b.com") < context.index("c.com")
+
+
+def test_page_context_is_empty_without_pages():
+    assert build_page_context({}) == ("", {"pages_used": 0, "page_tokens": 0})
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import FlightCancelled, SingleFlight
+
+
+def _run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target()
+        except BaseException as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "결과"
+
+    results, errors = _run_concurrently(5, lambda: flight.do("k", slow))
+    assert results == ["결과"] * 5 and errors == [None] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "followers": 4, "in_flight": 0}
+
+
+def test_errors_reach_every_caller_and_key_is_released():
+    flight = SingleFlight("test")
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    _, errors = _run_concurrently(3, lambda: flight.do("k", fail))
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert flight.do("k", lambda: "again") == "again"
+
+
+def test_follower_timeout_and_cancel_do_not_stop_leader():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("k", lambda: release.wait(5) and "done"))
+    leader.start()
+    time.sleep(0.05)
+    with pytest.raises(TimeoutError):
+        flight.do("k", lambda: "unused", timeout=0.2)
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(FlightCancelled):
+        flight.do("k", lambda: "unused", cancel_event=cancel)
+    release.set()
+    leader.join(5)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_streams_are_started_once_and_replayed_to_every_reader():
+    flight = SingleFlight("test")
+    starts = []
+
+    def start():
+        starts.append(1)
+
+        def chunks():
+            for i in range(5):
+                time.sleep(0.02)
+                yield i
+        return chunks()
+
+    results, errors = _run_concurrently(4, lambda: list(flight.do_stream("k", start)))
+    assert results == [[0, 1, 2, 3, 4]] * 4 and errors == [None] * 4
+    assert len(starts) == 1
+
+
+def test_stream_error_after_some_chunks_is_raised_to_readers():
+    flight = SingleFlight("test")
+
+    def start():
+        def chunks():
+            yield "a"
+            raise ConnectionError("끊김")
+        return chunks()
+
+    received = []
+    with pytest.raises(ConnectionError):
+        for chunk in flight.do_stream("k", start):
+            received.append(chunk)
+    assert received == ["a"]
+
+
+def test_stream_start_error_goes_to_leader():
+    flight = SingleFlight("test")
+
+    def start():
+        raise RuntimeError("시작 실패")
+
+    with pytest.raises(RuntimeError):
+        flight.do_stream("k", start)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_plain_call_joins_a_stream_in_flight():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def chunks():
+        yield "가"
+        release.wait(5)
+        yield "나"
+
+    reader = flight.do_stream("k", chunks)
+    results = []
+    joined = threading.Thread(target=lambda: results.append(
+        flight.do("k", lambda: "새로 호출", join_stream=lambda parts: "".join(parts))))
+    joined.start()
+    time.sleep(0.05)
+    release.set()
+    joined.join(5)
+    assert results == ["가나"] and list(reader) == ["가", "나"]
+    # 합류 함수를 주지 않으면 서로 다른 작업으로 봅니다.
+    assert flight.do("k", lambda: "새로 호출") == "새로 호출"
+
+
+def test_stream_joins_a_plain_call_in_flight():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("k", lambda: release.wait(5) and "완성된 응답"))
+    leader.start()
+    time.sleep(0.05)
+    started = []
+    reader = flight.do_stream("k", lambda: started.append(1) or iter(["조각"]), join_call=lambda result: [result])
+    release.set()
+    assert list(reader) == ["완성된 응답"]
+    assert started == []
+    leader.join(5)
+    assert flight.stats() == {"leaders": 1, "followers": 1, "in_flight": 0}
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+import strategy
+import stub_clients
+from resilience import services
+
+REPAIR_MARKER = "일부가 유실되었습니다"
+
+
+@pytest.fixture
+def unthrottled():
+    """공용 DDGS/Gemini 서비스의 속도 제한을 잠시 끕니다."""
+    saved = {name: service.settings() for name, service in services.items()}
+    for service in services.values():
+        service.configure(rate=None)
+    yield
+    for name, settings in saved.items():
+        services[name].configure(**settings)
+
+
+class LossyModel(stub_clients.StubGenerativeModel):
+    """lossy에 든 매체의 첫 응답은 객체 하나를 깨뜨리고, 그 매체의 재생성 요청은 repair_delay만큼 늦게 답합니다."""
+
+    lossy = ()
+    repair_delay = 0.0
+    repairs = []
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        platform = next((p for p in strategy.PLATFORM_OPTIONS if p in prompt), None)
+        if REPAIR_MARKER in prompt:
+            self.repairs.append(platform)
+            time.sleep(self.repair_delay)
+            return super().generate_content(prompt, generation_config, stream)
+        response = super().generate_content(prompt, generation_config, stream)
+        if platform in self.lossy:
+            return stub_clients.StubResponse(stub_clients.corrupt_output(response.text), prompt=prompt)
+        return response
+
+
+@pytest.fixture
+def lossy_model(offline, monkeypatch):
+    LossyModel.lossy, LossyModel.repair_delay, LossyModel.repairs = (), 0.0, []
+    monkeypatch.setattr(strategy, "model_factory", LossyModel)
+    return LossyModel
+
+
+def _all_platforms(offline, name="저소음 스텝퍼"):
+    return strategy.generate_all_platforms("offline", name, "4050 주부", "하루 10분", strategy.DEFAULT_TONE, offline)
+
+
+def test_all_platforms_yields_one_result_per_platform(offline, unthrottled):
+    results = {platform: (text, items) for platform, text, items in _all_platforms(offline)}
+    assert set(results) == set(strategy.PLATFORM_OPTIONS)
+    for text, items in results.values():
+        assert not text.startswith("Error") and len(items) == strategy.CEP_COUNT
+    # 매체마다 프롬프트가 달라 서로 다른 결과가 나옵니다.
+    assert len({items[0]["cep_title"] for _, items in results.values()}) == len(strategy.PLATFORM_OPTIONS)
+
+
+def test_lost_items_are_repaired_without_blocking_other_platforms(offline, unthrottled, lossy_model):
+    slow = strategy.DEFAULT_PLATFORM
+    lossy_model.lossy, lossy_model.repair_delay = (slow,), 0.5
+    started = time.monotonic()
+    arrivals = [(platform, items, time.monotonic() - started) for platform, _, items in _all_platforms(offline)]
+
+    assert lossy_model.repairs == [slow]
+    assert [platform for platform, _, _ in arrivals][-1] == slow
+    # 재생성을 기다리는 매체가 있어도 나머지 매체는 바로 나옵니다.
+    assert all(elapsed < 0.3 for platform, _, elapsed in arrivals if platform != slow)
+    assert all(len(items) == strategy.CEP_COUNT for _, items, _ in arrivals)
+
+
+def test_concurrent_all_platform_runs_do_not_queue_behind_each_other(offline, unthrottled):
+    stub_clients.configure(generate_latency=0.3)
+    durations = []
+
+    def run(name):
+        started = time.monotonic()
+        assert len(list(_all_platforms(offline, name))) == len(strategy.PLATFORM_OPTIONS)
+        durations.append(time.monotonic() - started)
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("폼롤러", "요가매트")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 공유 풀(4개)이었다면 8건이 두 차례로 나뉘어 한 쪽은 0.6초 이상 걸립니다.
+    assert len(durations) == 2 and max(durations) < 0.5
+
+
+def test_stream_and_plain_generation_share_one_call(offline, unthrottled, monkeypatch):
+    calls = []
+
+    class CountingModel(stub_clients.StubGenerativeModel):
+        def generate_content(self, prompt, generation_config=None, stream=False):
+            calls.append(stream)
+            return super().generate_content(prompt, generation_config, stream)
+
+    monkeypatch.setattr(strategy, "model_factory", CountingModel)
+    stub_clients.configure(generate_latency=0.2)
+    config = strategy.GenerationConfig(temperature=1.0)
+    streamed = []
+    reader = threading.Thread(target=lambda: streamed.extend(
+        chunk.text for chunk in strategy._generate_content(offline, "CEP 2가지 공유", config, stream=True)))
+    reader.start()
+    time.sleep(0.05)
+    text = strategy._generate_content(offline, "CEP 2가지 공유", config, stream=False).text
+    reader.join(5)
+    # 스트림으로 시작된 생성에 일반 호출이 합류해 Gemini는 한 번만 불립니다.
+    assert calls == [True]
+    assert text == "".join(streamed) and text
@@ -0,0 +1,119 @@
+import itertools
+import threading
+import time
+
+import strategy
+from variant_pool import (POOL_MAX_JOBS, POOL_MAX_PER_USER, POOL_MAX_TOTAL, POOL_VARIANTS_PER_KEY, VariantPool,
+                          produce_variant)
+
+
+def _counter():
+    numbers = itertools.count()
+    return lambda: next(numbers)
+
+
+def _wait_idle(pool, timeout=2.0):
+    give_up_at = time.monotonic() + timeout
+    while pool.stats()["running"]:
+        assert time.monotonic() < give_up_at, "백그라운드 채우기가 끝나지 않았습니다"
+        time.sleep(0.01)
+
+
+def _blocking_produce(started, release):
+    def produce():
+        started.set()
+        release.wait(2.0)
+        return "late"
+    return produce
+
+
+def test_default_budgets():
+    pool = VariantPool()
+    assert (pool.per_key, pool.per_user, pool.max_total, pool.max_jobs) == (2, 4, 32, 2)
+    assert (POOL_VARIANTS_PER_KEY, POOL_MAX_PER_USER, POOL_MAX_TOTAL, POOL_MAX_JOBS) == (2, 4, 32, 2)
+
+
+def test_refill_fills_up_to_per_key_and_take_drains_in_order():
+    pool = VariantPool()
+    assert pool.refill("k", "alice", _counter())
+    _wait_idle(pool)
+    assert pool.stats()["pooled"] == 2
+    assert [pool.take("k"), pool.take("k"), pool.take("k")] == [0, 1, None]
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"], stats["generated"]) == (2, 1, 2)
+
+
+def test_take_on_unknown_key_is_a_miss():
+    pool = VariantPool()
+    assert pool.take("nothing") is None
+    assert pool.stats()["misses"] == 1
+
+
+def test_per_user_budget_stops_refills():
+    pool = VariantPool(per_key=2, per_user=3)
+    assert pool.refill("a", "alice", _counter())
+    _wait_idle(pool)
+    assert pool.refill("b", "alice", _counter())
+    _wait_idle(pool)
+    # 두 번째 입력은 사용자 예산(3개)에 걸려 하나만 채워집니다.
+    assert pool.stats()["pooled"] == 3
+    assert not pool.refill("c", "alice", _counter())
+    assert pool.refill("c", "bob", _counter())
+    _wait_idle(pool)
+    assert pool.stats()["pooled"] == 5
+
+
+def test_one_refill_job_per_key_and_owner_and_max_jobs():
+    pool = VariantPool(max_jobs=2)
+    started, release = threading.Event(), threading.Event()
+    try:
+        assert pool.refill("a", "alice", _blocking_produce(started, release))
+        assert started.wait(1.0)
+        assert not pool.refill("a", "bob", _counter())     # 같은 key는 이미 채우는 중
+        assert not pool.refill("b", "alice", _counter())   # 같은 사용자는 작업 하나만
+        assert pool.refill("b", "bob", _blocking_produce(threading.Event(), release))
+        assert not pool.refill("c", "carol", _counter())   # 전체 작업 수(max_jobs) 초과
+        assert pool.stats()["running"] == 2
+    finally:
+        release.set()
+    _wait_idle(pool)
+    assert pool.refill("c", "carol", _counter())
+    _wait_idle(pool)
+
+
+def test_failed_produce_stops_the_refill():
+    pool = VariantPool()
+    assert pool.refill("k", "alice", lambda: None)
+    _wait_idle(pool)
+    assert pool.stats()["failed"] == 1 and pool.take("k") is None
+
+
+def test_entries_expire_after_ttl():
+    pool = VariantPool(ttl=0.05)
+    pool.refill("k", "alice", _counter())
+    _wait_idle(pool)
+    time.sleep(0.06)
+    assert pool.take("k") is None
+    stats = pool.stats()
+    assert (stats["expired"], stats["pooled"]) == (2, 0)
+
+
+def test_global_limit_evicts_least_recently_used_key():
+    pool = VariantPool(per_key=2, per_user=10, max_total=4)
+    for key in ("a", "b"):
+        pool.refill(key, "alice", _counter())
+        _wait_idle(pool)
+    # "a"를 꺼내 쓰면 최근 사용으로 올라가므로, 넘칠 때는 "b"가 먼저 밀려납니다.
+    assert pool.take("a") == 0
+    pool.refill("c", "alice", _counter())
+    _wait_idle(pool)
+    stats = pool.stats()
+    assert (stats["pooled"], stats["evicted"]) == (4, 1)
+    assert [pool.take("b"), pool.take("b")] == [1, None]
+    assert [pool.take("a"), pool.take("c"), pool.take("c")] == [1, 0, 1]
+
+
+def test_produce_variant_uses_stubbed_generation(offline):
+    text, report = produce_variant("offline", "저소음 스텝퍼", "4050 주부", "하루 10분", strategy.DEFAULT_PLATFORM,
+                                   strategy.DEFAULT_TONE, offline)
+    assert text.strip() and report["failed_searches"] == 0
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+from duckduckgo_search.exceptions import TimeoutException
+
+import web_search
+from resilience import ServiceGuard, _is_retryable_ddgs
+from search_cache import SearchCache
+
+
+class FakeDDGS:
+    """query에 'slow'가 들어 있으면 DDGS timeout만큼 멈췄다가 시간 초과를 냅니다."""
+
+    calls = []
+    lock = threading.Lock()
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, region=None, safesearch=None, max_results=3):
+        with self.lock:
+            self.calls.append((query, self.timeout))
+        if "slow" in query:
+            time.sleep(self.timeout)
+            raise TimeoutException("fake: timed out")
+        return [{"title": query, "body": "본문", "href": f"https://example.com/{len(query)}"}]
+
+
+@pytest.fixture(autouse=True)
+def fake_search(monkeypatch):
+    FakeDDGS.calls = []
+    monkeypatch.setattr(web_search, "search_cache", SearchCache(path=":memory:"))
+    monkeypatch.setattr(web_search, "search_client_factory", FakeDDGS)
+    monkeypatch.setattr(web_search, "ddgs_service", ServiceGuard(
+        "ddgs-test", _is_retryable_ddgs, max_attempts=3, base_delay=0, max_delay=0, failure_threshold=100))
+
+
+def test_results_come_back_in_query_order_and_are_cached():
+    assert [r[0]["title"] for r in web_search.run_searches_concurrently(["a", "bb"])] == ["a", "bb"]
+    web_search.run_searches_concurrently(["a", "bb"])
+    assert len(FakeDDGS.calls) == 2
+
+
+def test_slow_query_gives_up_at_deadline():
+    started = time.monotonic()
+    results = web_search.run_searches_concurrently(["fast", "slow"], per_query_timeout=5, deadline=0.3)
+    assert time.monotonic() - started < 1.0
+    assert results[0] and results[1] is None
+
+
+def test_rate_limited_searches_free_the_pool_within_the_deadline(monkeypatch):
+    monkeypatch.setattr(web_search, "ddgs_service", ServiceGuard(
+        "ddgs-test", _is_retryable_ddgs, rate=0.5, burst=1, max_attempts=3, base_delay=0, max_delay=0))
+    started = time.monotonic()
+    results = web_search.run_searches_concurrently([f"q{i}" for i in range(6)], per_query_timeout=0.3, deadline=0.5)
+    assert time.monotonic() - started < 1.0
+    # 토큰은 2초에 하나뿐이라 첫 쿼리만 검색됩니다.
+    assert sum(r is not None for r in results) == 1
+
+    # 포기한 쿼리의 스레드가 토큰을 기다리며 남아 있지 않다면, 풀의 모든 스레드가 곧바로 새 작업을 받습니다.
+    barrier = threading.Barrier(web_search.SEARCH_MAX_WORKERS, timeout=1.0)
+    probes = [web_search._search_executor.submit(barrier.wait) for _ in range(web_search.SEARCH_MAX_WORKERS)]
+    for probe in probes:
+        probe.result(timeout=2.0)
+
+
+def test_retries_share_one_time_budget():
+    started = time.monotonic()
+    with pytest.raises(Exception):
+        web_search._search_and_cache("k", "slow query", 3, 0.3)
+    # 3번 시도해도 전체가 timeout 근처에서 끝나고, 시도마다 남은 시간만 넘깁니다.
+    assert time.monotonic() - started < 0.6
+    timeouts = [t for _, t in FakeDDGS.calls]
+    assert timeouts[0] <= 0.3 and all(t <= 0.3 for t in timeouts)
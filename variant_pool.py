@@ -0,0 +1,146 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from json_extract import salvage_json_from_text
+from strategy import CEP_COUNT, generate_strategy
+
+# -----------------------------------------------------------------------------
+# 변형 결과 미리 만들어 두기 ("다시" 클릭 즉시 응답)
+# -----------------------------------------------------------------------------
+# 생성이 끝나면 같은 입력으로 몇 개를 백그라운드에서 더 만들어 두고,
+# 다음 클릭은 여기서 바로 꺼내 씁니다. (꺼낸 만큼 다시 채움)
+POOL_VARIANTS_PER_KEY = 2      # 입력 조합 하나당 미리 만들어 둘 개수
+POOL_MAX_PER_USER = 4          # 사용자(세션) 한 명이 쌓아둘 수 있는 최대 개수
+POOL_MAX_TOTAL = 32            # 전체 보관 개수 (넘으면 가장 오래 안 쓴 입력부터 제거)
+POOL_MAX_JOBS = 2              # 동시에 돌릴 백그라운드 작업 수 (Gemini 쿼터 보호)
+POOL_TTL_SEC = 10 * 60         # 안 쓰인 결과의 보관 시간
+
+
+class VariantPool:
+    def __init__(self, per_key=POOL_VARIANTS_PER_KEY, per_user=POOL_MAX_PER_USER, max_total=POOL_MAX_TOTAL,
+                 max_jobs=POOL_MAX_JOBS, ttl=POOL_TTL_SEC):
+        self.per_key = per_key
+        self.per_user = per_user
+        self.max_total = max_total
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()   # key -> deque[(만료 시각, owner, value)], 최근에 쓴 key가 뒤쪽
+        self._running = {}            # key -> owner (key당 작업 하나)
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="variant-pool")
+        self._stats = {"hits": 0, "misses": 0, "generated": 0, "failed": 0, "expired": 0, "evicted": 0}
+
+    @staticmethod
+    def make_key(*inputs):
+        return hashlib.sha1(json.dumps(inputs, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def take(self, key):
+        """미리 만들어 둔 결과 하나를 꺼냅니다. 없으면 None."""
+        with self._lock:
+            self._expire()
+            slot = self._slots.get(key)
+            if not slot:
+                self._stats["misses"] += 1
+                return None
+            _, _, value = slot.popleft()
+            if slot:
+                self._slots.move_to_end(key)
+            else:
+                del self._slots[key]
+            self._stats["hits"] += 1
+            return value
+
+    def refill(self, key, owner, produce):
+        """
+        key의 결과가 per_key개가 될 때까지 produce()로 백그라운드에서 채웁니다.
+        produce()는 보관할 값 또는 None(실패)을 반환해야 합니다.
+        이미 채우는 중이거나 예산(사용자별/전체 작업 수)이 없으면 False를 반환합니다.
+        """
+        with self._lock:
+            if key in self._running or owner in self._running.values():
+                return False
+            if len(self._running) >= self.max_jobs or not self._can_add(key, owner):
+                return False
+            self._running[key] = owner
+        self._executor.submit(self._fill, key, owner, produce)
+        return True
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            stats = dict(self._stats)
+            stats["pooled"] = sum(len(slot) for slot in self._slots.values())
+            stats["running"] = len(self._running)
+        return stats
+
+    def _fill(self, key, owner, produce):
+        try:
+            while True:
+                with self._lock:
+                    if not self._can_add(key, owner):
+                        return
+                try:
+                    value = produce()
+                except Exception:
+                    value = None
+                with self._lock:
+                    if value is None:
+                        # 실패하면 이번 채우기는 멈춥니다. (다음 생성 때 다시 시도)
+                        self._stats["failed"] += 1
+                        return
+                    self._put(key, owner, value)
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+
+    # 아래는 self._lock을 잡은 상태에서만 호출합니다.
+    def _can_add(self, key, owner):
+        self._expire()
+        owned = sum(1 for slot in self._slots.values() for _, o, _ in slot if o == owner)
+        return len(self._slots.get(key, ())) < self.per_key and owned < self.per_user
+
+    def _put(self, key, owner, value):
+        self._slots.setdefault(key, deque()).append((time.monotonic() + self.ttl, owner, value))
+        self._slots.move_to_end(key)
+        self._stats["generated"] += 1
+        total = sum(len(slot) for slot in self._slots.values())
+        while total > self.max_total:
+            old_key, old_slot = next(iter(self._slots.items()))
+            old_slot.popleft()
+            if not old_slot:
+                del self._slots[old_key]
+            total -= 1
+            self._stats["evicted"] += 1
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in list(self._slots):
+            slot = self._slots[key]
+            while slot and slot[0][0] <= now:
+                slot.popleft()
+                self._stats["expired"] += 1
+            if not slot:
+                del self._slots[key]
+
+
+variant_pool = VariantPool()
+
+
+def produce_variant(api_key, name, target, details, platform, tone, pinned_model=None, enrich_pages=False):
+    """
+    백그라운드용 변형 하나를 만듭니다. (원문 텍스트, 검색 컨텍스트 리포트) 또는 실패 시 None.
+    검색 결과(와 원문 본문)는 캐시에서 그대로 꺼내 쓰므로 추가 검색 호출 없이 Gemini만 부릅니다.
+    """
+    reports = []
+    text = generate_strategy(api_key, name, target, details, platform, tone, pinned_model, on_context=reports.append,
+                             enrich_pages=enrich_pages)
+    if text.startswith("Error"):
+        return None
+    items, _ = salvage_json_from_text(text, CEP_COUNT)
+    if not items:
+        return None
+    return text, (reports[0] if reports else None)
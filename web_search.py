@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from duckduckgo_search import DDGS
+
+from search_cache import SearchCache
+from metrics import metrics
+from resilience import ddgs_service
+from singleflight import SingleFlight
+
+# -----------------------------------------------------------------------------
+# 검색 설정
+# -----------------------------------------------------------------------------
+# Streamlit은 매 rerun마다 메인 스크립트를 다시 실행하지만, import된 모듈은
+# 프로세스에 한 번만 로드됩니다. 그래서 워커 풀은 여기 두고 모든 세션이 공유합니다.
+# 제한 시간을 넘겨 포기한 검색도 스레드는 자기 제한 시간(토큰 대기/재시도 포함 SEARCH_QUERY_TIMEOUT_SEC)이
+# 끝날 때까지 자리를 차지합니다. 동시 생성 2~3건(쿼리 2개씩) + 그런 자리까지 감안해 넉넉히 잡습니다.
+SEARCH_MAX_WORKERS = 8
+SEARCH_QUERY_TIMEOUT_SEC = 10.0   # 쿼리 1건당 제한 시간 (재시도 포함)
+SEARCH_DEADLINE_SEC = 15.0        # 검색 단계 전체 제한 시간
+SEARCH_REGION = 'kr-kr'
+SEARCH_SAFESEARCH = 'off'
+
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix="ddgs")
+
+# 같은 제품을 다시 생성할 때는 네트워크 없이 캐시에서 바로 꺼냅니다.
+search_cache = SearchCache()
+
+# 실제 검색 클라이언트. 배치/오프라인 실행 시 교체합니다.
+search_client_factory = DDGS
+
+# 같은 검색이 이미 진행 중이면(다른 세션 포함) 새로 검색하지 않고 그 결과를 함께 받습니다.
+search_flight = SingleFlight("ddgs")
+
+
+def fetch_search_results(query, max_results=3, timeout=SEARCH_QUERY_TIMEOUT_SEC):
+    """DDGS 원본 결과(dict 리스트)를 반환합니다. 캐시에 있으면 검색하지 않습니다."""
+    key = SearchCache.make_key(query, SEARCH_REGION, SEARCH_SAFESEARCH, max_results)
+    with metrics.timed("search_query") as event:
+        results = search_cache.get(key)
+        event["cache"] = "miss" if results is None else "hit"
+        metrics.incr("search_cache_misses" if results is None else "search_cache_hits")
+        if results is None:
+            # 기다리는 쪽은 timeout이 지나면 포기하지만, 진행 중인 검색은 끝까지 돌아 캐시에 남습니다.
+            results = search_flight.do(key, lambda: _search_and_cache(key, query, max_results, timeout), timeout=timeout)
+        event["results"] = len(results)
+    metrics.incr("search_results", len(results))
+    return results
+
+
+def _search_and_cache(key, query, max_results, timeout):
+    # 속도 제한/재시도/서킷 브레이커는 ddgs_service가 처리합니다.
+    # 토큰 대기와 재시도까지 합쳐 timeout 안에 끝나도록 deadline을 넘기고,
+    # 시도마다 남은 시간만 DDGS timeout으로 넘깁니다. (ddgs_service는 deadline 전에만 시도를 시작함)
+    give_up_at = time.monotonic() + timeout
+
+    def attempt():
+        return _ddgs_text(query, max_results, max(give_up_at - time.monotonic(), 0.01))
+
+    results = ddgs_service.call(attempt, deadline=give_up_at)
+    search_cache.set(key, results)
+    return results
+
+
+def _ddgs_text(query, max_results, timeout):
+    with search_client_factory(timeout=timeout) as ddgs:
+        return list(ddgs.text(query, region=SEARCH_REGION, safesearch=SEARCH_SAFESEARCH, max_results=max_results))
+
+
+def run_searches_concurrently(queries, max_results=3,
+                              per_query_timeout=SEARCH_QUERY_TIMEOUT_SEC,
+                              deadline=SEARCH_DEADLINE_SEC):
+    """
+    여러 검색 쿼리를 공유 워커 풀에서 동시에 실행합니다.
+    전체 deadline이 지나면 기다리지 않고, 그때까지 끝난 결과만 돌려줍니다.
+    결과는 queries와 같은 순서의 DDGS 원본 결과 리스트입니다.
+    검색은 됐지만 결과가 없으면 빈 리스트, 실패했거나 시간 안에 끝나지 않았으면 None입니다.
+    """
+    # 쿼리 하나가 전체 deadline보다 오래 돌지 않도록 합니다. (포기한 작업이 풀을 오래 붙잡지 않게)
+    per_query_timeout = min(per_query_timeout, deadline)
+    started_at = {}
+
+    def _run(idx, query):
+        started_at[idx] = time.monotonic()
+        try:
+            return fetch_search_results(query, max_results=max_results, timeout=per_query_timeout)
+        except Exception:
+            metrics.incr("search_failures")
+            return None
+
+    results = [None] * len(queries)
+    pending = {_search_executor.submit(_run, idx, q): idx for idx, q in enumerate(queries)}
+    end_at = time.monotonic() + deadline
+
+    while pending:
+        now = time.monotonic()
+
+        # 쿼리별 제한 시간을 넘긴 작업은 포기합니다. (스레드는 토큰 대기 중이어도 _search_and_cache의 제한 시간 안에 정리됨)
+        for fut, idx in list(pending.items()):
+            if idx in started_at and now - started_at[idx] >= per_query_timeout:
+                del pending[fut]
+                metrics.incr("search_timeouts")
+
+        remaining = end_at - now
+        if remaining <= 0 or not pending:
+            break
+
+        # 다음으로 제한 시간이 닥치는 쿼리 또는 전체 deadline 중 빠른 쪽까지만 대기
+        wake_at = end_at
+        for idx in pending.values():
+            if idx in started_at:
+                wake_at = min(wake_at, started_at[idx] + per_query_timeout)
+        done, _ = wait(pending, timeout=max(wake_at - now, 0), return_when=FIRST_COMPLETED)
+
+        for fut in done:
+            results[pending.pop(fut)] = fut.result()
+
+    # 아직 시작도 못 한 작업은 취소해 풀을 비워줍니다.
+    for fut in pending:
+        fut.cancel()
+    if pending:
+        metrics.incr("search_timeouts", len(pending))
+
+    return results